@@ -1,5 +1,6 @@
 """Módulo contendo funções e variáveis importantes de configuração"""
 import os
+import pandas as pd
 
 
 def DATASET_LOCAL() -> str:
@@ -38,6 +39,47 @@ def OUTPUT_FOLDER() -> str:
     return os.path.join(os.getcwd(), 'output')
 
 
+def CACHE_FOLDER() -> str:
+    """Function that returns the path of the columnar cache folder, inside the DATA path
+
+    Returns:
+        str: Cache folder's path
+    """
+    return os.path.join(DATASET_LOCAL(), 'cache')
+
+
+def COLUMN_STORE_FOLDER() -> str:
+    """Function that returns the path of the memory-mapped column stores, inside the DATA path
+
+    Returns:
+        str: Column store folder's path
+    """
+    return os.path.join(DATASET_LOCAL(), 'column_store')
+
+
+def PARTITIONS_FOLDER() -> str:
+    """Function that returns the path of the yearly datasets ingested by year and UF, inside the DATA path
+
+    Returns:
+        str: Partitions folder's path
+    """
+    return os.path.join(DATASET_LOCAL(), 'partitions')
+
+
+def RESULT_CACHE_FOLDER() -> str:
+    """Function that returns the path of the cache of the hypothesis results, inside the cache folder
+
+    Returns:
+        str: Result cache folder's path
+    """
+    return os.path.join(CACHE_FOLDER(), 'results')
+
+
+TOTAL_DATASET = 'sinan_dengue_sample_total.csv'  # Name of the unified dataset file
+
+RESULT_CACHE_MAX_BYTES = 2 * 2**30  # Size cap of the result cache, the least recently used results are evicted above it
+
+
 REQUIRED_COLUMNS = [  # Required columns for every hypothesis
     'DT_INVEST', 'FEBRE', 'DOR_RETRO', 'LEUCOPENIA', 'PETEQUIA_N', 'DT_VIRAL', 
     'RESUL_NS1', 'ACIDO_PEPT', 'DT_PCR', 'AUTO_IMUNE', 'CEFALEIA', 'ARTRITE', 
@@ -52,4 +94,71 @@ REQUIRED_COLUMNS = [  # Required columns for every hypothesis
 
 CHUNKS_SIZE = 5 * 10**4  # Chunks used when reading the Total Dataset
 
+READING_BACKEND = 'thread'  # Backend of processing_total_dataset: 'serial', 'thread' or 'process'
+
+READING_RANGE_BYTES = 32 * 2**20  # Size of the byte ranges parsed by each worker of the 'process' backend
+
+READING_MEMORY_BUDGET = None  # Bytes the readers may use, None to use READING_MEMORY_FRACTION of the physical memory
+
+READING_MEMORY_FRACTION = 0.5  # Fraction of the physical memory used by the readers when there is no budget
+
+READING_SAMPLE_ROWS = 2000  # Rows parsed to measure the bytes per row of a dataset
+
 MAX_SET_SIZE = 3  # Maximum size of symptom sets to consider
+
+MONTE_CARLO_RESAMPLES = 10_000  # Random tables drawn for the Monte Carlo p-values of the chi-square
+
+MONTE_CARLO_BATCH = 1_000  # Random tables drawn at once by each task of the process pool
+
+QUERY_SERVER_HOST = '127.0.0.1'  # The query server only listens on the local machine
+
+QUERY_SERVER_PORT = 8765  # Port of the query server, 0 to pick a free one
+
+QUERY_LATENCY_WINDOW = 1000  # Latest latencies of each query kept for the percentiles of the metrics
+
+UF_CODES = {  # IBGE code of each federative unit, as in SG_UF_NOT
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO',
+    21: 'MA', 22: 'PI', 23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA',
+    31: 'MG', 32: 'ES', 33: 'RJ', 35: 'SP',
+    41: 'PR', 42: 'SC', 43: 'RS',
+    50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF',
+}
+
+UF_ACRONYMS = sorted(UF_CODES.values())  # Acronyms of the 27 federative units
+
+SYMPTOM_COLUMNS = [  # Symptom flags (1 = yes, 2 = no, 9 = unknown)
+    'FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO', 'NAUSEA', 'DOR_COSTAS',
+    'CONJUNTVIT', 'ARTRITE', 'ARTRALGIA', 'PETEQUIA_N', 'LEUCOPENIA', 'LACO', 'DOR_RETRO',
+]
+
+COMORBIDITY_COLUMNS = [  # Comorbidity flags (1 = yes, 2 = no, 9 = unknown)
+    'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL', 'HIPERTENSA', 'ACIDO_PEPT', 'AUTO_IMUNE',
+]
+
+EXAM_RESULT_COLUMNS = [  # Exam results (small integer codes)
+    'RESUL_SORO', 'RESUL_NS1', 'RESUL_VI_N', 'RESUL_PCR_', 'HISTOPA_N', 'IMUNOH_N',
+]
+
+DATE_COLUMNS = [  # Date columns, in the 'YYYY-MM-DD' format
+    'DT_NOTIFIC', 'DT_SIN_PRI', 'DT_INVEST', 'DT_CHIK_S1', 'DT_CHIK_S2', 'DT_PRNT',
+    'DT_SORO', 'DT_NS1', 'DT_VIRAL', 'DT_PCR', 'DT_INTERNA', 'DT_OBITO',
+    'DT_ENCERRA', 'DT_ALRM', 'DT_GRAV', 'DT_DIGITA',
+]
+
+DATE_FORMAT = '%Y-%m-%d'  # Format of the DATE_COLUMNS in the SINAN files
+
+COLUMNS_SCHEMA = {  # Compact dtype of each SINAN column
+    **{column: 'UInt8' for column in SYMPTOM_COLUMNS + COMORBIDITY_COLUMNS + EXAM_RESULT_COLUMNS},
+    'HOSPITALIZ': 'UInt8',
+    'SG_UF_NOT': 'UInt8',
+    'SIGLA_UF': pd.CategoricalDtype(UF_ACRONYMS),
+    'CLASSI_FIN': pd.CategoricalDtype([1, 2, 3, 4, 5, 8, 10, 11, 12, 13]),
+    'EVOLUCAO': pd.CategoricalDtype([1, 2, 3, 4, 9]),
+    'SOROTIPO': pd.CategoricalDtype([1, 2, 3, 4]),
+    'ID_OCUPA_N': 'category',
+    **{column: 'datetime64[ns]' for column in DATE_COLUMNS},
+}
+
+TIME_CUBE_DIMENSIONS = ['SIGLA_UF', 'CLASSI_FIN', 'EVOLUCAO', 'SOROTIPO']  # Categorical columns of the epidemiological time cube
+
+TIME_CUBE_RANGE = ('2020-01-01', '2025-12-31')  # Dates kept by the time cube, the dates outside it (mistyped ones) are only counted
@@ -0,0 +1,165 @@
+"""Módulo de filtragem do dataset: predicados declarativos compilados para máscaras booleanas do NumPy"""
+import numpy as np
+import pandas as pd
+
+DERIVED_COLUMNS = {  # Columns added to the chunks while reading, and the columns they are decoded from
+    'SIGLA_UF': ['SG_UF_NOT'],
+}
+
+
+class Predicate:
+    """Base of the filters. Each one lists the columns it reads and turns a chunk into a boolean mask.
+    Predicates are combined with &, | and ~
+
+    >>> predicate = IsIn('CLASSI_FIN', [10, 11, 12]) & Between('DT_NOTIFIC', '2023-01-01', '2023-12-31')
+    """
+    columns: list[str] = []
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of the rows that pass the filter"""
+        raise NotImplementedError
+
+    def __and__(self, other: 'Predicate') -> 'And':
+        return And(self, other)
+
+    def __or__(self, other: 'Predicate') -> 'Or':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Not':
+        return Not(self)
+
+
+class IsIn(Predicate):
+    """Rows whose value is one of the given values (the nulls never pass)"""
+
+    def __init__(self, column: str, values):
+        self.column = column
+        self.values = list(values)
+        self.columns = [column]
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        values = df[self.column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Only the categories are compared, and the codes take the result (the last position is the null code -1)
+            accepted = np.append(values.cat.categories.isin(self.values), False)
+            return accepted[values.cat.codes.to_numpy()]
+        return values.isin(self.values).to_numpy(dtype=bool, na_value=False)
+
+
+class Between(Predicate):
+    """Rows whose value is inside the closed interval [start, end], like a range of dates (the nulls never pass)"""
+
+    def __init__(self, column: str, start=None, end=None):
+        self.column = column
+        self.start = start
+        self.end = end
+        self.columns = [column]
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        values = df[self.column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            data = values.to_numpy(dtype='datetime64[ns]')
+            convert = lambda value: np.datetime64(pd.Timestamp(value), 'ns')
+        else:
+            data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            convert = float
+
+        # NaT and NaN are False in every comparison
+        mask = ~pd.isna(data)
+        if self.start is not None:
+            mask &= data >= convert(self.start)
+        if self.end is not None:
+            mask &= data <= convert(self.end)
+        return mask
+
+
+class NotNull(Predicate):
+    """Rows with a value in the column"""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.columns = [column]
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return df[self.column].notna().to_numpy()
+
+
+class And(Predicate):
+    """Rows that pass all the predicates"""
+
+    def __init__(self, *predicates: Predicate):
+        self.predicates = predicates
+        self.columns = list(dict.fromkeys(column for predicate in predicates for column in predicate.columns))
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        mask = np.ones(len(df), dtype=bool)
+        for predicate in self.predicates:
+            mask &= predicate.mask(df)
+        return mask
+
+
+class Or(Predicate):
+    """Rows that pass any of the predicates"""
+
+    def __init__(self, *predicates: Predicate):
+        self.predicates = predicates
+        self.columns = list(dict.fromkeys(column for predicate in predicates for column in predicate.columns))
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        mask = np.zeros(len(df), dtype=bool)
+        for predicate in self.predicates:
+            mask |= predicate.mask(df)
+        return mask
+
+
+class Not(Predicate):
+    """Rows that do not pass the predicate"""
+
+    def __init__(self, predicate: Predicate):
+        self.predicate = predicate
+        self.columns = list(predicate.columns)
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        return ~self.predicate.mask(df)
+
+
+def scan_columns(columns: list, predicate: Predicate | None = None) -> list[str]:
+    """Minimal columns to read from the file: the referenced columns, the columns of the predicate and the
+    columns that the derived ones (like SIGLA_UF) are decoded from
+
+    Args:
+        columns (list): Columns referenced by the analysis
+        predicate (Predicate | None, optional): Filter of the rows. Defaults to None.
+
+    Returns:
+        list[str]: Columns, without duplicates
+    """
+    referenced = list(columns) + ([] if predicate is None else predicate.columns)
+    sources = [source for column in referenced for source in DERIVED_COLUMNS.get(column, [])]
+    return list(dict.fromkeys(referenced + sources))
+
+
+def filter_dataset(df: pd.DataFrame, predicate: Predicate | None = None, columns: list | None = None) -> pd.DataFrame:
+    """Filters the rows of a chunk with a predicate and keeps only the projected columns. Without a predicate
+    and a projection the chunk is returned as it is
+
+    Args:
+        df (pd.DataFrame): Chunk of the dataset
+        predicate (Predicate | None, optional): Filter of the rows. Defaults to None.
+        columns (list | None, optional): Columns to keep, in the order of the chunk. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: Filtered chunk
+    """
+    if predicate is not None:
+        mask = predicate.mask(df)
+        if not mask.all():
+            df = df[mask]
+
+    if columns is not None:
+        keep = set(columns)
+        projection = [column for column in df.columns if column in keep]
+        if len(projection) < len(df.columns):
+            df = df[projection]
+
+    return df
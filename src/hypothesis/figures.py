@@ -0,0 +1,175 @@
+"""Figuras das hipóteses, desenhadas a partir de agregados do dataset (contagens e histogramas) em vez de uma linha por notificação"""
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import CHUNKS_SIZE, UF_ACRONYMS
+from src.hypothesis.hypothesis_5 import CaseDaysByMonth
+from src.utils.dimensions import cbo_rollup
+from src.utils.plotting import FigureSpec, plot_figures
+from src.utils.statistic import table_measures
+from src.utils.streaming import Aggregation, IntegerHistogram
+
+CONFIRMED_CLASSIFICATIONS = [10, 11, 12]  # CLASSI_FIN of the confirmed cases: dengue, dengue with warning signs and severe dengue
+
+RURAL_CBO_GROUP = '6'  # Major group of the CBO 2002 of the agricultural, forestry and fishing workers
+
+HISTOGRAM_QUANTILE = 0.99  # The histograms of days are drawn until this quantile, the long tail would flatten them
+
+
+def _confirmed(chunk: pd.DataFrame) -> np.ndarray:
+    return chunk['CLASSI_FIN'].isin(CONFIRMED_CLASSIFICATIONS).to_numpy(dtype=bool)
+
+
+class RuralConfirmed(Aggregation):
+    """2x2 table of counts: occupation (non rural, rural) by confirmed case (no, yes)"""
+    columns = ['ID_OCUPA_N', 'CLASSI_FIN']
+
+    def initial(self) -> np.ndarray:
+        return np.zeros((2, 2), dtype=np.int64)
+
+    def partial(self, chunk: pd.DataFrame) -> np.ndarray:
+        rural = np.asarray(cbo_rollup(chunk['ID_OCUPA_N'], 'grande_grupo') == RURAL_CBO_GROUP, dtype=bool)
+        return np.bincount(rural * 2 + _confirmed(chunk), minlength=4).reshape(2, 2)
+
+    def merge(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        return left + right
+
+
+class ConfirmedByUF(Aggregation):
+    """Table of counts: UF (in the order of UF_ACRONYMS) by confirmed case (no, yes)"""
+    columns = ['SIGLA_UF', 'CLASSI_FIN']
+
+    def initial(self) -> np.ndarray:
+        return np.zeros((len(UF_ACRONYMS), 2), dtype=np.int64)
+
+    def partial(self, chunk: pd.DataFrame) -> np.ndarray:
+        codes = pd.Categorical(chunk['SIGLA_UF'], categories=UF_ACRONYMS).codes.astype(np.int64)
+        valid = codes >= 0
+        return np.bincount(codes[valid] * 2 + _confirmed(chunk)[valid], minlength=2 * len(UF_ACRONYMS)).reshape(-1, 2)
+
+    def merge(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        return left + right
+
+
+def _prepare_rural_table(results: dict) -> dict:
+    table = results['rural_confirmed']
+    observed = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    return {'table': table, 'measures': table_measures(observed) if min(observed.shape) > 1 else None}
+
+
+def _draw_rural_table(axes, data: dict) -> None:
+    positions = np.arange(2)
+    for confirmed, (label, color) in enumerate([('Não', 'tab:blue'), ('Sim', 'tab:orange')]):
+        axes.bar(positions + (confirmed - 0.5) * 0.4, data['table'][:, confirmed], width=0.4, label=label, color=color)
+    axes.set_xticks(positions, ['Não Rural', 'Rural'])
+    axes.set_xlabel('Tipo de Ocupação')
+    axes.set_ylabel('Número de Casos')
+    axes.legend(title='Caso Confirmado')
+
+    title = 'Distribuição de Casos Confirmados por Tipo de Ocupação'
+    if data['measures'] is not None:
+        title += f"\nχ² = {data['measures']['chi_square']:.2f}, V de Crammer = {data['measures']['crammer_V']:.4f}"
+    axes.set_title(title)
+
+
+def _prepare_rural_proportions(results: dict) -> np.ndarray:
+    confirmed = results['rural_confirmed'][:, 1]
+    return confirmed / max(confirmed.sum(), 1) * 100
+
+
+def _draw_rural_proportions(axes, proportions: np.ndarray) -> None:
+    axes.bar(['Não Rurais', 'Rurais'], proportions, color='tab:blue')
+    axes.set_title('Proporção de Casos Confirmados de Dengue')
+    axes.set_xlabel('Tipo de Ocupação')
+    axes.set_ylabel('Proporção (%)')
+
+
+def _prepare_uf_proportions(results: dict) -> pd.Series:
+    table = results['confirmed_by_uf']
+    notified = table.sum(axis=1)
+    proportions = pd.Series(table[:, 1] / np.maximum(notified, 1) * 100, index=UF_ACRONYMS)
+    return proportions[notified > 0].sort_values(ascending=False)
+
+
+def _draw_uf_proportions(axes, proportions: pd.Series) -> None:
+    axes.bar(proportions.index, proportions.to_numpy(), color='tab:blue')
+    axes.set_title('Proporção de Casos Confirmados por UF')
+    axes.set_xlabel('UF')
+    axes.set_ylabel('Proporção (%)')
+    axes.tick_params(axis='x', labelrotation=90)
+
+
+def _merge_months(histograms: dict, did_ns1: bool | None = None) -> IntegerHistogram:
+    merged = IntegerHistogram()
+    for (_, ns1), histogram in histograms.items():
+        if did_ns1 is None or ns1 == did_ns1:
+            merged = merged.merge(histogram)
+    return merged
+
+
+def _prepare_days_histogram(results: dict) -> dict:
+    histograms = results['case_days_by_month']
+    all_cases, ns1_cases = _merge_months(histograms), _merge_months(histograms, True)
+    limit = int(all_cases.quantile(HISTOGRAM_QUANTILE)) + 1 if all_cases.total else 0
+    return {
+        'Todos os casos': np.pad(all_cases.counts, (0, limit))[:limit],
+        'Casos com NS1': np.pad(ns1_cases.counts, (0, limit))[:limit],
+    }
+
+
+def _draw_days_histogram(axes, histograms: dict) -> None:
+    for label, counts in histograms.items():
+        axes.stairs(counts, np.arange(len(counts) + 1), fill=label == 'Todos os casos', alpha=0.8, label=label)
+    axes.set_title('Dias em que o Caso Ficou Aberto')
+    axes.set_xlabel('Número de dias')
+    axes.set_ylabel('Número de Casos')
+    axes.legend()
+
+
+def _prepare_days_by_month(results: dict) -> pd.DataFrame:
+    rows = {}
+    for (month, did_ns1), histogram in results['case_days_by_month'].items():
+        values = np.arange(len(histogram.counts))
+        for label in ['Todos os casos'] + (['Casos com NS1'] if did_ns1 else []):
+            total, days = rows.get((month, label), (0, 0))
+            rows[(month, label)] = (total + histogram.total, days + int((values * histogram.counts).sum()))
+
+    if not rows:
+        return pd.DataFrame(columns=['Todos os casos', 'Casos com NS1'], dtype=float)
+    means = pd.Series({key: days / total for key, (total, days) in rows.items()})
+    means.index = pd.MultiIndex.from_tuples([(pd.Timestamp(month), label) for month, label in means.index])
+    return means.unstack().sort_index()
+
+
+def _draw_days_by_month(axes, means: pd.DataFrame) -> None:
+    for label in means.columns:
+        axes.plot(means.index, means[label].to_numpy(), marker='.', label=label)
+    axes.set_title('Média de Dias em que o Caso Ficou Aberto por Mês de Notificação')
+    axes.set_xlabel('Mês de notificação')
+    axes.set_ylabel('Média de dias')
+    axes.legend()
+
+
+# The rural occupation figures have their own files: chi_square_dengue.png and proporcoes_dengue.png, in the
+# repository, were drawn with seaborn from the whole dataset and are kept as they are
+FIGURES = [  # Figures of the OUTPUT_FOLDER, the aggregations with the same name are computed once
+    FigureSpec('ocupacao_confirmados.png', {'rural_confirmed': RuralConfirmed()}, _prepare_rural_table, _draw_rural_table),
+    FigureSpec('proporcoes_ocupacao.png', {'rural_confirmed': RuralConfirmed()}, _prepare_rural_proportions, _draw_rural_proportions),
+    FigureSpec('proporcoes_uf.png', {'confirmed_by_uf': ConfirmedByUF()}, _prepare_uf_proportions, _draw_uf_proportions, figsize=(10, 4.8)),
+    FigureSpec('dias_caso_aberto.png', {'case_days_by_month': CaseDaysByMonth()}, _prepare_days_histogram, _draw_days_histogram),
+    FigureSpec('dias_caso_aberto_mes.png', {'case_days_by_month': CaseDaysByMonth()}, _prepare_days_by_month, _draw_days_by_month, figsize=(10, 4.8)),
+]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Draws the figures of the output folder from aggregates of the total dataset')
+    parser.add_argument('--chunksize', type=int, default=CHUNKS_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='Draws every figure, even the ones whose aggregates did not change')
+    args = parser.parse_args()
+
+    for filename, status in plot_figures(FIGURES, workers=args.workers, force=args.force, chunksize=args.chunksize).items():
+        print(filename, status)
@@ -1,8 +1,233 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+sys.path.append(os.getcwd())
+from src.config import DATE_COLUMNS
+from src.utils.instrumentation import instrument
+from src.utils.result_cache import memoize, total_dataset_files
+from src.utils.reading import processing_total_dataset
+from src.utils.streaming import Aggregation, Count, IntegerHistogram, aggregate_total_dataset
 
+EXAM_DATE_COLUMNS = ['DT_CHIK_S1', 'DT_CHIK_S2', 'DT_SORO', 'DT_NS1', 'DT_PRNT', 'DT_VIRAL', 'DT_PCR', 'DT_ALRM', 'DT_GRAV']
 
-def analyze_case_days_open(df: pd.DataFrame, date_limit: str, period: str = 'before') -> dict:
+
+# Offset used for the missing dates
+NAT_OFFSET = np.iinfo(np.int32).min
+
+
+def _first_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Returns the column, keeping only the first one when the name is duplicated"""
+    values = df[column]
+    return values.iloc[:, 0] if isinstance(values, pd.DataFrame) else values
+
+
+def _unique_rows(df: pd.DataFrame) -> np.ndarray | slice:
+    """Selects the first row of each duplicated index, without copying the frame"""
+    duplicated = df.index.duplicated(keep='first')
+    return ~duplicated if duplicated.any() else slice(None)
+
+
+def date_offsets(df: pd.DataFrame, columns: list = DATE_COLUMNS) -> dict[str, np.ndarray]:
+    """Parses each date column only once, as int32 days since 1970-01-01 (NAT_OFFSET for the missing dates)
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the data.
+        columns (list, optional): Date columns to parse, the missing ones are ignored. Defaults to DATE_COLUMNS.
+
+    Returns:
+        dict[str, np.ndarray]: Day offsets of each column
+    """
+    offsets = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        dates = _first_column(df, column)
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+        days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        offsets[column] = np.where(np.isnat(days), NAT_OFFSET, days.astype(np.int64)).astype(np.int32)
+    return offsets
+
+
+def date_interval(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Days between two arrays of offsets, NaN when one of the dates is missing
+
+    Args:
+        start (np.ndarray): Offsets of the first date
+        end (np.ndarray): Offsets of the second date
+
+    Returns:
+        np.ndarray: float64 array of days
+    """
+    valid = (start != NAT_OFFSET) & (end != NAT_OFFSET)
+    return np.where(valid, end.astype(np.float64) - start, np.nan)
+
+
+def date_intervals(offsets: dict[str, np.ndarray], pairs: list[tuple[str, str]] | None = None) -> dict[tuple[str, str], np.ndarray]:
+    """Days between pairs of date columns, computed in vectorized form
+
+    Args:
+        offsets (dict[str, np.ndarray]): Day offsets, from date_offsets
+        pairs (list[tuple[str, str]] | None, optional): (start, end) columns. Defaults to None (every pair, in the order of the offsets).
+
+    Returns:
+        dict[tuple[str, str], np.ndarray]: Days of each pair
+    """
+    if pairs is None:
+        columns = list(offsets)
+        pairs = [(columns[i], columns[j]) for i in range(len(columns)) for j in range(i + 1, len(columns))]
+    return {(start, end): date_interval(offsets[start], offsets[end]) for start, end in pairs}
+
+
+def _date_limit_offsets(date_limits) -> np.ndarray:
+    try:
+        date_limits = pd.to_datetime(np.atleast_1d(date_limits))
+    except ValueError:
+        raise ValueError("Invalid date format for date_limit. Use 'YYYY-MM-DD'.")
+    return date_limits.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+class CaseDurationIndex:
+    """Days each case stayed open, sorted once by the notification date, with prefix sums.
+    The statistics before or after any list of cutoffs come from searchsorted, without filtering the records again,
+    and the quantiles from histograms of the days accumulated from one cutoff to the next
+    """
+
+    def __init__(self, notification: np.ndarray, days: np.ndarray):
+        """
+        Args:
+            notification (np.ndarray): Offsets of DT_NOTIFIC of the valid cases
+            days (np.ndarray): Non-negative number of days each case stayed open
+        """
+        order = np.argsort(notification, kind='stable')
+        self.notification = notification[order]
+        self.days = days[order].astype(np.int64)
+
+        self.prefix_sum = np.concatenate([[0], np.cumsum(self.days)])
+        self.prefix_squares = np.concatenate([[0], np.cumsum(self.days ** 2)])
+        self.prefix_min = np.minimum.accumulate(self.days)
+        self.prefix_max = np.maximum.accumulate(self.days)
+        self.suffix_min = np.minimum.accumulate(self.days[::-1])[::-1]
+        self.suffix_max = np.maximum.accumulate(self.days[::-1])[::-1]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, offsets: dict[str, np.ndarray] | None = None) -> 'CaseDurationIndex':
+        """Builds the index from the DT_NOTIFIC and DT_ENCERRA columns, ignoring the negative or missing durations
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the data.
+            offsets (dict[str, np.ndarray] | None, optional): Offsets already parsed by date_offsets. Defaults to None.
+
+        Returns:
+            CaseDurationIndex: The index
+        """
+        if offsets is None:
+            offsets = date_offsets(df, ['DT_NOTIFIC', 'DT_ENCERRA'])
+        rows = _unique_rows(df)
+
+        notification = offsets['DT_NOTIFIC'][rows]
+        days = date_interval(notification, offsets['DT_ENCERRA'][rows])
+
+        valid = days >= 0
+        return cls(notification[valid], days[valid].astype(np.int64))
+
+    def positions(self, date_limits) -> np.ndarray:
+        """Number of cases notified until each date limit (inclusive)"""
+        return np.searchsorted(self.notification, _date_limit_offsets(date_limits), side='right')
+
+    def days_in(self, date_limit, period: str = 'before') -> np.ndarray:
+        """Days of the cases notified before (inclusive) or after a date limit, as a view of the sorted days"""
+        position = self.positions(date_limit)[0]
+        if period == 'before':
+            return self.days[:position]
+        if period == 'after':
+            return self.days[position:]
+        raise ValueError("Invalid period. Use 'before' or 'after'.")
+
+    def prefix_histograms(self, positions: np.ndarray) -> list[IntegerHistogram]:
+        """Histograms of the days of the first cases until each position. Each segment between two sorted positions
+        is counted only once, so the cost is one pass over the days plus one histogram per position
+
+        Args:
+            positions (np.ndarray): Number of cases, from positions
+
+        Returns:
+            list[IntegerHistogram]: Histogram of each position, in the order of the positions
+        """
+        size = int(self.days.max()) + 1 if len(self.days) else 0
+        counts = np.zeros(size, dtype=np.int64)
+        histograms = [None] * len(positions)
+        previous = 0
+        for i in np.argsort(positions, kind='stable'):
+            counts = counts + np.bincount(self.days[previous:positions[i]], minlength=size)
+            previous = positions[i]
+            histograms[i] = IntegerHistogram(counts)
+        return histograms
+
+    def cutoff_stats(self, date_limits, period: str = 'before') -> pd.DataFrame:
+        """Statistics of the cases before (inclusive) or after each date limit, the same ones of analyze_case_days_open
+
+        Args:
+            date_limits: Date limits, in the format 'YYYY-MM-DD'
+            period (str, optional): 'before' or 'after'. Defaults to 'before'.
+
+        Raises:
+            ValueError: Raises if the period is not 'before' or 'after'
+
+        Returns:
+            pd.DataFrame: total_records, sum_of_days, average_days, std_dev, median, q1, q3, min and max of each date limit (0 when there are no records)
+        """
+        positions = self.positions(date_limits)
+        total = len(self.days)
+        has_records_before = positions > 0
+        has_records_after = positions < total
+        before_position = np.maximum(positions - 1, 0)
+        after_position = np.minimum(positions, max(total - 1, 0))
+
+        if period == 'before':
+            count = positions
+            sum_of_days = self.prefix_sum[positions]
+            sum_of_squares = self.prefix_squares[positions]
+            minimum = np.where(has_records_before, self.prefix_min[before_position] if total else 0, 0)
+            maximum = np.where(has_records_before, self.prefix_max[before_position] if total else 0, 0)
+        elif period == 'after':
+            count = total - positions
+            sum_of_days = self.prefix_sum[-1] - self.prefix_sum[positions]
+            sum_of_squares = self.prefix_squares[-1] - self.prefix_squares[positions]
+            minimum = np.where(has_records_after, self.suffix_min[after_position] if total else 0, 0)
+            maximum = np.where(has_records_after, self.suffix_max[after_position] if total else 0, 0)
+        else:
+            raise ValueError("Invalid period. Use 'before' or 'after'.")
+
+        # The histogram after a cutoff is the one of every case minus the one before it
+        histograms = self.prefix_histograms(np.append(positions, total))
+        every_case = histograms.pop()
+        if period == 'after':
+            histograms = [IntegerHistogram(every_case.counts - histogram.counts) for histogram in histograms]
+        quantiles = np.array([[histogram.quantile(q) if histogram.total else 0 for q in (0.5, 0.25, 0.75)] for histogram in histograms]).reshape(-1, 3)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average = np.where(count > 0, sum_of_days / count, 0)
+            variance = (sum_of_squares - sum_of_days.astype(np.float64) ** 2 / count) / (count - 1)
+        # Same conventions of analyze_case_days_open: 0 without records and NaN with a single one
+        std_dev = np.where(count > 1, np.sqrt(np.maximum(variance, 0)), np.where(count == 1, np.nan, 0))
+
+        return pd.DataFrame({
+            'total_records': count,
+            'sum_of_days': sum_of_days,
+            'average_days': average,
+            'std_dev': std_dev,
+            'median': quantiles[:, 0],
+            'q1': quantiles[:, 1],
+            'q3': quantiles[:, 2],
+            'min': minimum,
+            'max': maximum,
+        }, index=pd.Index(np.atleast_1d(date_limits), name='date_limit'))
+
+
+@instrument()
+def analyze_case_days_open(df: pd.DataFrame, date_limit: str, period: str = 'before', index: CaseDurationIndex | None = None) -> dict:
     """Analyzes the difference in days for each case and returns statistical information 
     for cases either before or after a given date limit (in this case, consider the day of the end).
 
@@ -10,6 +235,7 @@ def analyze_case_days_open(df: pd.DataFrame, date_limit: str, period: str = 'bef
         df (pd.DataFrame): The DataFrame containing the data.
         date_limit (str): The date limit in the format 'YYYY-MM-DD'
         period (str, optional): Defines whether to analyze 'before' or 'after' the date limit. Default is 'before'.
+        index (CaseDurationIndex | None, optional): Index already built from df, to reuse between calls. Default is None.
 
     Raises:
         ValueError: Raises if required columns are missing
@@ -26,51 +252,30 @@ def analyze_case_days_open(df: pd.DataFrame, date_limit: str, period: str = 'bef
         if col not in df.columns:
             raise ValueError(f"Missing required column: {col}")
 
-    # Handle duplicate index if any
-    if df.index.duplicated().any():
-        df = df[~df.index.duplicated(keep='first')]
+    if period not in ('before', 'after'):
+        raise ValueError("Invalid period. Use 'before' or 'after'.")
 
-    # Ensure column names are unique
-    df = df.loc[:, ~df.columns.duplicated()]
+    # The dates are parsed only once, and the cases are sorted by the notification date
+    if index is None:
+        index = CaseDurationIndex.from_frame(df)
 
-    # Reset index to avoid issues with index duplication
-    df = df.reset_index(drop=True)
+    days = index.days_in(date_limit, period)
 
-    # Convert date_limit to datetime and check validity
-    try:
-        date_limit = pd.to_datetime(date_limit)
-    except ValueError:
-        raise ValueError("Invalid date format for date_limit. Use 'YYYY-MM-DD'.")
-
-    # Calculate the difference in days for each record
-    df['number of days case open'] = (pd.to_datetime(df['DT_ENCERRA']) - pd.to_datetime(df['DT_NOTIFIC'])).dt.days
-    
-    # Remove rows where the number of days is negative
-    df = df[df['number of days case open'] >= 0]
-
-    # Filter records based on the 'period' parameter
-    if period == 'before':
-        df_filtered = df[pd.to_datetime(df['DT_NOTIFIC']) <= date_limit]
-    elif period == 'after':
-        df_filtered = df[pd.to_datetime(df['DT_NOTIFIC']) > date_limit]
-    else:
-        raise ValueError("Invalid period. Use 'before' or 'after'.")
-    
     # Count the number of records
-    record_count = df_filtered.shape[0]
+    record_count = len(days)
 
     # Calculate sum and average
-    sum_of_days = df_filtered['number of days case open'].sum()
+    sum_of_days = days.sum()
     average_days = sum_of_days / record_count if record_count > 0 else 0  # Avoid division by zero
 
     # Calculate other statistics
     stats = {
-        'std_dev': df_filtered['number of days case open'].std() if record_count > 0 else 0,
-        'median': df_filtered['number of days case open'].median() if record_count > 0 else 0,
-        'q1': df_filtered['number of days case open'].quantile(0.25) if record_count > 0 else 0,
-        'q3': df_filtered['number of days case open'].quantile(0.75) if record_count > 0 else 0,
-        'min': df_filtered['number of days case open'].min() if record_count > 0 else 0,
-        'max': df_filtered['number of days case open'].max() if record_count > 0 else 0,
+        'std_dev': (days.std(ddof=1) if record_count > 1 else np.nan) if record_count > 0 else 0,
+        'median': np.median(days) if record_count > 0 else 0,
+        'q1': np.quantile(days, 0.25) if record_count > 0 else 0,
+        'q3': np.quantile(days, 0.75) if record_count > 0 else 0,
+        'min': days.min() if record_count > 0 else 0,
+        'max': days.max() if record_count > 0 else 0,
         'total_records': record_count,
         'sum_of_days': sum_of_days,
         'average_days': average_days
@@ -79,40 +284,132 @@ def analyze_case_days_open(df: pd.DataFrame, date_limit: str, period: str = 'bef
     return stats
 
 
-def hypothesis5(df: pd.DataFrame):
-    columns_list = ['DT_NOTIFIC', 'DT_SIN_PRI', 'DT_INVEST', 'DT_CHIK_S1', 'DT_CHIK_S2', 'DT_PRNT', 
-                    'DT_SORO', 'DT_NS1', 'DT_VIRAL', 'DT_PCR', 'DT_INTERNA', 'DT_OBITO', 
-                    'DT_ENCERRA', 'DT_ALRM', 'DT_GRAV', 'DT_DIGITA']
+class CaseDaysOpen(Aggregation):
+    """Streaming version of analyze_case_days_open. Keeps one IntegerHistogram of the days each case stayed open
+    per (year of notification, UF), so the memory is constant with the data size and the histograms can be merged
+    across years and UFs after the fact
+    """
+    columns = ['DT_NOTIFIC', 'DT_ENCERRA', 'SIGLA_UF']
+
+    def __init__(self, date_limit: str, period: str = 'before'):
+        if period not in ('before', 'after'):
+            raise ValueError("Invalid period. Use 'before' or 'after'.")
+        self.date_limit = _date_limit_offsets(date_limit)[0]
+        self.period = period
+
+    def initial(self) -> dict:
+        return {}
+
+    def partial(self, chunk: pd.DataFrame) -> dict:
+        offsets = date_offsets(chunk, ['DT_NOTIFIC', 'DT_ENCERRA'])
+        notification = offsets['DT_NOTIFIC']
+        days = date_interval(notification, offsets['DT_ENCERRA'])
+
+        valid = (days >= 0) & ((notification <= self.date_limit) if self.period == 'before' else (notification > self.date_limit))
+
+        years = notification[valid].astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        ufs = chunk['SIGLA_UF'].to_numpy()[valid] if 'SIGLA_UF' in chunk.columns else np.full(valid.sum(), None)
+        groups = pd.DataFrame({'year': years, 'uf': ufs, 'days': days[valid].astype(np.int64)})
+
+        return {
+            key: IntegerHistogram().add(group['days'].to_numpy())
+            for key, group in groups.groupby(['year', 'uf'], dropna=False, observed=True)
+        }
+
+    def merge(self, left: dict, right: dict) -> dict:
+        for key, histogram in right.items():
+            left[key] = left[key].merge(histogram) if key in left else histogram
+        return left
+
+
+def merge_case_days_histograms(histograms: dict, by: str | None = None) -> dict:
+    """Merges the (year, UF) histograms of CaseDaysOpen
+
+    Args:
+        histograms (dict): Histograms by (year, UF)
+        by (str | None, optional): 'year', 'uf' or None to merge everything. Defaults to None.
+
+    Returns:
+        dict: Histograms by year or UF, or a single histogram under the None key
+    """
+    position = {'year': 0, 'uf': 1, None: None}[by]
+    merged = {}
+    for key, histogram in histograms.items():
+        group = None if position is None else key[position]
+        merged[group] = merged[group].merge(histogram) if group in merged else histogram
+    return merged
 
-    df_date = df[columns_list]
 
-    # Handle duplicate index if any
-    if df_date.index.duplicated().any():
-        df_date = df_date[~df_date.index.duplicated(keep='first')]
+class CaseDaysByMonth(Aggregation):
+    """Aggregated version of the DataFrames of hypothesis5, for the plots: one IntegerHistogram of the days each
+    case stayed open per (month of notification, did NS1), instead of one row per notification
+    """
+    columns = ['DT_NOTIFIC', 'DT_ENCERRA', 'DT_NS1']
 
-    # Ensure column names are unique
-    df_date = df_date.loc[:, ~df_date.columns.duplicated()]
+    def initial(self) -> dict:
+        return {}
 
-    # Reset index to avoid issues with index duplication
-    df_date = df_date.reset_index(drop=True)
+    def partial(self, chunk: pd.DataFrame) -> dict:
+        offsets = date_offsets(chunk, self.columns)
+        notification = offsets['DT_NOTIFIC']
+        days = date_interval(notification, offsets['DT_ENCERRA'])
 
-    # List of columns to check and count (exams)
-    columns = ['DT_CHIK_S1', 'DT_CHIK_S2', 'DT_SORO', 'DT_NS1', 'DT_PRNT', 'DT_VIRAL', 'DT_PCR', 'DT_ALRM', 'DT_GRAV']
+        valid = days >= 0
+        months = notification[valid].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        did_ns1 = offsets['DT_NS1'][valid] != NAT_OFFSET if 'DT_NS1' in offsets else np.zeros(valid.sum(), dtype=bool)
+        groups = pd.DataFrame({'month': months, 'did_ns1': did_ns1, 'days': days[valid].astype(np.int64)})
 
-    # Using the data to calculate the 3 most taken
-    top_3_results_numpy = top_3_counts_numpy(df_date, columns)
+        return {
+            (np.datetime64(int(month), 'M'), bool(ns1)): IntegerHistogram().add(group['days'].to_numpy())
+            for (month, ns1), group in groups.groupby(['month', 'did_ns1'])
+        }
 
-    # Filter rows where DT_NS1 is not NaN
-    df_filtered_to_ns1 = df_date.dropna(subset=['DT_NS1'])
+    def merge(self, left: dict, right: dict) -> dict:
+        for key, histogram in right.items():
+            left[key] = left[key].merge(histogram) if key in left else histogram
+        return left
 
-    # Calculate number of rows with non-null DT_NS1
-    rows_did_ns1 = df_filtered_to_ns1.shape[0]
 
-    df['number of days case open'] = (pd.to_datetime(df['DT_ENCERRA']) - pd.to_datetime(df['DT_NOTIFIC'])).dt.days
-    df_to_plot = df[['number of days case open', 'DT_NOTIFIC']]
+@memoize(files=total_dataset_files)
+def stream_case_days_open(date_limit: str, period: str = 'before', by: str | None = None) -> dict:
+    """Same statistics of analyze_case_days_open over the total dataset, computed chunk by chunk
 
-    df_filtered_to_ns1['number of days case open'] = (pd.to_datetime(df_filtered_to_ns1['DT_ENCERRA']) - pd.to_datetime(df_filtered_to_ns1['DT_NOTIFIC'])).dt.days
-    df_filtered_to_ns1_plot = df_filtered_to_ns1[['DT_NS1', 'number of days case open']]
+    Args:
+        date_limit (str): The date limit in the format 'YYYY-MM-DD'
+        period (str, optional): Defines whether to analyze 'before' or 'after' the date limit. Default is 'before'.
+        by (str | None, optional): 'year' or 'uf' to get the statistics of each group. Default is None.
+
+    Returns:
+        dict: The statistics, or the statistics of each group when 'by' is given
+    """
+    histograms = aggregate_total_dataset({'days': CaseDaysOpen(date_limit, period)})['days']
+    merged = merge_case_days_histograms(histograms, by)
+
+    if by is None:
+        return merged.get(None, IntegerHistogram()).stats()
+    return {group: histogram.stats() for group, histogram in merged.items()}
+
+
+@instrument()
+def hypothesis5(df: pd.DataFrame):
+    # Every date column is parsed only once
+    offsets = date_offsets(df, ['DT_NOTIFIC', 'DT_ENCERRA', 'DT_NS1'])
+    days_case_open = date_interval(offsets['DT_NOTIFIC'], offsets['DT_ENCERRA'])
+
+    # Every row is plotted, with the index of the DataFrame
+    df_to_plot = pd.DataFrame({
+        'number of days case open': days_case_open,
+        'DT_NOTIFIC': _first_column(df, 'DT_NOTIFIC').to_numpy(),
+    }, index=df.index)
+
+    # Rows where DT_NS1 is not NaN, among the first row of each duplicated index (numbered from 0)
+    rows = _unique_rows(df)
+    did_ns1 = np.flatnonzero(offsets['DT_NS1'][rows] != NAT_OFFSET)
+
+    df_filtered_to_ns1_plot = pd.DataFrame({
+        'DT_NS1': _first_column(df, 'DT_NS1')[rows].to_numpy()[did_ns1],
+        'number of days case open': days_case_open[rows][did_ns1],
+    }, index=did_ns1)
 
     # Returns the DataFrames to plot
     return df_to_plot, df_filtered_to_ns1_plot
@@ -147,5 +444,81 @@ def top_3_counts_numpy(df: pd.DataFrame, columns: list|str) -> list[tuple]:
     
     return top_3
 
-df = pd.read_csv('sinan_dengue_sample_total.csv', low_memory=False)
-#print(analyze_case_days_open(df, date_limit='30/11/2022'))
\ No newline at end of file
+@memoize(files=total_dataset_files)
+def top_3_exams_streaming() -> list[tuple]:
+    """Same as top_3_counts_numpy over the exam columns, but computed chunk by chunk over the total dataset
+
+    Returns:
+        list[tuple]: A list of tuples with the column name and its count of non-null values, for the top 3 most taken exams
+    """
+    counts = aggregate_total_dataset({column: Count(column) for column in EXAM_DATE_COLUMNS})
+
+    return top_3_from_counts(counts)
+
+
+def top_3_from_counts(counts: dict) -> list[tuple]:
+    """Top 3 most taken exams from the count of non-null values of each exam column
+
+    Args:
+        counts (dict): Count of each column
+
+    Returns:
+        list[tuple]: A list of tuples with the column name and its count, for the top 3 most taken exams
+    """
+    return sorted(counts.items(), key=lambda x: x[1], reverse=True)[:3]
+
+
+def case_days_open_from_histograms(results: dict) -> dict:
+    """Statistics of analyze_case_days_open from the (year, UF) histograms of CaseDaysOpen
+
+    Args:
+        results (dict): Histograms of each period, by name
+
+    Returns:
+        dict: The statistics of each period
+    """
+    return {name: merge_case_days_histograms(histograms).get(None, IntegerHistogram()).stats() for name, histograms in results.items()}
+
+
+def register_hypothesis5(scheduler, date_limit: str = '2022-11-30') -> None:
+    """Registers the streaming parts of hypothesis 5 in a Scheduler, to run in the same scan of the other hypotheses
+
+    Args:
+        scheduler (Scheduler): The scheduler
+        date_limit (str, optional): The date limit of the days each case stayed open. Defaults to '2022-11-30'.
+    """
+    scheduler.register('hypothesis5.top_3_exams', {column: Count(column) for column in EXAM_DATE_COLUMNS}, top_3_from_counts)
+    scheduler.register(
+        'hypothesis5.case_days_open',
+        {period: CaseDaysOpen(date_limit, period) for period in ('before', 'after')},
+        case_days_open_from_histograms,
+    )
+
+
+@memoize(files=total_dataset_files)
+def analyze_total_case_days_open(date_limit: str, period: str = 'before') -> dict:
+    """analyze_case_days_open over the total dataset, with the result cached on disk
+
+    Args:
+        date_limit (str): The date limit in the format 'YYYY-MM-DD'
+        period (str, optional): Defines whether to analyze 'before' or 'after' the date limit. Default is 'before'.
+
+    Returns:
+        dict: A dictionary containing the calculated statistics.
+    """
+    return analyze_case_days_open(processing_total_dataset(['DT_NOTIFIC', 'DT_ENCERRA', 'SG_UF_NOT']), date_limit, period)
+
+
+@memoize(files=total_dataset_files)
+def hypothesis5_total():
+    """hypothesis5 over the total dataset, with the DataFrames to plot cached on disk
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The DataFrames to plot
+    """
+    return hypothesis5(processing_total_dataset())
+
+
+if __name__ == '__main__':
+    df_to_plot, df_filtered_to_ns1_plot = hypothesis5_total()
+    print(f'{len(df_to_plot)} casos, {len(df_filtered_to_ns1_plot)} com exame NS1')
\ No newline at end of file
@@ -0,0 +1,375 @@
+"""Servidor de consultas que mantém o dataset filtrado em memória entre as análises, em HTTP na máquina local"""
+import argparse
+import collections
+import json
+import math
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import QUERY_LATENCY_WINDOW, QUERY_SERVER_HOST, QUERY_SERVER_PORT, REQUIRED_COLUMNS
+from src.filtering import Predicate, filter_dataset
+from src.hypothesis.hypothesis_5 import EXAM_DATE_COLUMNS, CaseDurationIndex, analyze_case_days_open
+from src.utils.instrumentation import span
+from src.utils.reading import column_store_frame
+from src.utils import statistic
+
+QUERIES: dict[str, Callable] = {}  # Function of each query, called with the service and the parameters of the request
+
+
+class UnknownQueryError(LookupError):
+    """Raised when a query is not registered in QUERIES"""
+
+
+def query(name: str) -> Callable:
+    """Decorator that registers a function as a query of the server
+
+    Args:
+        name (str): Name of the query
+
+    Returns:
+        Callable: The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        QUERIES[name] = func
+        return func
+
+    return decorator
+
+
+class QueryMetrics:
+    """Calls, errors and latencies of each query, shared by the threads of the server"""
+
+    def __init__(self, window: int = QUERY_LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls = collections.Counter()
+        self._errors = collections.Counter()
+        self._total = collections.Counter()
+        self._latencies: dict[str, collections.deque] = {}
+
+    def record(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            self._calls[name] += 1
+            self._errors[name] += error
+            self._total[name] += seconds
+            self._latencies.setdefault(name, collections.deque(maxlen=self.window)).append(seconds)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Metrics of each query
+
+        Returns:
+            dict[str, dict]: calls, errors, mean, p50, p95 and max (in seconds, the percentiles over the latest window calls)
+        """
+        with self._lock:
+            latencies = {name: np.array(values) for name, values in self._latencies.items()}
+            calls, errors, total = dict(self._calls), dict(self._errors), dict(self._total)
+
+        return {
+            name: {
+                'calls': calls[name],
+                'errors': errors[name],
+                'mean': total[name] / calls[name],
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max()),
+            }
+            for name, values in latencies.items()
+        }
+
+
+class QueryService:
+    """The filtered dataset, loaded once, and the indexes built over it. The queries only read them, so they can
+    run concurrently in the threads of the server
+    """
+
+    def __init__(self, df: pd.DataFrame | None = None, usecols: list = REQUIRED_COLUMNS, predicate: Predicate | None = None):
+        """
+        Args:
+            df (pd.DataFrame | None, optional): Dataset already loaded. Defaults to None (the column store of the total dataset).
+            usecols (list, optional): Columns opened from the column store. Defaults to REQUIRED_COLUMNS.
+            predicate (Predicate | None, optional): Filter of the rows. Defaults to None.
+        """
+        self.usecols = usecols
+        self.predicate = predicate
+        self.metrics = QueryMetrics()
+        self._frame = df
+        self._case_duration_index = None
+        self._lock = threading.Lock()
+
+    def load(self) -> 'QueryService':
+        """Loads the dataset and builds the indexes, so the first query is as fast as the others
+
+        Returns:
+            QueryService: The service
+        """
+        self.case_duration_index
+        return self
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    with span('query_server.load') as current:
+                        df = column_store_frame(self.usecols)
+                        if self.predicate is not None:
+                            df = filter_dataset(df, self.predicate)
+                        current.add_rows(len(df))
+                    self._frame = df
+        return self._frame
+
+    @property
+    def case_duration_index(self) -> CaseDurationIndex:
+        frame = self.frame
+        if self._case_duration_index is None:
+            with self._lock:
+                if self._case_duration_index is None:
+                    self._case_duration_index = CaseDurationIndex.from_frame(frame)
+        return self._case_duration_index
+
+    def column(self, column: str) -> pd.Series:
+        if column not in self.frame.columns:
+            raise TypeError(f"Missing column in DataFrame: {column}")
+        return self.frame[column]
+
+    def run(self, name: str, params: dict | None = None):
+        """Runs a query, recording its latency
+
+        Args:
+            name (str): Name of the query
+            params (dict | None, optional): Keyword arguments of the query. Defaults to None.
+
+        Raises:
+            UnknownQueryError: Raises if the query is not registered
+
+        Returns:
+            The result of the query
+        """
+        if name not in QUERIES:
+            raise UnknownQueryError(f"Consulta desconhecida: {name}. Use uma de {sorted(QUERIES)}")
+
+        start = time.perf_counter()
+        error = False
+        try:
+            with span(f'query.{name}'):
+                return QUERIES[name](self, **(params or {}))
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.record(name, time.perf_counter() - start, error)
+
+
+@query('analyze_case_days_open')
+def _analyze_case_days_open(service: QueryService, date_limit: str, period: str = 'before') -> dict:
+    return analyze_case_days_open(service.frame, date_limit, period, index=service.case_duration_index)
+
+
+@query('cutoff_stats')
+def _cutoff_stats(service: QueryService, date_limits: list, period: str = 'before') -> pd.DataFrame:
+    return service.case_duration_index.cutoff_stats(date_limits, period)
+
+
+@query('top_3_counts_numpy')
+def _top_3_counts_numpy(service: QueryService, columns: list | None = None) -> list[tuple]:
+    if columns is None:
+        columns = [column for column in EXAM_DATE_COLUMNS if column in service.frame.columns]
+    return statistic.top_3_counts_numpy(service.frame, columns)
+
+
+@query('chi_square_test')
+def _chi_square_test(service: QueryService, column_1: str, column_2: str) -> float:
+    return statistic.chi_square_test(service.column(column_1), service.column(column_2))
+
+
+@query('crammer_V')
+def _crammer_V(service: QueryService, column_1: str, column_2: str) -> float:
+    return statistic.crammer_V(service.column(column_1), service.column(column_2))
+
+
+@query('contigency_coefficient')
+def _contigency_coefficient(service: QueryService, column_1: str, column_2: str) -> float:
+    return statistic.contigency_coefficient(service.column(column_1), service.column(column_2))
+
+
+@query('contingency_measures')
+def _contingency_measures(service: QueryService, column_1: str, column_2: str) -> dict:
+    return statistic.contingency_measures(service.column(column_1), service.column(column_2))
+
+
+@query('contingency_significance')
+def _contingency_significance(service: QueryService, column_1: str, column_2: str, resamples: int = statistic.MONTE_CARLO_RESAMPLES,
+                              seed: int | None = None) -> dict:
+    return statistic.contingency_significance(service.column(column_1), service.column(column_2), resamples, seed)
+
+
+@query('association_matrix')
+def _association_matrix(service: QueryService, columns: list | None = None, measure: str = 'crammer_V') -> pd.DataFrame:
+    return statistic.association_matrix(service.frame, columns, measure)
+
+
+def to_json(value):
+    """Converts a result to the types of JSON: NumPy scalars and arrays, Series, DataFrames (in the 'split' orientation)
+    and timestamps. NaN becomes null
+
+    Args:
+        value: Result of a query
+
+    Returns:
+        The converted value
+    """
+    if isinstance(value, pd.DataFrame):
+        return to_json(value.to_dict(orient='split'))
+    if isinstance(value, pd.Series):
+        return to_json(value.to_dict())
+    if isinstance(value, dict):
+        return {str(to_json(key)): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """GET /queries and /metrics, and POST /query/<name> with the parameters in a JSON object"""
+
+    server: 'QueryServer'
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == '/queries':
+            self._send(200, {'queries': sorted(QUERIES)})
+        elif self.path == '/metrics':
+            self._send(200, self.server.service.metrics.snapshot())
+        else:
+            self._send(404, {'error': f'Caminho desconhecido: {self.path}'})
+
+    def do_POST(self) -> None:
+        prefix, _, name = self.path.partition('/query/')
+        if prefix or not name:
+            self._send(404, {'error': f'Caminho desconhecido: {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError('Os parâmetros devem ser um objeto JSON')
+
+            start = time.perf_counter()
+            result = self.server.service.run(name, params)
+            self._send(200, {'result': to_json(result), 'seconds': time.perf_counter() - start})
+        except UnknownQueryError as e:
+            self._send(404, {'error': str(e)})
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+    def log_message(self, format: str, *args) -> None:
+        # The latencies are in the metrics, a line per request would only slow the server down
+        pass
+
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server of a QueryService, with one thread per request"""
+
+    daemon_threads = True
+
+    def __init__(self, service: QueryService, host: str = QUERY_SERVER_HOST, port: int = QUERY_SERVER_PORT):
+        self.service = service
+        super().__init__((host, port), QueryRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_server(service: QueryService, host: str = QUERY_SERVER_HOST, port: int = QUERY_SERVER_PORT) -> QueryServer:
+    """Starts a server in a background thread of this process. Stop it with server.shutdown()
+
+    Args:
+        service (QueryService): Service with the dataset
+        host (str, optional): Address to listen on. Defaults to QUERY_SERVER_HOST.
+        port (int, optional): Port, 0 to pick a free one. Defaults to QUERY_SERVER_PORT.
+
+    Returns:
+        QueryServer: The running server
+    """
+    server = QueryServer(service, host, port)
+    threading.Thread(target=server.serve_forever, name='query-server', daemon=True).start()
+    return server
+
+
+class QueryClient:
+    """Client of a QueryServer"""
+
+    def __init__(self, url: str = f'http://{QUERY_SERVER_HOST}:{QUERY_SERVER_PORT}', timeout: float | None = None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path: str, params: dict | None = None) -> dict:
+        data = None if params is None else json.dumps(params).encode()
+        request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{e.code}: {json.loads(e.read()).get('error')}") from None
+
+    def query(self, name: str, **params):
+        """Runs a query in the server
+
+        Args:
+            name (str): Name of the query
+            **params: Parameters of the query
+
+        Raises:
+            RuntimeError: Raises with the message of the server when the query fails
+
+        Returns:
+            The result, converted by to_json
+        """
+        return self._request(f'/query/{name}', params)['result']
+
+    def queries(self) -> list[str]:
+        return self._request('/queries')['queries']
+
+    def metrics(self) -> dict[str, dict]:
+        return self._request('/metrics')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keeps the total dataset in memory and answers the queries of the analyses')
+    parser.add_argument('--host', default=QUERY_SERVER_HOST)
+    parser.add_argument('--port', type=int, default=QUERY_SERVER_PORT)
+    args = parser.parse_args()
+
+    service = QueryService().load()
+    server = QueryServer(service, args.host, args.port)
+    print(f'{len(service.frame)} linhas em memória, servindo em {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,49 @@
+"""Roda todas as hipóteses registradas com uma única leitura do dataset"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.getcwd())
+from src.config import CHUNKS_SIZE, OUTPUT_FOLDER
+from src.hypothesis.hypothesis_5 import register_hypothesis5
+from src.utils.scheduler import Scheduler
+
+REGISTRATIONS = [  # Functions that register the tasks of each hypothesis
+    register_hypothesis5,
+]
+
+
+def run_all(chunksize: int = CHUNKS_SIZE, backend: str = 'thread', workers: int | None = None) -> dict:
+    """Registers every hypothesis in a Scheduler and runs them over one scan of the total dataset
+
+    Args:
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+        backend (str, optional): 'thread' or 'process', the pool of the finalizations. Defaults to 'thread'.
+        workers (int | None, optional): Number of workers of the pool. Defaults to None (one per CPU).
+
+    Returns:
+        dict: Output of each task
+    """
+    scheduler = Scheduler()
+    for register in REGISTRATIONS:
+        register(scheduler)
+    return scheduler.run(chunksize, backend, workers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs all the hypotheses with a single scan of the dataset')
+    parser.add_argument('--chunksize', type=int, default=CHUNKS_SIZE)
+    parser.add_argument('--backend', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    results = run_all(args.chunksize, args.backend, args.workers)
+
+    os.makedirs(OUTPUT_FOLDER(), exist_ok=True)
+    filepath = os.path.join(OUTPUT_FOLDER(), 'hypotheses.json')
+    with open(filepath, 'w') as file:
+        json.dump(results, file, indent=4, default=str)
+
+    for name, result in results.items():
+        print(name, result)
+    print(f'Resultados salvos em {filepath}')
@@ -0,0 +1,180 @@
+"""Módulo que contém a suíte de benchmarks dos leitores, das estatísticas e das hipóteses sobre dados sintéticos"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, OUTPUT_FOLDER, REQUIRED_COLUMNS, SYMPTOM_COLUMNS, CHUNKS_SIZE
+from src.utils.cache import convert_to_cache, read_cached_dataset
+from src.utils.random import write_sinan_csv
+from src.utils.reading import read_dataset_chunks
+from src.utils.schema import concat_chunks
+from src.utils.statistic import association_matrix, contingency_measures
+from src.utils.cooccurrence import count_symptom_sets
+from src.hypothesis.hypothesis_5 import CaseDurationIndex, analyze_case_days_open, hypothesis5
+
+BENCHMARK_SIZES = {'10k': 10**4, '1m': 10**6, '10m': 10**7}  # Rows of each synthetic dataset
+
+REGRESSION_TOLERANCE = 0.25  # Slowdown, relative to the baseline, that counts as a regression
+
+
+def BENCHMARK_FOLDER() -> str:
+    """Function that returns the path where the synthetic datasets are written
+
+    Returns:
+        str: Benchmark datasets folder's path
+    """
+    return os.path.join(DATASET_LOCAL(), 'benchmark')
+
+
+def BASELINE_FILE() -> str:
+    """Function that returns the path of the saved baseline
+
+    Returns:
+        str: Baseline file's path
+    """
+    return os.path.join(OUTPUT_FOLDER(), 'benchmarks', 'baseline.json')
+
+
+def synthetic_dataset(size: str) -> str:
+    """Returns the path of the synthetic CSV of a size, writing it (with a fixed seed) the first time
+
+    Args:
+        size (str): One of the keys of BENCHMARK_SIZES
+
+    Returns:
+        str: CSV file path
+    """
+    filepath = os.path.join(BENCHMARK_FOLDER(), f'sinan_synthetic_{size}.csv')
+    if not os.path.exists(filepath):
+        os.makedirs(BENCHMARK_FOLDER(), exist_ok=True)
+        write_sinan_csv(filepath, BENCHMARK_SIZES[size], seed=42)
+    return filepath
+
+
+def _best_time(function: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        initial_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - initial_time)
+    return min(times)
+
+
+def benchmark_size(size: str, repeat: int = 3) -> dict[str, float]:
+    """Measures the readers, the statistics and the hypothesis functions over the synthetic dataset of a size
+
+    Args:
+        size (str): One of the keys of BENCHMARK_SIZES
+        repeat (int, optional): How many times each case is measured (the best time is kept). Defaults to 3.
+
+    Returns:
+        dict[str, float]: Best time, in seconds, of each case
+    """
+    filepath = synthetic_dataset(size)
+    convert_to_cache(filepath)
+
+    results = {'read_csv': _best_time(lambda: concat_chunks(read_dataset_chunks(filepath, REQUIRED_COLUMNS, CHUNKS_SIZE, use_cache=False)), repeat)}
+    results['read_cache'] = _best_time(lambda: read_cached_dataset(filepath, REQUIRED_COLUMNS), repeat)
+
+    df = read_cached_dataset(filepath, REQUIRED_COLUMNS)
+
+    results['contingency_measures'] = _best_time(lambda: contingency_measures(df['FEBRE'], df['CLASSI_FIN']), repeat)
+    results['association_matrix'] = _best_time(lambda: association_matrix(df), repeat)
+    results['count_symptom_sets'] = _best_time(lambda: count_symptom_sets(df, SYMPTOM_COLUMNS, group_by='CLASSI_FIN'), repeat)
+    results['analyze_case_days_open'] = _best_time(lambda: analyze_case_days_open(df, '2023-01-01', 'before'), repeat)
+
+    index = CaseDurationIndex.from_frame(df)
+    cutoffs = [f'{year}-{month:02d}-01' for year in range(2021, 2025) for month in range(1, 13)]
+    results['cutoff_stats_48'] = _best_time(lambda: index.cutoff_stats(cutoffs, 'before'), repeat)
+    results['hypothesis5'] = _best_time(lambda: hypothesis5(df), repeat)
+
+    return {f'{size}/{name}': seconds for name, seconds in results.items()}
+
+
+def run_benchmarks(sizes: list[str], repeat: int = 3) -> dict[str, float]:
+    """Runs the benchmarks of every size
+
+    Args:
+        sizes (list[str]): Keys of BENCHMARK_SIZES
+        repeat (int, optional): How many times each case is measured. Defaults to 3.
+
+    Returns:
+        dict[str, float]: Best time, in seconds, of each 'size/case'
+    """
+    results = {}
+    for size in sizes:
+        results.update(benchmark_size(size, repeat))
+    return results
+
+
+def save_baseline(results: dict[str, float]) -> str:
+    """Saves the results as the baseline, keeping the cases of the old baseline that were not measured again
+
+    Args:
+        results (dict[str, float]): Results of run_benchmarks
+
+    Returns:
+        str: Baseline file path
+    """
+    baseline = load_baseline()
+    baseline.update(results)
+
+    os.makedirs(os.path.dirname(BASELINE_FILE()), exist_ok=True)
+    with open(BASELINE_FILE(), 'w') as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+
+    return BASELINE_FILE()
+
+
+def load_baseline() -> dict[str, float]:
+    """Loads the saved baseline
+
+    Returns:
+        dict[str, float]: The baseline, or an empty dict if none was saved
+    """
+    if not os.path.exists(BASELINE_FILE()):
+        return {}
+    with open(BASELINE_FILE()) as file:
+        return json.load(file)
+
+
+def find_regressions(results: dict[str, float], baseline: dict[str, float], tolerance: float = REGRESSION_TOLERANCE) -> dict[str, float]:
+    """Finds the cases that got slower than the baseline by more than the tolerance
+
+    Args:
+        results (dict[str, float]): Results of run_benchmarks
+        baseline (dict[str, float]): Saved baseline
+        tolerance (float, optional): Accepted slowdown. Defaults to REGRESSION_TOLERANCE.
+
+    Returns:
+        dict[str, float]: Ratio between the new time and the baseline of each regression
+    """
+    return {
+        case: seconds / baseline[case]
+        for case, seconds in results.items()
+        if case in baseline and seconds > baseline[case] * (1 + tolerance)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks sobre datasets sintéticos do SINAN")
+    parser.add_argument('--sizes', nargs='+', default=['10k', '1m'], choices=list(BENCHMARK_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-baseline', action='store_true', help="Salva os resultados como a nova baseline")
+    arguments = parser.parse_args()
+
+    results = run_benchmarks(arguments.sizes, arguments.repeat)
+    for case, seconds in results.items():
+        print(f"{case}: {seconds:.4f}s")
+
+    regressions = find_regressions(results, load_baseline())
+    for case, ratio in regressions.items():
+        print(f"REGRESSÃO {case}: {ratio:.2f}x mais lento que a baseline")
+
+    if arguments.save_baseline:
+        print(f"Baseline salva em {save_baseline(results)}")
+
+    sys.exit(1 if regressions else 0)
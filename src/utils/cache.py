@@ -0,0 +1,222 @@
+"""Módulo que contém funções do cache colunar (Parquet) dos datasets do SINAN"""
+import json
+import os
+import sys
+import time
+from typing import Iterator
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, CACHE_FOLDER, CHUNKS_SIZE, TOTAL_DATASET, COLUMNS_SCHEMA
+from src.utils.schema import apply_schema, read_csv_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # The cache is optional, without pyarrow every reader falls back to the CSV
+    pa = None
+    pq = None
+
+
+def cache_available() -> bool:
+    """Checks if the columnar cache can be used in this environment
+
+    Returns:
+        bool: True if pyarrow is installed
+    """
+    return pq is not None
+
+
+def cache_path(filepath: str) -> str:
+    """Returns the path of the Parquet file that caches the given CSV
+
+    Args:
+        filepath (str): CSV file path
+
+    Returns:
+        str: Parquet file path inside the cache folder
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(CACHE_FOLDER(), f'{name}.parquet')
+
+
+def _metadata_path(filepath: str) -> str:
+    return cache_path(filepath) + '.json'
+
+
+def _source_fingerprint(filepath: str) -> dict:
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def is_cache_valid(filepath: str) -> bool:
+    """Checks if the cache of a CSV exists and is not stale (same size and mtime of the source)
+
+    Args:
+        filepath (str): CSV file path
+
+    Returns:
+        bool: True if the cache can be read instead of the CSV
+    """
+    if not cache_available() or not os.path.exists(cache_path(filepath)):
+        return False
+
+    try:
+        with open(_metadata_path(filepath)) as file:
+            metadata = json.load(file)
+        return metadata == _source_fingerprint(filepath)
+    except (OSError, ValueError):
+        return False
+
+
+def _conform_chunk(chunk: pd.DataFrame, numeric_columns: set) -> pd.DataFrame:
+    """Gives every chunk the same types, so all of them fit in a single Parquet schema"""
+    apply_schema(chunk)
+    for column in chunk.columns:
+        if column in COLUMNS_SCHEMA:
+            if COLUMNS_SCHEMA[column] == 'category':
+                # Each chunk has its own categories, so the cache keeps the strings (Parquet encodes them with a dictionary anyway)
+                chunk[column] = chunk[column].astype('string')
+        elif column in numeric_columns:
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+        else:
+            chunk[column] = chunk[column].astype('string')
+    return chunk
+
+
+def convert_to_cache(filepath: str, chunksize: int = CHUNKS_SIZE) -> str:
+    """Converts a CSV file to the typed columnar cache, reading it by chunks
+
+    Args:
+        filepath (str): CSV file path
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+
+    Raises:
+        ImportError: Raises if pyarrow is not installed
+
+    Returns:
+        str: Path of the written Parquet file
+    """
+    if not cache_available():
+        raise ImportError("O cache colunar precisa do pacote pyarrow")
+
+    os.makedirs(CACHE_FOLDER(), exist_ok=True)
+    target = cache_path(filepath)
+    temporary = target + '.tmp'
+    fingerprint = _source_fingerprint(filepath)
+
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+
+    writer = None
+    numeric_columns: set = set()
+    try:
+        for chunk in pd.read_csv(filepath, low_memory=False, chunksize=chunksize, **read_csv_schema(header)):
+            if writer is None:
+                # The types of the first chunk define the schema of the whole file
+                numeric_columns = {column for column in chunk.columns if pd.api.types.is_numeric_dtype(chunk[column])}
+                table = pa.Table.from_pandas(_conform_chunk(chunk, numeric_columns), preserve_index=False)
+                writer = pq.ParquetWriter(temporary, table.schema)
+            else:
+                table = pa.Table.from_pandas(_conform_chunk(chunk, numeric_columns), schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    os.replace(temporary, target)
+    with open(_metadata_path(filepath), 'w') as file:
+        json.dump(fingerprint, file)
+
+    return target
+
+
+def convert_all_datasets() -> list[str]:
+    """Converts every CSV inside the DATA path (yearly files and the unified one) to the cache
+
+    Returns:
+        list[str]: Paths of the written Parquet files
+    """
+    converted = []
+    for filename in sorted(os.listdir(DATASET_LOCAL())):
+        filepath = os.path.join(DATASET_LOCAL(), filename)
+        if filename.endswith('.csv') and not is_cache_valid(filepath):
+            converted.append(convert_to_cache(filepath))
+    return converted
+
+
+def _project(filepath: str, columns: list | None) -> list | None:
+    """Keeps only the requested columns that exist in the cache, in order and without duplicates"""
+    if columns is None:
+        return None
+    available = set(pq.read_schema(cache_path(filepath)).names)
+    return [column for column in dict.fromkeys(columns) if column in available]
+
+
+def read_cached_dataset(filepath: str, columns: list | None = None) -> pd.DataFrame | None:
+    """Reads the cache of a CSV with column projection
+
+    Args:
+        filepath (str): CSV file path
+        columns (list | None, optional): Columns to read. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame | None: The cached dataframe, or None if the cache is missing or stale
+    """
+    if not is_cache_valid(filepath):
+        return None
+    return apply_schema(pd.read_parquet(cache_path(filepath), columns=_project(filepath, columns)))
+
+
+def iter_cached_chunks(filepath: str, columns: list | None = None, chunksize: int = CHUNKS_SIZE) -> Iterator[pd.DataFrame] | None:
+    """Reads the cache of a CSV by chunks, with column projection
+
+    Args:
+        filepath (str): CSV file path
+        columns (list | None, optional): Columns to read. Defaults to None (all columns).
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+
+    Returns:
+        Iterator[pd.DataFrame] | None: Chunks iterator, or None if the cache is missing or stale
+    """
+    if not is_cache_valid(filepath):
+        return None
+
+    parquet_file = pq.ParquetFile(cache_path(filepath))
+    batches = parquet_file.iter_batches(batch_size=chunksize, columns=_project(filepath, columns))
+    return (apply_schema(batch.to_pandas()) for batch in batches)
+
+
+def benchmark_cache(filepath: str, columns: list | None = None, repeat: int = 3) -> dict:
+    """Compares the time to read a dataset from the CSV and from the columnar cache, on the same machine
+
+    Args:
+        filepath (str): CSV file path
+        columns (list | None, optional): Columns to read. Defaults to None (all columns).
+        repeat (int, optional): How many times each reading is measured. Defaults to 3.
+
+    Returns:
+        dict: Best time (in seconds) of each path and the speedup of the cache
+    """
+    if not is_cache_valid(filepath):
+        convert_to_cache(filepath)
+
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+    usecols = [column for column in header if columns is None or column in columns]
+
+    def best_time(function) -> float:
+        times = []
+        for _ in range(repeat):
+            initial_time = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - initial_time)
+        return min(times)
+
+    csv_time = best_time(lambda: pd.read_csv(filepath, usecols=usecols, low_memory=False, **read_csv_schema(usecols)))
+    cache_time = best_time(lambda: read_cached_dataset(filepath, columns))
+
+    return {'csv': csv_time, 'cache': cache_time, 'speedup': csv_time / cache_time}
+
+
+if __name__ == '__main__':
+    for path in convert_all_datasets():
+        print(f"Cache criado: {path}")
+    print(benchmark_cache(os.path.join(DATASET_LOCAL(), TOTAL_DATASET)))
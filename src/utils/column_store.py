@@ -0,0 +1,247 @@
+"""Módulo que contém o armazenamento colunar em arquivos de largura fixa, abertos com np.memmap para serem compartilhados entre processos"""
+import json
+import os
+import shutil
+import sys
+from typing import Iterable
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import COLUMNS_SCHEMA
+
+_NULL_UINT8 = 255  # Null value of the UInt8 columns in the store
+
+_KIND_DTYPES = {  # Dtype of the file of each kind of column
+    'uint8': 'uint8',
+    'datetime': 'int64',
+    'category': 'int16',
+    'float': 'float64',
+}
+
+
+def _metadata_path(folder: str) -> str:
+    return os.path.join(folder, 'metadata.json')
+
+
+def _column_path(folder: str, column: str) -> str:
+    return os.path.join(folder, f'{column}.bin')
+
+
+def _kind(values: pd.Series) -> str:
+    if isinstance(values.dtype, pd.UInt8Dtype):
+        return 'uint8'
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        return 'float'
+    return 'category'
+
+
+def _json_value(value):
+    """Categories as plain Python values, so they fit in the JSON dictionary"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _fixed_categories(column: str, categories: list) -> bool:
+    """Checks if the categories of the column are fixed by a CategoricalDtype of the COLUMNS_SCHEMA"""
+    dtype = COLUMNS_SCHEMA.get(column)
+    return isinstance(dtype, pd.CategoricalDtype) and dtype.categories is not None and list(dtype.categories) == categories
+
+
+class ColumnStoreWriter:
+    """Writes chunks to a column store: a fixed-width binary file per column, and a dictionary for the string
+    and categorical columns. The files are opened only while a chunk is appended, so many stores can be written
+    at the same time. The store is moved to its folder on close
+
+    >>> with ColumnStoreWriter(folder) as writer:
+    ...     writer.append(chunk)
+    """
+
+    def __init__(self, folder: str, source: dict | None = None):
+        self.folder = folder
+        self.source = source
+        self.temporary = folder + '.tmp'
+        self.columns: dict[str, dict] = {}
+        self.dictionaries: dict[str, dict] = {}
+        self.rows = 0
+
+        shutil.rmtree(self.temporary, ignore_errors=True)
+        os.makedirs(self.temporary)
+
+    def _start(self, chunk: pd.DataFrame) -> None:
+        """The first chunk defines the kind of each column"""
+        for column in chunk.columns:
+            kind = _kind(chunk[column])
+            categories = list(chunk[column].dtype.categories) if isinstance(chunk[column].dtype, pd.CategoricalDtype) else []
+            self.columns[column] = {'kind': kind, 'dtype': _KIND_DTYPES[kind]}
+            # The fixed categories of the COLUMNS_SCHEMA (like SIGLA_UF) use the codes width of pandas, so the Categorical
+            # is a view of the file. The other ones (like ID_OCUPA_N) can get new categories in the next chunks
+            if kind == 'category' and _fixed_categories(column, categories) and len(categories) < np.iinfo(np.int8).max:
+                self.columns[column]['dtype'] = 'int8'
+            self.dictionaries[column] = {_json_value(value): code for code, value in enumerate(categories)}
+
+    def append(self, chunk: pd.DataFrame) -> None:
+        """Appends the rows of a chunk, with the same columns of the first one
+
+        Args:
+            chunk (pd.DataFrame): Chunk of the dataset
+
+        Raises:
+            ValueError: Raises if a categorical column has more categories than its codes can hold
+        """
+        if not self.columns:
+            self._start(chunk)
+
+        for column, description in self.columns.items():
+            values = chunk[column]
+            kind = description['kind']
+
+            if kind == 'uint8':
+                data = values.to_numpy(dtype=np.uint8, na_value=_NULL_UINT8)
+            elif kind == 'datetime':
+                data = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            elif kind == 'float':
+                data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                # New values get the next codes of the dictionary, only the categories of the chunk are mapped
+                categorical = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(object).astype('category')
+                dictionary = self.dictionaries[column]
+                for value in categorical.cat.categories:
+                    dictionary.setdefault(_json_value(value), len(dictionary))
+                mapping = np.array([dictionary[_json_value(value)] for value in categorical.cat.categories] + [-1], dtype=np.int64)
+                if len(dictionary) > np.iinfo(description['dtype']).max:
+                    raise ValueError(f"A coluna {column} tem mais categorias do que cabem em {description['dtype']}")
+                data = mapping[categorical.cat.codes.to_numpy()]
+
+            with open(_column_path(self.temporary, column), 'ab') as file:
+                file.write(np.ascontiguousarray(data, dtype=description['dtype']).tobytes())
+
+        self.rows += len(chunk)
+
+    def close(self) -> dict:
+        """Writes the metadata and moves the store to its folder (replacing the old one)
+
+        Returns:
+            dict: Metadata of the store
+        """
+        for column, description in self.columns.items():
+            if description['kind'] == 'category':
+                description['categories'] = list(self.dictionaries[column])
+
+        metadata = {'rows': self.rows, 'columns': self.columns, 'source': self.source}
+        with open(_metadata_path(self.temporary), 'w') as file:
+            json.dump(metadata, file)
+
+        shutil.rmtree(self.folder, ignore_errors=True)
+        os.replace(self.temporary, self.folder)
+        return metadata
+
+    def abort(self) -> None:
+        """Discards the rows written so far, keeping the old store"""
+        shutil.rmtree(self.temporary, ignore_errors=True)
+
+    def __enter__(self) -> 'ColumnStoreWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc) -> bool:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_column_store(chunks: Iterable[pd.DataFrame], folder: str, source: dict | None = None) -> dict:
+    """Writes the chunks to a column store, holding only one chunk in memory at a time
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Chunks of the dataset, all of them with the same columns
+        folder (str): Folder of the store (it is replaced)
+        source (dict | None, optional): Fingerprint of the source data, saved in the metadata. Defaults to None.
+
+    Returns:
+        dict: Metadata of the store
+    """
+    writer = ColumnStoreWriter(folder, source)
+    try:
+        for chunk in chunks:
+            writer.append(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def load_metadata(folder: str) -> dict | None:
+    """Loads the metadata of a store
+
+    Args:
+        folder (str): Folder of the store
+
+    Returns:
+        dict | None: The metadata, or None if there is no store in the folder
+    """
+    try:
+        with open(_metadata_path(folder)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def open_column_arrays(folder: str, columns: list | None = None) -> dict[str, np.ndarray]:
+    """Opens the columns of a store as read-only memory maps. Every process that opens them shares the page cache
+
+    Args:
+        folder (str): Folder of the store
+        columns (list | None, optional): Columns to open, the ones missing in the store are ignored. Defaults to None (all columns).
+
+    Raises:
+        FileNotFoundError: Raises if there is no store in the folder
+
+    Returns:
+        dict[str, np.ndarray]: Raw array of each column (uint8 with 255 as null, int64 nanoseconds, int8/int16 codes or float64)
+    """
+    metadata = load_metadata(folder)
+    if metadata is None:
+        raise FileNotFoundError(f"Não existe um column store em {folder}")
+
+    selected = metadata['columns'] if columns is None else [column for column in dict.fromkeys(columns) if column in metadata['columns']]
+    arrays = {}
+    for column in selected:
+        dtype = metadata['columns'][column]['dtype']
+        if metadata['rows'] == 0:
+            arrays[column] = np.empty(0, dtype=dtype)
+        else:
+            arrays[column] = np.memmap(_column_path(folder, column), dtype=dtype, mode='r', shape=(metadata['rows'],))
+    return arrays
+
+
+def open_column_frame(folder: str, columns: list | None = None) -> pd.DataFrame:
+    """Opens the columns of a store as a DataFrame whose columns are views of the memory maps. Only the null masks
+    of the UInt8 columns are allocated
+
+    Args:
+        folder (str): Folder of the store
+        columns (list | None, optional): Columns to open, the ones missing in the store are ignored. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: Read-only DataFrame, with the dtypes of the COLUMNS_SCHEMA
+    """
+    metadata = load_metadata(folder)
+    arrays = open_column_arrays(folder, columns)
+
+    data = {}
+    for column, values in arrays.items():
+        description = metadata['columns'][column]
+        kind = description['kind']
+
+        if kind == 'uint8':
+            data[column] = pd.arrays.IntegerArray(values, values == _NULL_UINT8)
+        elif kind == 'datetime':
+            data[column] = values.view('datetime64[ns]')
+        elif kind == 'category':
+            data[column] = pd.Categorical.from_codes(values, categories=description['categories'])
+        else:
+            data[column] = values
+
+    return pd.DataFrame(data, copy=False)
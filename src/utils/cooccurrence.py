@@ -0,0 +1,139 @@
+"""Módulo que contém a contagem de coocorrência de sintomas com bitsets"""
+import os
+import sys
+from collections import Counter
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import MAX_SET_SIZE, SYMPTOM_COLUMNS
+from src.utils.instrumentation import instrument
+from src.utils.streaming import Aggregation
+
+# Number of bits set in each byte, used when numpy has no bitwise_count
+_POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Packs a boolean mask in 64 bits words
+
+    Args:
+        mask (np.ndarray): Boolean mask
+
+    Returns:
+        np.ndarray: uint64 words, 64 rows per word
+    """
+    packed = np.packbits(np.asarray(mask, dtype=bool))
+    padding = -len(packed) % 8
+    if padding:
+        packed = np.concatenate([packed, np.zeros(padding, dtype=np.uint8)])
+    return packed.view(np.uint64)
+
+
+def popcount(words: np.ndarray) -> int:
+    """Counts the bits set in the words
+
+    Args:
+        words (np.ndarray): uint64 words
+
+    Returns:
+        int: Number of bits set
+    """
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum())
+    return int(_POPCOUNT_TABLE[words.view(np.uint8)].sum())
+
+
+def _group_masks(df: pd.DataFrame, group_by: str | None) -> dict:
+    """Packed mask of the rows of each group (a single group, None, if there is no grouping)"""
+    if group_by is None:
+        return {None: pack_bits(np.ones(len(df), dtype=bool))}
+
+    groups = df[group_by]
+    return {value: pack_bits((groups == value).to_numpy(dtype=bool, na_value=False)) for value in groups.dropna().unique()}
+
+
+@instrument()
+def count_symptom_sets_counter(df: pd.DataFrame, symptoms: list = SYMPTOM_COLUMNS, max_size: int = MAX_SET_SIZE,
+                               min_support: int = 0, group_by: str | None = None) -> Counter:
+    """Counts the support of every symptom set up to max_size, with AND and popcount over the packed symptom columns.
+    A set is only extended while its support reaches min_support, because its supersets can not have more support
+
+    Args:
+        df (pd.DataFrame): Dataframe with the symptom columns (1 = yes)
+        symptoms (list, optional): Symptom columns. Defaults to SYMPTOM_COLUMNS.
+        max_size (int, optional): Maximum size of the sets. Defaults to MAX_SET_SIZE.
+        min_support (int, optional): Minimum support of the counted sets. Defaults to 0.
+        group_by (str | None, optional): Column to group the counts by, like CLASSI_FIN or SIGLA_UF. Defaults to None.
+
+    Returns:
+        Counter: Support of each (group, symptom set)
+    """
+    packed = [pack_bits((df[symptom] == 1).to_numpy(dtype=bool, na_value=False)) for symptom in symptoms]
+    counts = Counter()
+
+    for group, group_bits in _group_masks(df, group_by).items():
+        # Each level keeps the bits of the frequent sets, indexed by the position of their last symptom
+        level = [((), -1, group_bits)]
+        for _ in range(max_size):
+            next_level = []
+            for symptom_set, last, bits in level:
+                for position in range(last + 1, len(symptoms)):
+                    set_bits = bits & packed[position]
+                    support = popcount(set_bits)
+                    if support >= min_support and support > 0:
+                        new_set = symptom_set + (symptoms[position],)
+                        counts[(group, new_set)] = support
+                        next_level.append((new_set, position, set_bits))
+            level = next_level
+
+    return counts
+
+
+def _counter_to_frame(counts: Counter, group_by: str | None, min_support: int) -> pd.DataFrame:
+    rows = [(group, symptom_set, len(symptom_set), support) for (group, symptom_set), support in counts.items() if support >= min_support]
+    df = pd.DataFrame(rows, columns=[group_by or 'group', 'symptoms', 'size', 'support'])
+    return df.sort_values(['size', 'support'], ascending=[True, False], ignore_index=True)
+
+
+def count_symptom_sets(df: pd.DataFrame, symptoms: list = SYMPTOM_COLUMNS, max_size: int = MAX_SET_SIZE,
+                       min_support: int = 0, group_by: str | None = None) -> pd.DataFrame:
+    """Counts the support of every symptom set up to max_size in a dataframe
+
+    Args:
+        df (pd.DataFrame): Dataframe with the symptom columns (1 = yes)
+        symptoms (list, optional): Symptom columns. Defaults to SYMPTOM_COLUMNS.
+        max_size (int, optional): Maximum size of the sets. Defaults to MAX_SET_SIZE.
+        min_support (int, optional): Minimum support of the returned sets. Defaults to 0.
+        group_by (str | None, optional): Column to group the counts by, like CLASSI_FIN or SIGLA_UF. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Group, symptom set (tuple), size and support of each set
+    """
+    counts = count_symptom_sets_counter(df, symptoms, max_size, min_support, group_by)
+    return _counter_to_frame(counts, group_by, min_support)
+
+
+class SymptomSets(Aggregation):
+    """Streaming version of count_symptom_sets. Every set is counted in the chunks, and the
+    min_support is applied only after merging, so the result is exact
+    """
+
+    def __init__(self, symptoms: list = SYMPTOM_COLUMNS, max_size: int = MAX_SET_SIZE, min_support: int = 0, group_by: str | None = None):
+        self.symptoms = symptoms
+        self.max_size = max_size
+        self.min_support = min_support
+        self.group_by = group_by
+        self.columns = list(symptoms) + ([] if group_by is None else [group_by])
+
+    def initial(self) -> Counter:
+        return Counter()
+
+    def partial(self, chunk: pd.DataFrame) -> Counter:
+        return count_symptom_sets_counter(chunk, self.symptoms, self.max_size, 0, self.group_by)
+
+    def merge(self, left: Counter, right: Counter) -> Counter:
+        left.update(right)
+        return left
+
+    def finalize(self, state: Counter) -> pd.DataFrame:
+        return _counter_to_frame(state, self.group_by, self.min_support)
@@ -0,0 +1,167 @@
+"""Módulo que contém as tabelas de dimensão (UF e ocupações da CBO 2002) como índices densos para decodificar os chunks"""
+import functools
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import FILES_FOLDER, UF_ACRONYMS, UF_CODES
+
+CBO_LEVELS = {  # Number of digits of each level of the CBO 2002 hierarchy
+    'grande_grupo': 1,
+    'subgrupo_principal': 2,
+    'subgrupo': 3,
+    'familia': 4,
+    'ocupacao': 6,
+}
+
+_UF_DTYPE = pd.CategoricalDtype(UF_ACRONYMS)
+
+
+@functools.lru_cache(maxsize=None)
+def load_uf_index() -> np.ndarray:
+    """Loads the ufs.csv file once per process, as a dense array from the IBGE code to the position of the acronym in UF_ACRONYMS
+
+    Returns:
+        np.ndarray: int8 array of 100 positions (-1 for the unknown codes)
+    """
+    filepath = os.path.join(FILES_FOLDER(), 'ufs.csv')
+    if os.path.exists(filepath):
+        ufs = pd.read_csv(filepath, usecols=['SG_UF_NOT', 'SIGLA_UF'], encoding='utf-8', encoding_errors='replace')
+        codes = dict(zip(ufs['SG_UF_NOT'].astype(int), ufs['SIGLA_UF'].str.strip()))
+    else:
+        codes = UF_CODES
+
+    index = np.full(100, -1, dtype=np.int8)
+    for code, acronym in codes.items():
+        if acronym in UF_ACRONYMS:
+            index[code] = UF_ACRONYMS.index(acronym)
+    return index
+
+
+def _integer_codes(values: pd.Series, upper: int) -> np.ndarray:
+    """Codes as int64, with -1 for the missing or out of range values"""
+    codes = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(codes) & (codes >= 0) & (codes < upper)
+    return np.where(valid, codes, -1).astype(np.int64)
+
+
+def decode_uf(codes: pd.Series) -> pd.Categorical:
+    """Decodes SG_UF_NOT to the UF acronyms with a vectorized take on the dense index
+
+    Args:
+        codes (pd.Series): IBGE codes of the UFs
+
+    Returns:
+        pd.Categorical: Acronyms, with the SIGLA_UF dtype of the COLUMNS_SCHEMA
+    """
+    index = load_uf_index()
+    positions = _integer_codes(codes, len(index))
+    return pd.Categorical.from_codes(np.where(positions >= 0, index[positions], -1), dtype=_UF_DTYPE)
+
+
+def add_uf_acronym(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Adds (in place) the SIGLA_UF column decoded from SG_UF_NOT, without merging or copying the chunk
+
+    Args:
+        chunk (pd.DataFrame): Chunk of the dataset
+
+    Returns:
+        pd.DataFrame: The same chunk
+    """
+    if 'SG_UF_NOT' in chunk.columns:
+        chunk['SIGLA_UF'] = pd.Series(decode_uf(chunk['SG_UF_NOT']), index=chunk.index)
+    return chunk
+
+
+@functools.lru_cache(maxsize=None)
+def load_cbo_table() -> tuple[np.ndarray, pd.Index]:
+    """Loads the CBO2002_Ocupacao.csv file (Latin-1, separated by ';') once per process, as a dense array from the
+    6 digits code to the position of its title
+
+    Returns:
+        tuple[np.ndarray, pd.Index]: int16 array of 10**6 positions (-1 for the unknown codes) and the titles
+    """
+    cbo = pd.read_csv(os.path.join(FILES_FOLDER(), 'CBO2002_Ocupacao.csv'), sep=';', encoding='latin-1', dtype=str)
+    codes = pd.to_numeric(cbo['CODIGO'], errors='coerce')
+    cbo = cbo[codes.notna()]
+
+    index = np.full(10**6, -1, dtype=np.int16)
+    index[codes.dropna().astype(np.int64).to_numpy()] = np.arange(len(cbo), dtype=np.int16)
+    return index, pd.Index(cbo['TITULO'].str.strip())
+
+
+def _map_values(values: pd.Series, mapper) -> pd.Categorical:
+    """Applies a vectorized mapper to the categories only, when the Series is categorical, or to every value otherwise"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        mapped = mapper(pd.Series(values.cat.categories))
+        # Each old category points to the position of its new category, and the codes are remapped with a take
+        new_categories = pd.Index(pd.unique(mapped.dropna()))
+        positions = new_categories.get_indexer(mapped)
+        codes = values.cat.codes.to_numpy()
+        return pd.Categorical.from_codes(np.where(codes >= 0, positions[codes], -1), categories=new_categories)
+    return pd.Categorical(mapper(values))
+
+
+def decode_occupation(values: pd.Series) -> pd.Categorical:
+    """Decodes ID_OCUPA_N to the titles of the CBO 2002 occupations
+
+    Args:
+        values (pd.Series): Occupation codes
+
+    Returns:
+        pd.Categorical: Titles (missing for the unknown codes)
+    """
+    index, titles = load_cbo_table()
+
+    def mapper(codes: pd.Series) -> pd.Series:
+        positions = _integer_codes(codes, len(index))
+        positions = np.where(positions >= 0, index[positions], -1)
+        return pd.Series(np.where(positions >= 0, titles.to_numpy()[positions], None), index=codes.index)
+
+    return _map_values(values, mapper)
+
+
+def normalize_occupation(values: pd.Series) -> pd.Categorical:
+    """Writes the occupation codes as integers, so '715505', '715505.0' and 715505 become the same category
+    (the yearly files are not consistent). The values that are not numbers are kept as they are
+
+    Args:
+        values (pd.Series): Occupation codes
+
+    Returns:
+        pd.Categorical: Codes as strings of integers
+    """
+    def mapper(codes: pd.Series) -> pd.Series:
+        numbers = pd.to_numeric(codes, errors='coerce')
+        integral = numbers.notna() & (numbers == numbers.round())
+        normalized = codes.astype(object).where(codes.isna(), codes.astype(str))
+        normalized[integral] = numbers[integral].astype(np.int64).astype(str)
+        return normalized
+
+    return _map_values(values, mapper)
+
+
+def cbo_rollup(values: pd.Series, level: str = 'grande_grupo') -> pd.Categorical:
+    """Rolls the occupation codes up to a level of the CBO hierarchy, by their prefix
+
+    Args:
+        values (pd.Series): Occupation codes (6 digits)
+        level (str, optional): One of the keys of CBO_LEVELS. Defaults to 'grande_grupo'.
+
+    Raises:
+        ValueError: Raises if the level is not valid
+
+    Returns:
+        pd.Categorical: Prefix of each code at the level, like '2' or '2235'
+    """
+    if level not in CBO_LEVELS:
+        raise ValueError(f"Invalid level. Use one of {list(CBO_LEVELS)}.")
+    digits = CBO_LEVELS[level]
+
+    def mapper(codes: pd.Series) -> pd.Series:
+        positions = _integer_codes(codes, 10**6)
+        prefixes = pd.Series(positions // 10**(6 - digits)).astype(str).str.zfill(digits)
+        return prefixes.where(positions >= 0, None).set_axis(codes.index)
+
+    return _map_values(values, mapper)
@@ -0,0 +1,401 @@
+"""Módulo que contém a ingestão incremental dos datasets anuais do SINAN, particionados por ano e UF"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from typing import Iterator
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, CHUNKS_SIZE, PARTITIONS_FOLDER, REQUIRED_COLUMNS, TOTAL_DATASET
+from src.utils.column_store import ColumnStoreWriter, open_column_frame
+from src.utils.dimensions import add_uf_acronym, normalize_occupation
+from src.utils.instrumentation import instrument, span
+from src.utils.reading import read_dataset_chunks
+from src.utils.result_cache import file_fingerprint
+from src.utils.schema import apply_schema, concat_chunks
+from src.utils.streaming import Aggregation, required_columns
+
+INGESTION_COLUMNS = list(dict.fromkeys(REQUIRED_COLUMNS))  # Columns of the partitions, the same for every year
+
+
+def _manifest_path() -> str:
+    return os.path.join(PARTITIONS_FOLDER(), 'manifest.json')
+
+
+def _hashes_path() -> str:
+    return os.path.join(PARTITIONS_FOLDER(), 'row_hashes.npy')
+
+
+def _source_hashes_path(source_id: str) -> str:
+    return os.path.join(PARTITIONS_FOLDER(), 'hashes', f'{source_id}.npy')
+
+
+def _aggregates_path(name: str) -> str:
+    return os.path.join(PARTITIONS_FOLDER(), 'aggregates', f'{name}.pkl')
+
+
+def load_manifest() -> dict:
+    """Loads the manifest of the ingested files
+
+    Returns:
+        dict: Fingerprint, ingestion id, rows, duplicates and partitions written of each ingested file, under 'sources'
+    """
+    try:
+        with open(_manifest_path()) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'sources': {}}
+
+
+def _save_manifest(manifest: dict) -> None:
+    temporary = _manifest_path() + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temporary, _manifest_path())
+
+
+class RowHashIndex:
+    """Set of 64 bits row hashes kept as sorted arrays of doubling sizes, so adding the hashes of a chunk and
+    checking new ones cost O(log n) per hash, without a Python set of millions of integers
+    """
+
+    def __init__(self, hashes: np.ndarray | None = None):
+        self.levels: list[np.ndarray] = []
+        if hashes is not None and len(hashes):
+            self.levels.append(np.unique(hashes))
+
+    def __len__(self) -> int:
+        return sum(len(level) for level in self.levels)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of the hashes already in the index"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for level in self.levels:
+            positions = np.minimum(np.searchsorted(level, hashes), len(level) - 1)
+            found |= level[positions] == hashes
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Adds the hashes, merging the levels of similar sizes"""
+        if not len(hashes):
+            return
+        self.levels.append(np.unique(hashes))
+        while len(self.levels) > 1 and len(self.levels[-1]) >= len(self.levels[-2]):
+            last = self.levels.pop()
+            self.levels[-1] = np.union1d(self.levels[-1], last)
+
+    def values(self) -> np.ndarray:
+        """All the hashes, sorted"""
+        if not self.levels:
+            return np.empty(0, dtype=np.uint64)
+        return np.sort(np.concatenate(self.levels))
+
+
+def load_row_hashes() -> RowHashIndex:
+    """Loads the hashes of the rows already ingested
+
+    Returns:
+        RowHashIndex: The index of the hashes
+    """
+    try:
+        return RowHashIndex(np.load(_hashes_path()))
+    except FileNotFoundError:
+        return RowHashIndex()
+
+
+def _save_row_hashes(index: RowHashIndex) -> None:
+    np.save(_hashes_path() + '.tmp.npy', index.values())
+    os.replace(_hashes_path() + '.tmp.npy', _hashes_path())
+
+
+def harmonize_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Gives a chunk of any year the columns and dtypes of the partitions: the missing columns are added as
+    nulls, every column gets the COLUMNS_SCHEMA dtype, the occupation codes are normalized and SIGLA_UF is decoded from SG_UF_NOT
+
+    Args:
+        chunk (pd.DataFrame): Chunk of a yearly dataset
+
+    Returns:
+        pd.DataFrame: Chunk with the INGESTION_COLUMNS, in order
+    """
+    for column in INGESTION_COLUMNS:
+        if column not in chunk.columns:
+            chunk[column] = pd.Series(None, index=chunk.index, dtype=object)
+    apply_schema(chunk)
+    chunk['ID_OCUPA_N'] = pd.Series(normalize_occupation(chunk['ID_OCUPA_N']), index=chunk.index)
+    add_uf_acronym(chunk)
+    return chunk[INGESTION_COLUMNS]
+
+
+def row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """Vectorized 64 bits hash of each row, by value (the same notification in two files has the same hash)
+
+    Args:
+        chunk (pd.DataFrame): Harmonized chunk
+
+    Returns:
+        np.ndarray: uint64 hash of each row
+    """
+    return pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+
+
+def _partition_keys(chunk: pd.DataFrame) -> dict[tuple, np.ndarray]:
+    """Positions of the rows of each (year of notification, UF), 'NA' for the missing values"""
+    years = chunk['DT_NOTIFIC'].dt.year.to_numpy(dtype=np.float64, na_value=np.nan)
+    ufs = chunk['SIGLA_UF'].astype(object).to_numpy()
+    groups = pd.DataFrame({'year': years, 'uf': ufs}).groupby(['year', 'uf'], dropna=False, sort=False).indices
+
+    return {
+        ('NA' if pd.isna(year) else str(int(year)), 'NA' if pd.isna(uf) else uf): positions
+        for (year, uf), positions in groups.items()
+    }
+
+
+def _part_folder(year: str, uf: str, source_id: str) -> str:
+    return os.path.join(PARTITIONS_FOLDER(), f'year={year}', f'uf={uf}', f'part-{source_id}')
+
+
+def _source_id(fingerprint: dict) -> str:
+    """Id of one ingestion of a file, so the parts of a file ingested again never reuse the names of the removed ones"""
+    return hashlib.sha256(json.dumps([fingerprint, time.time_ns()], sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _remove_sources(manifest: dict, paths: list[str]) -> None:
+    """Removes the ingested files from the store: their manifest entries, the row hashes they added and their parts.
+    The manifest and the index are saved before the parts are deleted, so the store never lists a missing part
+    """
+    removed = [manifest['sources'].pop(path) for path in paths]
+
+    hashes = [np.load(_source_hashes_path(entry['source_id'])) for entry in manifest['sources'].values()]
+    _save_row_hashes(RowHashIndex(np.concatenate(hashes) if hashes else None))
+    _save_manifest(manifest)
+
+    for entry in removed:
+        for part in entry['parts']:
+            shutil.rmtree(os.path.join(PARTITIONS_FOLDER(), part), ignore_errors=True)
+        try:
+            os.remove(_source_hashes_path(entry['source_id']))
+        except FileNotFoundError:
+            pass
+
+
+@instrument()
+def ingest_file(filepath: str, chunksize: int = CHUNKS_SIZE) -> dict:
+    """Appends a yearly SINAN file to the partitioned store. The rows are harmonized, the notifications already
+    ingested from the previous files are dropped by their row hash, and the others are written to one column
+    store per (year, UF). The equal rows inside the file are kept, since the columns have no notification id
+    and two notifications can have the same values. A file already ingested with the same size and mtime is skipped.
+    A file that changed is rebuilt: its old parts and row hashes are removed, and the files ingested after it are
+    ingested again, since their rows were checked against the old content
+
+    Args:
+        filepath (str): CSV file path
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+
+    Returns:
+        dict: Manifest entry of the file (rows, duplicates and the partitions written)
+    """
+    manifest = load_manifest()
+    fingerprint = file_fingerprint(filepath)
+    entry = manifest['sources'].get(fingerprint['path'])
+    if entry is not None and entry['fingerprint'] == fingerprint:
+        return entry
+
+    later: list[str] = []
+    if entry is not None:
+        sources = list(manifest['sources'])
+        later = sources[sources.index(fingerprint['path']) + 1:]
+        _remove_sources(manifest, [fingerprint['path'], *later])
+
+    os.makedirs(os.path.dirname(_source_hashes_path('')), exist_ok=True)
+    source_id = _source_id(fingerprint)
+    index = load_row_hashes()
+
+    writers: dict[tuple, ColumnStoreWriter] = {}
+    buffers: dict[tuple, list[pd.DataFrame]] = {}
+    new_hashes: list[np.ndarray] = []
+    rows = duplicates = 0
+
+    def flush(key: tuple) -> None:
+        if key not in writers:
+            writers[key] = ColumnStoreWriter(_part_folder(*key, source_id), source={'file': fingerprint})
+        writers[key].append(concat_chunks(buffers.pop(key), ignore_index=True))
+
+    try:
+        for chunk in read_dataset_chunks(filepath, INGESTION_COLUMNS, chunksize):
+            with span('ingest_chunk', rows=len(chunk)):
+                chunk = harmonize_chunk(chunk)
+                hashes = row_hashes(chunk)
+
+                # Only the rows of the previous files are duplicates, the index gets the hashes of this file at the end
+                keep = ~index.contains(hashes)
+
+                new_hashes.append(hashes[keep])
+                duplicates += int(len(chunk) - keep.sum())
+                chunk = chunk[keep]
+                rows += len(chunk)
+
+                for key, positions in _partition_keys(chunk).items():
+                    buffers.setdefault(key, []).append(chunk.iloc[positions])
+                    if sum(len(buffer) for buffer in buffers[key]) >= chunksize:
+                        flush(key)
+
+        for key in list(buffers):
+            flush(key)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    for writer in writers.values():
+        writer.close()
+
+    # The manifest and the hashes are saved only after every partition is written
+    source_hashes = np.unique(np.concatenate(new_hashes)) if new_hashes else np.empty(0, dtype=np.uint64)
+    np.save(_source_hashes_path(source_id), source_hashes)
+    index.add(source_hashes)
+    _save_row_hashes(index)
+
+    entry = {
+        'fingerprint': fingerprint,
+        'source_id': source_id,
+        'rows': rows,
+        'duplicates': duplicates,
+        'parts': sorted(os.path.relpath(_part_folder(*key, source_id), PARTITIONS_FOLDER()) for key in writers),
+    }
+    manifest['sources'][fingerprint['path']] = entry
+    _save_manifest(manifest)
+
+    for path in later:
+        if os.path.exists(path):
+            ingest_file(path, chunksize)
+
+    return entry
+
+
+def yearly_datasets() -> list[str]:
+    """CSV files inside the DATA path, except the unified dataset
+
+    Returns:
+        list[str]: Paths of the yearly files, sorted
+    """
+    return sorted(
+        os.path.join(DATASET_LOCAL(), filename) for filename in os.listdir(DATASET_LOCAL())
+        if filename.endswith('.csv') and filename != TOTAL_DATASET
+    )
+
+
+def ingest_datasets(filepaths: list[str] | None = None, chunksize: int = CHUNKS_SIZE) -> dict:
+    """Ingests the yearly files, skipping the ones already ingested
+
+    Args:
+        filepaths (list[str] | None, optional): CSV files to ingest. Defaults to None (yearly_datasets()).
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+
+    Returns:
+        dict: Manifest entry of each file
+    """
+    return {filepath: ingest_file(filepath, chunksize) for filepath in (filepaths or yearly_datasets())}
+
+
+def list_parts(years: list | None = None, ufs: list | None = None) -> list[str]:
+    """Parts of the store, optionally only the ones of some years and UFs (the other partitions are not opened)
+
+    Args:
+        years (list | None, optional): Years of notification. Defaults to None (all years).
+        ufs (list | None, optional): UF acronyms. Defaults to None (all UFs).
+
+    Returns:
+        list[str]: Paths of the parts, relative to the partitions folder
+    """
+    parts = sorted(part for entry in load_manifest()['sources'].values() for part in entry['parts'])
+    selected = []
+    for part in parts:
+        year_folder, uf_folder, _ = part.split(os.sep)
+        if years is not None and year_folder.partition('=')[2] not in {str(year) for year in years}:
+            continue
+        if ufs is not None and uf_folder.partition('=')[2] not in set(ufs):
+            continue
+        selected.append(part)
+    return selected
+
+
+def read_partitions(columns: list | None = None, years: list | None = None, ufs: list | None = None) -> Iterator[pd.DataFrame]:
+    """Reads the store part by part, as DataFrames over the memory maps of each part
+
+    Args:
+        columns (list | None, optional): Columns to read. Defaults to None (all columns).
+        years (list | None, optional): Years of notification. Defaults to None (all years).
+        ufs (list | None, optional): UF acronyms. Defaults to None (all UFs).
+
+    Yields:
+        pd.DataFrame: The rows of each part
+    """
+    for part in list_parts(years, ufs):
+        yield open_column_frame(os.path.join(PARTITIONS_FOLDER(), part), columns)
+
+
+def _aggregations_key(aggregations: dict[str, Aggregation]) -> str:
+    """Identity of the aggregations (class and parameters), so changing them recomputes the states"""
+    description = [(name, type(aggregation).__qualname__, sorted((key, repr(value)) for key, value in vars(aggregation).items()))
+                   for name, aggregation in sorted(aggregations.items())]
+    return hashlib.sha256(repr(description).encode()).hexdigest()
+
+
+@instrument()
+def update_aggregates(name: str, aggregations: dict[str, Aggregation]) -> dict:
+    """Computes aggregations over the store incrementally: the merged states are saved with the parts they have
+    seen, so after a new file is ingested only its parts are scanned and merged into the saved states. States that
+    saw a part no longer in the store (of a file that changed) are computed again from every part
+
+    Args:
+        name (str): Name of the saved states
+        aggregations (dict[str, Aggregation]): Aggregations, by name
+
+    Returns:
+        dict: Result of each aggregation, by name
+    """
+    key = _aggregations_key(aggregations)
+    parts = list_parts()
+    try:
+        with open(_aggregates_path(name), 'rb') as file:
+            saved = pickle.load(file)
+        if saved['key'] != key or not set(saved['parts']) <= set(parts):
+            raise ValueError
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, ValueError):
+        saved = {'key': key, 'parts': [], 'states': {column: aggregation.initial() for column, aggregation in aggregations.items()}}
+
+    seen = set(saved['parts'])
+    new_parts = [part for part in parts if part not in seen]
+    columns = required_columns(aggregations)
+
+    for part in new_parts:
+        chunk = open_column_frame(os.path.join(PARTITIONS_FOLDER(), part), columns)
+        with span('aggregate_part', rows=len(chunk)):
+            for column, aggregation in aggregations.items():
+                saved['states'][column] = aggregation.merge(saved['states'][column], aggregation.partial(chunk))
+        saved['parts'].append(part)
+
+    if new_parts:
+        os.makedirs(os.path.dirname(_aggregates_path(name)), exist_ok=True)
+        temporary = _aggregates_path(name) + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(saved, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, _aggregates_path(name))
+
+    return {column: aggregation.finalize(saved['states'][column]) for column, aggregation in aggregations.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Appends the yearly SINAN files to the store partitioned by year and UF')
+    parser.add_argument('files', nargs='*', help='CSV files (defaults to the yearly files of the data folder)')
+    parser.add_argument('--chunksize', type=int, default=CHUNKS_SIZE)
+    args = parser.parse_args()
+
+    for filepath, entry in ingest_datasets(args.files or None, args.chunksize).items():
+        print(f"{filepath}: {entry['rows']} linhas novas, {entry['duplicates']} duplicadas, {len(entry['parts'])} partições")
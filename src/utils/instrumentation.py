@@ -0,0 +1,333 @@
+"""Módulo de instrumentação: spans aninhados que medem tempo, CPU, linhas, bytes e pico de memória das funções críticas"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Callable
+
+
+class _State(threading.local):
+    """Stack of the open spans of each thread"""
+
+    def __init__(self):
+        self.stack: list['Span'] = []
+
+
+_enabled = os.environ.get('SINAN_INSTRUMENTATION', '') not in ('', '0')
+_thread_state = _State()
+_records: list[dict] = []
+_records_lock = threading.Lock()
+
+
+def enable(trace_memory: bool = False) -> None:
+    """Turns the instrumentation on
+
+    Args:
+        trace_memory (bool, optional): Also measures the tracemalloc peak of each span (slower). Defaults to False.
+    """
+    global _enabled
+    _enabled = True
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    """Turns the instrumentation (and the memory tracing started by it) off"""
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Discards the recorded spans"""
+    with _records_lock:
+        _records.clear()
+
+
+class Span:
+    """A measured region of the code. Use it through span() or instrument()"""
+
+    def __init__(self, name: str, rows: int = 0, bytes_read: int = 0):
+        self.name = name
+        self.rows = rows
+        self.bytes_read = bytes_read
+        self.path = name
+        self._peak_seen = 0
+
+    def add_rows(self, rows: int) -> None:
+        self.rows += rows
+
+    def add_bytes(self, bytes_read: int) -> None:
+        self.bytes_read += bytes_read
+
+    def __enter__(self) -> 'Span':
+        stack = _thread_state.stack
+        if stack:
+            self.path = f'{stack[-1].path};{self.name}'
+        stack.append(self)
+
+        self._memory_start = 0
+        if tracemalloc.is_tracing():
+            self._memory_start, peak = tracemalloc.get_traced_memory()
+            # The parent keeps its own peak, since reset_peak discards it
+            if len(stack) > 1:
+                stack[-2]._peak_seen = max(stack[-2]._peak_seen, peak)
+            tracemalloc.reset_peak()
+            self._peak_seen = self._memory_start
+
+        self._cpu_start = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        wall_time = time.perf_counter() - self._start
+        cpu_time = time.process_time() - self._cpu_start
+
+        stack = _thread_state.stack
+        stack.pop()
+
+        memory_peak = None
+        if tracemalloc.is_tracing():
+            absolute_peak = max(tracemalloc.get_traced_memory()[1], self._peak_seen)
+            memory_peak = absolute_peak - self._memory_start
+            if stack:
+                stack[-1]._peak_seen = max(stack[-1]._peak_seen, absolute_peak)
+
+        record = {
+            'name': self.name,
+            'path': self.path,
+            'process': os.getpid(),
+            'thread': threading.current_thread().name,
+            'wall_time': wall_time,
+            'cpu_time': cpu_time,
+            'rows': self.rows,
+            'bytes_read': self.bytes_read,
+            'memory_peak': memory_peak,
+        }
+        with _records_lock:
+            _records.append(record)
+        return False
+
+
+class _NullSpan:
+    """Span used while the instrumentation is off, it does nothing"""
+
+    def add_rows(self, rows: int) -> None:
+        pass
+
+    def add_bytes(self, bytes_read: int) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, rows: int = 0, bytes_read: int = 0) -> Span | _NullSpan:
+    """Context manager that measures a region of the code. Spans opened inside it become its children
+
+    Args:
+        name (str): Name of the span
+        rows (int, optional): Rows processed, they can also be added with add_rows. Defaults to 0.
+        bytes_read (int, optional): Bytes read, they can also be added with add_bytes. Defaults to 0.
+
+    Returns:
+        Span | _NullSpan: The span (a no-op one if the instrumentation is off)
+
+    >>> with span('read') as current:
+    ...     current.add_rows(len(chunk))
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, rows, bytes_read)
+
+
+def instrument(name: str | None = None, count_rows: bool = False) -> Callable:
+    """Decorator that measures every call of a function in a span, passing its return value through
+
+    Args:
+        name (str | None, optional): Name of the span. Defaults to None (the qualified name of the function).
+        count_rows (bool, optional): Records len() of the return value as the rows processed. Defaults to False.
+
+    Returns:
+        Callable: The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            with Span(label) as current:
+                result = func(*args, **kwargs)
+                if count_rows and hasattr(result, '__len__'):
+                    current.add_rows(len(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_iterator(iterator, name: str):
+    """Measures, in a span per item, the time to produce each item of an iterator (like the chunks of a reader)
+
+    Args:
+        iterator: Iterator to measure
+        name (str): Name of the spans
+
+    Yields:
+        The items of the iterator
+    """
+    iterator = iter(iterator)
+    while True:
+        with span(name) as current:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if hasattr(item, '__len__'):
+                current.add_rows(len(item))
+        yield item
+
+
+def _call_in_worker(func: Callable, name: str, enabled: bool, trace_memory: bool, parent_path: str, *args, **kwargs) -> tuple:
+    """Runs a function in a worker of a process pool, returning its result and the spans recorded during the call"""
+    global _enabled
+    _enabled = enabled
+    if not enabled:
+        return func(*args, **kwargs), []
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    # A forked worker starts with a copy of the records and of the open spans of the parent, so the call gets an
+    # empty stack (the parent path is added at the end) and only the new records are sent back
+    stack, _thread_state.stack = _thread_state.stack, []
+    with _records_lock:
+        start = len(_records)
+    try:
+        with Span(name):
+            result = func(*args, **kwargs)
+    finally:
+        _thread_state.stack = stack
+        with _records_lock:
+            records = _records[start:]
+            del _records[start:]
+
+    for record in records:
+        if parent_path:
+            record['path'] = f"{parent_path};{record['path']}"
+    return result, records
+
+
+def traced_call(func: Callable, name: str | None = None) -> Callable:
+    """Wraps a function submitted to a process pool. The worker runs it in a span (under the span open here) and returns
+    the spans it recorded with the result, since the records of another process are not seen by report(). Pass the
+    result of the future to merge_worker_records. The thread pools share the records, so they do not need it
+
+    >>> future = executor.submit(traced_call(_process_byte_range), filepath, header, byte_range)
+    >>> chunk = merge_worker_records(future.result())
+
+    Args:
+        func (Callable): Module level function
+        name (str | None, optional): Name of the span of the call. Defaults to None (the qualified name of the function).
+
+    Returns:
+        Callable: Picklable function that returns (result, records)
+    """
+    stack = _thread_state.stack
+    return functools.partial(_call_in_worker, func, name or func.__qualname__, _enabled, tracemalloc.is_tracing(),
+                             stack[-1].path if stack else '')
+
+
+def merge_worker_records(value: tuple):
+    """Adds the spans recorded by a worker (returned by a traced_call function) to the records of this process
+
+    Args:
+        value (tuple): (result, records) returned by the traced_call function
+
+    Returns:
+        The result of the function
+    """
+    result, records = value
+    if records:
+        with _records_lock:
+            _records.extend(records)
+    return result
+
+
+def report() -> list[dict]:
+    """Returns a copy of the recorded spans, including the ones sent back by the workers of the process pools
+
+    Returns:
+        list[dict]: name, path (parents separated by ';'), process, thread, wall_time, cpu_time, rows, bytes_read and memory_peak of each span
+    """
+    with _records_lock:
+        return list(_records)
+
+
+def summary() -> dict[str, dict]:
+    """Aggregates the recorded spans by path
+
+    Returns:
+        dict[str, dict]: calls, wall_time, cpu_time, rows, bytes_read and the largest memory_peak of each path
+    """
+    totals: dict[str, dict] = {}
+    for record in report():
+        total = totals.setdefault(record['path'], {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'rows': 0, 'bytes_read': 0, 'memory_peak': None})
+        total['calls'] += 1
+        for key in ('wall_time', 'cpu_time', 'rows', 'bytes_read'):
+            total[key] += record[key]
+        if record['memory_peak'] is not None:
+            total['memory_peak'] = max(total['memory_peak'] or 0, record['memory_peak'])
+    return totals
+
+
+def export_json(filepath: str) -> str:
+    """Writes the spans of the run and their summary to a JSON file
+
+    Args:
+        filepath (str): JSON file path
+
+    Returns:
+        str: The JSON file path
+    """
+    with open(filepath, 'w') as file:
+        json.dump({'spans': report(), 'summary': summary()}, file, indent=4)
+    return filepath
+
+
+def export_folded(filepath: str) -> str:
+    """Writes the self time (in microseconds) of each path in the folded stacks format, read by flamegraph.pl and speedscope
+
+    Args:
+        filepath (str): Text file path
+
+    Returns:
+        str: The text file path
+    """
+    totals = summary()
+    self_times = {path: total['wall_time'] for path, total in totals.items()}
+    for path, total in totals.items():
+        parent = path.rpartition(';')[0]
+        if parent in self_times:
+            self_times[parent] -= total['wall_time']
+
+    with open(filepath, 'w') as file:
+        for path, seconds in self_times.items():
+            file.write(f'{path} {max(int(seconds * 1e6), 0)}\n')
+    return filepath
@@ -0,0 +1,179 @@
+"""Módulo que contém o orçamento de memória dos leitores: tamanho dos chunks medido pelos bytes por linha e limite de chunks em processamento"""
+import collections
+import itertools
+import os
+import sys
+from typing import Callable, Iterable, Iterator
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import CHUNKS_SIZE, READING_MEMORY_BUDGET, READING_MEMORY_FRACTION, READING_SAMPLE_ROWS
+from src.utils.schema import apply_schema, read_csv_schema
+
+MIN_CHUNK_ROWS = 1000  # Smaller chunks spend more time in the pandas overhead than parsing
+
+MAX_CHUNK_ROWS = 4 * CHUNKS_SIZE  # Larger chunks do not parse faster and leave the workers of the pools idle
+
+IN_FLIGHT_FRACTION = 0.25  # Fraction of the budget for the chunks being parsed and filtered, the rest is for the result
+
+
+class MemoryBudgetError(MemoryError):
+    """Raised before a reader goes over its memory budget"""
+
+
+def physical_memory() -> int:
+    """Total physical memory of the machine
+
+    Returns:
+        int: Bytes (8 GiB when the system does not tell)
+    """
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 8 * 2**30
+
+
+def memory_budget(budget: int | None = None) -> int:
+    """Budget of a reader: the given one, READING_MEMORY_BUDGET, or READING_MEMORY_FRACTION of the physical memory
+
+    Args:
+        budget (int | None, optional): Bytes. Defaults to None.
+
+    Returns:
+        int: Bytes
+    """
+    return int(budget or READING_MEMORY_BUDGET or physical_memory() * READING_MEMORY_FRACTION)
+
+
+def _format_bytes(size: float) -> str:
+    return f'{size / 2**30:.2f} GiB' if size >= 2**30 else f'{size / 2**20:.1f} MiB'
+
+
+def measure_bytes_per_row(filepath: str, usecols: list | None = None, sample_rows: int = READING_SAMPLE_ROWS) -> tuple[float, float]:
+    """Measures, on the first rows of a CSV, the memory of a parsed row (with the COLUMNS_SCHEMA) and the size of a row in the file
+
+    Args:
+        filepath (str): CSV file path
+        usecols (list | None, optional): Columns that will be read. Defaults to None (all columns).
+        sample_rows (int, optional): Rows of the sample. Defaults to READING_SAMPLE_ROWS.
+
+    Returns:
+        tuple[float, float]: Bytes in memory and bytes in the file of each row
+    """
+    header = pd.read_csv(filepath, nrows=0).columns
+    columns = [column for column in header if usecols is None or column in usecols]
+    sample = apply_schema(pd.read_csv(filepath, usecols=columns, nrows=sample_rows, low_memory=False, **read_csv_schema(columns)))
+
+    with open(filepath, 'rb') as file:
+        file.readline()
+        lines = list(itertools.islice(file, sample_rows))
+
+    rows = max(len(sample), 1)
+    return sample.memory_usage(deep=True, index=False).sum() / rows, sum(len(line) for line in lines) / max(len(lines), 1)
+
+
+class ReadingPlan:
+    """Chunk size and number of chunks in flight of a reader, derived from its memory budget and the measured
+    bytes per row. It also tracks the memory of the result, to fail before the budget is exceeded
+    """
+
+    def __init__(self, budget: int, bytes_per_row: float, file_bytes_per_row: float, estimated_rows: int, workers: int):
+        self.budget = budget
+        self.bytes_per_row = max(bytes_per_row, 1.0)
+        self.file_bytes_per_row = max(file_bytes_per_row, 1.0)
+        self.estimated_rows = estimated_rows
+        self.max_in_flight = 2 * workers
+
+        # Each chunk in flight is alive twice (parsed and filtered) at most
+        rows = int(budget * IN_FLIGHT_FRACTION / (2 * self.max_in_flight * self.bytes_per_row))
+        if rows < MIN_CHUNK_ROWS:
+            self.max_in_flight = max(int(budget * IN_FLIGHT_FRACTION / (2 * MIN_CHUNK_ROWS * self.bytes_per_row)), 1)
+            rows = MIN_CHUNK_ROWS
+        self.chunk_rows = min(rows, MAX_CHUNK_ROWS)
+
+        # The chunks of the result and their concatenation are alive together at the end
+        self.result_budget = budget * (1 - IN_FLIGHT_FRACTION) / 2
+        self.result_bytes = 0
+
+    @property
+    def range_bytes(self) -> int:
+        """Size of the byte ranges of the CSV, so each one has about chunk_rows rows"""
+        return int(self.chunk_rows * self.file_bytes_per_row)
+
+    @property
+    def estimated_bytes(self) -> float:
+        """Memory of the whole dataset, parsed"""
+        return self.estimated_rows * self.bytes_per_row
+
+    def _error(self, size: float) -> MemoryBudgetError:
+        return MemoryBudgetError(
+            f"O resultado ocuparia {_format_bytes(size)} e o orçamento de memória permite {_format_bytes(self.result_budget)} "
+            f"(orçamento total de {_format_bytes(self.budget)}). Leia menos colunas, filtre as linhas com um predicado, "
+            "use as agregações por streaming (aggregate_total_dataset) ou aumente o memory_budget."
+        )
+
+    def check_estimate(self) -> None:
+        """Fails before reading when the whole dataset, parsed, does not fit in the budget
+
+        Raises:
+            MemoryBudgetError: Raises if the estimated result is over the budget
+        """
+        if self.estimated_bytes > self.result_budget:
+            raise self._error(self.estimated_bytes)
+
+    def add_result(self, chunk: pd.DataFrame) -> None:
+        """Counts the memory of a chunk kept for the result
+
+        Args:
+            chunk (pd.DataFrame): Processed chunk
+
+        Raises:
+            MemoryBudgetError: Raises as soon as the kept chunks go over the budget
+        """
+        self.result_bytes += chunk.memory_usage(deep=True, index=False).sum()
+        if self.result_bytes > self.result_budget:
+            raise self._error(self.result_bytes)
+
+
+def plan_reading(filepath: str, usecols: list | None = None, budget: int | None = None, workers: int | None = None,
+                 sample_rows: int = READING_SAMPLE_ROWS) -> ReadingPlan:
+    """Plans the reading of a CSV within a memory budget, from the bytes per row measured on a sample
+
+    Args:
+        filepath (str): CSV file path
+        usecols (list | None, optional): Columns that will be read. Defaults to None (all columns).
+        budget (int | None, optional): Bytes. Defaults to None (memory_budget()).
+        workers (int | None, optional): Workers that process the chunks. Defaults to None (one per CPU).
+        sample_rows (int, optional): Rows of the sample. Defaults to READING_SAMPLE_ROWS.
+
+    Returns:
+        ReadingPlan: The plan
+    """
+    bytes_per_row, file_bytes_per_row = measure_bytes_per_row(filepath, usecols, sample_rows)
+    estimated_rows = int(os.path.getsize(filepath) / max(file_bytes_per_row, 1.0))
+    return ReadingPlan(memory_budget(budget), bytes_per_row, file_bytes_per_row, estimated_rows, workers or os.cpu_count() or 1)
+
+
+def bounded_map(submit: Callable, function: Callable, items: Iterable, max_in_flight: int) -> Iterator:
+    """Like executor.map, but submits a new item only when there are less than max_in_flight items pending,
+    so a slow consumer makes the reader wait instead of piling up parsed chunks
+
+    Args:
+        submit (Callable): The submit method of an executor
+        function (Callable): Function applied to each item
+        items (Iterable): Items, read lazily
+        max_in_flight (int): Maximum number of pending items
+
+    Yields:
+        The results, in the order of the items
+    """
+    pending = collections.deque()
+    try:
+        for item in items:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(submit(function, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,205 @@
+"""Módulo que desenha as figuras a partir de agregados: o dataset só entrega as contagens de cada figura, em uma única leitura,
+e as figuras cujos agregados não mudaram não são desenhadas de novo"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Callable
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import CHUNKS_SIZE, OUTPUT_FOLDER
+from src.filtering import Predicate
+from src.utils.instrumentation import instrument, merge_worker_records, span, traced_call
+from src.utils.result_cache import value_fingerprint
+from src.utils.streaming import Aggregation, aggregate_chunks, aggregate_total_dataset
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # Headless backend, the figures are only written to files
+    import matplotlib.pyplot as plt
+except ImportError:  # The aggregates can be computed without matplotlib, only the rendering needs it
+    plt = None
+
+
+def plotting_available() -> bool:
+    """Checks if the figures can be rendered in this environment
+
+    Returns:
+        bool: True if matplotlib is installed
+    """
+    return plt is not None
+
+
+class FigureSpec:
+    """A figure drawn from aggregates. The aggregations run in the same scan of every other figure (the ones with
+    the same name are computed once), prepare reduces their results to the small data drawn, and draw plots it
+    """
+
+    def __init__(self, filename: str, aggregations: dict[str, Aggregation], prepare: Callable[[dict], Any],
+                 draw: Callable[[Any, Any], None], figsize: tuple[float, float] = (6.4, 4.8)):
+        """
+        Args:
+            filename (str): Name of the file, inside the OUTPUT_FOLDER
+            aggregations (dict[str, Aggregation]): Aggregations of the data, by name
+            prepare (Callable[[dict], Any]): Function from the results of the aggregations to the data of the figure
+            draw (Callable[[Any, Any], None]): Module level function that draws the data in a matplotlib Axes, it runs in another process
+            figsize (tuple[float, float], optional): Size in inches. Defaults to (6.4, 4.8).
+        """
+        self.filename = filename
+        self.aggregations = aggregations
+        self.prepare = prepare
+        self.draw = draw
+        self.figsize = figsize
+
+
+def figures_aggregations(figures: list[FigureSpec]) -> dict[str, Aggregation]:
+    """Union of the aggregations of the figures
+
+    Args:
+        figures (list[FigureSpec]): Figures
+
+    Returns:
+        dict[str, Aggregation]: Aggregations, by name
+    """
+    aggregations = {}
+    for figure in figures:
+        for name, aggregation in figure.aggregations.items():
+            aggregations.setdefault(name, aggregation)
+    return aggregations
+
+
+@instrument()
+def aggregate_figures(figures: list[FigureSpec], df: pd.DataFrame | None = None, chunksize: int = CHUNKS_SIZE,
+                      predicate: Predicate | None = None) -> dict[str, Any]:
+    """Computes the data of each figure with a single pass over the data
+
+    Args:
+        figures (list[FigureSpec]): Figures
+        df (pd.DataFrame | None, optional): Dataset already loaded. Defaults to None (a streaming scan of the total dataset).
+        chunksize (int, optional): Rows per chunk of the scan. Defaults to CHUNKS_SIZE.
+        predicate (Predicate | None, optional): Filter of the scan. Defaults to None.
+
+    Returns:
+        dict[str, Any]: Data of each figure, by filename
+    """
+    aggregations = figures_aggregations(figures)
+    if df is None:
+        results = aggregate_total_dataset(aggregations, chunksize, predicate)
+    else:
+        results = aggregate_chunks(aggregations, [df])
+
+    return {figure.filename: figure.prepare({name: results[name] for name in figure.aggregations}) for figure in figures}
+
+
+def figure_hash(figure: FigureSpec, data: Any) -> str:
+    """Hash of the data of a figure, and of its size and drawing function
+
+    Args:
+        figure (FigureSpec): Figure
+        data (Any): Data of the figure
+
+    Returns:
+        str: Hexadecimal SHA-256
+    """
+    identity = f'{figure.draw.__module__}.{figure.draw.__qualname__}:{figure.figsize}'
+    return hashlib.sha256((identity + value_fingerprint(data)).encode()).hexdigest()
+
+
+def _manifest_path(folder: str) -> str:
+    return os.path.join(folder, 'figures.json')
+
+
+def _load_hashes(folder: str) -> dict[str, str]:
+    try:
+        with open(_manifest_path(folder)) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _render(draw: Callable, data: Any, figsize: tuple[float, float], filepath: str) -> str:
+    """Draws one figure and writes it atomically (runs in the workers of the pool)"""
+    figure, axes = plt.subplots(figsize=figsize)
+    try:
+        draw(axes, data)
+        figure.tight_layout()
+        temporary = f'{filepath}.tmp.png'
+        figure.savefig(temporary)
+        os.replace(temporary, filepath)
+    finally:
+        plt.close(figure)
+    return filepath
+
+
+@instrument()
+def render_figures(figures: list[FigureSpec], data: dict[str, Any], folder: str | None = None, workers: int | None = None,
+                   force: bool = False) -> dict[str, str]:
+    """Renders the figures whose data changed since the last rendering (or whose file is missing), in parallel
+
+    Args:
+        figures (list[FigureSpec]): Figures
+        data (dict[str, Any]): Data of each figure, by filename (from aggregate_figures)
+        folder (str | None, optional): Folder of the files. Defaults to None (the OUTPUT_FOLDER).
+        workers (int | None, optional): Processes of the pool, 1 to render in this process. Defaults to None (one per CPU).
+        force (bool, optional): Renders every figure. Defaults to False.
+
+    Raises:
+        ImportError: Raises if matplotlib is not installed
+
+    Returns:
+        dict[str, str]: 'rendered' or 'skipped', by filename
+    """
+    if not plotting_available():
+        raise ImportError("O matplotlib é necessário para desenhar as figuras")
+
+    folder = folder or OUTPUT_FOLDER()
+    os.makedirs(folder, exist_ok=True)
+    hashes = _load_hashes(folder)
+
+    status, pending = {}, []
+    for figure in figures:
+        digest = figure_hash(figure, data[figure.filename])
+        filepath = os.path.join(folder, figure.filename)
+        if not force and hashes.get(figure.filename) == digest and os.path.exists(filepath):
+            status[figure.filename] = 'skipped'
+        else:
+            pending.append((figure, digest, filepath))
+
+    with span('render_figures.draw', rows=len(pending)):
+        arguments = [(figure.draw, data[figure.filename], figure.figsize, filepath) for figure, _, filepath in pending]
+        if workers == 1 or len(pending) <= 1:
+            for argument in arguments:
+                _render(*argument)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(pending))) as executor:
+                render = traced_call(_render)
+                for future in [executor.submit(render, *argument) for argument in arguments]:
+                    merge_worker_records(future.result())
+
+    for figure, digest, _ in pending:
+        hashes[figure.filename] = digest
+        status[figure.filename] = 'rendered'
+    with open(_manifest_path(folder), 'w') as file:
+        json.dump(hashes, file, indent=4)
+
+    return status
+
+
+def plot_figures(figures: list[FigureSpec], df: pd.DataFrame | None = None, folder: str | None = None, workers: int | None = None,
+                 force: bool = False, chunksize: int = CHUNKS_SIZE, predicate: Predicate | None = None) -> dict[str, str]:
+    """Aggregates the data of the figures in one pass and renders the ones that changed
+
+    Args:
+        figures (list[FigureSpec]): Figures
+        df (pd.DataFrame | None, optional): Dataset already loaded. Defaults to None (a streaming scan of the total dataset).
+        folder (str | None, optional): Folder of the files. Defaults to None (the OUTPUT_FOLDER).
+        workers (int | None, optional): Processes of the pool. Defaults to None (one per CPU).
+        force (bool, optional): Renders every figure. Defaults to False.
+        chunksize (int, optional): Rows per chunk of the scan. Defaults to CHUNKS_SIZE.
+        predicate (Predicate | None, optional): Filter of the scan. Defaults to None.
+
+    Returns:
+        dict[str, str]: 'rendered' or 'skipped', by filename
+    """
+    return render_figures(figures, aggregate_figures(figures, df, chunksize, predicate), folder, workers, force)
@@ -1,5 +1,12 @@
+import os
+import sys
 import numpy as np
 import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import (
+    CHUNKS_SIZE, COMORBIDITY_COLUMNS, DATE_COLUMNS, DATE_FORMAT, EXAM_RESULT_COLUMNS, FILES_FOLDER, REQUIRED_COLUMNS,
+)
+from src.utils.schema import apply_schema
 
 
 def generate_random_dataframe(rows=10, cols=5) -> pd.DataFrame:
@@ -25,3 +32,133 @@ def generate_random_dataframe(rows=10, cols=5) -> pd.DataFrame:
             data[f'col_{i+1}'] = mixed_data
     
     return pd.DataFrame(data)
+
+
+# Share of the notifications of each UF, roughly following the SINAN 2021-2024 files
+_UF_WEIGHTS = {
+    11: 1.0, 12: 0.4, 13: 0.8, 14: 0.2, 15: 1.2, 16: 0.2, 17: 1.0, 21: 1.0, 22: 1.0, 23: 2.5, 24: 1.2, 25: 1.5,
+    26: 2.0, 27: 0.8, 28: 0.5, 29: 4.0, 31: 25.0, 32: 4.0, 33: 3.5, 35: 25.0, 41: 9.0, 42: 4.0, 43: 3.5,
+    50: 2.0, 51: 1.5, 52: 7.0, 53: 3.0,
+}
+
+# Probability of 'yes' of each symptom flag
+_SYMPTOM_PROBABILITIES = {
+    'FEBRE': 0.85, 'MIALGIA': 0.75, 'CEFALEIA': 0.8, 'EXANTEMA': 0.2, 'VOMITO': 0.2, 'NAUSEA': 0.45,
+    'DOR_COSTAS': 0.3, 'CONJUNTVIT': 0.05, 'ARTRITE': 0.1, 'ARTRALGIA': 0.3, 'PETEQUIA_N': 0.05,
+    'LEUCOPENIA': 0.05, 'LACO': 0.03, 'DOR_RETRO': 0.35,
+}
+
+# Codes and probabilities of the classification, evolution and serotype columns
+_CLASSI_FIN = ([5, 8, 10, 11, 12, 13], [0.35, 0.05, 0.52, 0.04, 0.01, 0.03])
+_EVOLUCAO = ([1, 2, 3, 4, 9], [0.9, 0.001, 0.001, 0.001, 0.097])
+_SOROTIPO = ([1, 2, 3, 4], [0.5, 0.4, 0.07, 0.03])
+
+# Probability that each exam date was filled
+_EXAM_PROBABILITIES = {
+    'DT_CHIK_S1': 0.02, 'DT_CHIK_S2': 0.01, 'DT_PRNT': 0.01, 'DT_SORO': 0.25, 'DT_NS1': 0.15,
+    'DT_VIRAL': 0.01, 'DT_PCR': 0.03,
+}
+
+
+def _occupation_codes() -> np.ndarray:
+    """CBO codes of the 'Files' folder, or a few generic codes if the file is missing"""
+    try:
+        return pd.read_csv(os.path.join(FILES_FOLDER(), 'CBO2002_Ocupacao.csv'), sep=';', encoding='latin-1', dtype=str)['CODIGO'].to_numpy()
+    except OSError:
+        return np.array(['999991', '999992', '715505', '223505', '621005'])
+
+
+def _codes(rng: np.random.Generator, codes: tuple, rows: int, missing: float = 0.0) -> np.ndarray:
+    values = rng.choice(codes[0], size=rows, p=codes[1]).astype(float)
+    values[rng.random(rows) < missing] = np.nan
+    return values
+
+
+def generate_sinan_dataframe(rows: int, seed: int | np.random.SeedSequence | None = None) -> pd.DataFrame:
+    """Generates, in vectorized form, a random dataset with the REQUIRED_COLUMNS of the SINAN files: 1/2/9 flags,
+    realistic codes of classification and UF, CBO occupations and dates correlated with the first symptom
+
+    Args:
+        rows (int): How many rows
+        seed (int | np.random.SeedSequence | None, optional): Seed for the random generator. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Random dataframe with the compact dtypes of the COLUMNS_SCHEMA (without SIGLA_UF, like the raw files)
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+
+    # UF and occupation
+    uf_codes = np.array(list(_UF_WEIGHTS))
+    uf_weights = np.array(list(_UF_WEIGHTS.values()))
+    data['SG_UF_NOT'] = rng.choice(uf_codes, size=rows, p=uf_weights / uf_weights.sum())
+    occupations = rng.choice(_occupation_codes(), size=rows).astype(object)
+    occupations[rng.random(rows) < 0.6] = None
+    data['ID_OCUPA_N'] = occupations
+
+    # Flags: 1 = yes, 2 = no, 9 = unknown, and some missing values
+    for column, probability in _SYMPTOM_PROBABILITIES.items():
+        data[column] = _codes(rng, ([1, 2, 9], [probability * 0.95, (1 - probability) * 0.95, 0.05]), rows, missing=0.03)
+    for column in COMORBIDITY_COLUMNS:
+        data[column] = _codes(rng, ([1, 2, 9], [0.04, 0.86, 0.1]), rows, missing=0.05)
+    for column in EXAM_RESULT_COLUMNS:
+        data[column] = _codes(rng, ([1, 2, 3, 4], [0.3, 0.5, 0.15, 0.05]), rows, missing=0.8)
+    data['HOSPITALIZ'] = _codes(rng, ([1, 2, 9], [0.05, 0.85, 0.1]), rows, missing=0.1)
+
+    classification = _codes(rng, _CLASSI_FIN, rows, missing=0.05)
+    data['CLASSI_FIN'] = classification
+    evolution = _codes(rng, _EVOLUCAO, rows, missing=0.1)
+    data['EVOLUCAO'] = evolution
+    data['SOROTIPO'] = _codes(rng, _SOROTIPO, rows, missing=0.98)
+
+    # Dates: the first symptom follows the seasonality (peak in March and April), the others come after it
+    start = np.datetime64('2021-01-01', 'D')
+    days_of_year = np.clip(rng.normal(100, 45, size=rows), 0, 364).astype(np.int64)
+    symptoms_day = start + np.timedelta64(365, 'D') * rng.integers(0, 4, size=rows) + days_of_year
+    notification_day = symptoms_day + rng.geometric(0.35, size=rows) - 1
+
+    dates = {
+        'DT_SIN_PRI': symptoms_day,
+        'DT_NOTIFIC': notification_day,
+        'DT_DIGITA': notification_day + rng.geometric(0.2, size=rows) - 1,
+        'DT_INVEST': notification_day + rng.geometric(0.5, size=rows) - 1,
+        'DT_ENCERRA': notification_day + rng.exponential(25, size=rows).astype(np.int64),
+    }
+    for column, probability in _EXAM_PROBABILITIES.items():
+        exam_day = symptoms_day + rng.integers(1, 10, size=rows)
+        dates[column] = np.where(rng.random(rows) < probability, exam_day, np.datetime64('NaT'))
+
+    hospitalized = data['HOSPITALIZ'] == 1
+    dates['DT_INTERNA'] = np.where(hospitalized, notification_day + rng.integers(0, 3, size=rows), np.datetime64('NaT'))
+    dates['DT_OBITO'] = np.where(evolution == 2, notification_day + rng.integers(1, 15, size=rows), np.datetime64('NaT'))
+    dates['DT_ALRM'] = np.where(classification == 11, symptoms_day + rng.integers(3, 7, size=rows), np.datetime64('NaT'))
+    dates['DT_GRAV'] = np.where(classification == 12, symptoms_day + rng.integers(3, 7, size=rows), np.datetime64('NaT'))
+    dates['DT_ENCERRA'] = np.where(rng.random(rows) < 0.1, np.datetime64('NaT'), dates['DT_ENCERRA'])
+
+    for column in DATE_COLUMNS:
+        data[column] = dates[column].astype('datetime64[ns]')
+
+    columns = [column for column in dict.fromkeys(REQUIRED_COLUMNS) if column in data]
+    return apply_schema(pd.DataFrame(data)[columns])
+
+
+def write_sinan_csv(filepath: str, rows: int, chunksize: int = CHUNKS_SIZE, seed: int | None = None) -> str:
+    """Writes a random SINAN-shaped CSV in streaming mode, one chunk at a time, so any number of rows fits in memory
+
+    Args:
+        filepath (str): CSV file path
+        rows (int): How many rows
+        chunksize (int, optional): Rows generated per chunk. Defaults to CHUNKS_SIZE.
+        seed (int | None, optional): Seed for the random generator. Defaults to None.
+
+    Returns:
+        str: The CSV file path
+    """
+    seeds = np.random.SeedSequence(seed).spawn(-(-rows // chunksize))
+
+    with open(filepath, 'w', newline='') as file:
+        for i, chunk_seed in enumerate(seeds):
+            chunk = generate_sinan_dataframe(min(chunksize, rows - i * chunksize), chunk_seed)
+            chunk.to_csv(file, header=(i == 0), index=False, date_format=DATE_FORMAT)
+
+    return filepath
@@ -1,20 +1,62 @@
 import pandas as pd
 import os
 import sys
+import functools
+import io
 import concurrent.futures
 sys.path.append(os.getcwd())
-from src.config import DATASET_LOCAL, CHUNKS_SIZE, FILES_FOLDER
-from src.filtering import filter_dataset
+import numpy as np
+from src.config import DATASET_LOCAL, CHUNKS_SIZE, COLUMN_STORE_FOLDER, REQUIRED_COLUMNS, TOTAL_DATASET, READING_BACKEND, READING_RANGE_BYTES
+from src.filtering import DERIVED_COLUMNS, Predicate, filter_dataset, scan_columns
+from src.utils.dimensions import add_uf_acronym
+from src.utils.cache import is_cache_valid, iter_cached_chunks
+from src.utils.column_store import load_metadata, open_column_arrays, open_column_frame, write_column_store
+from src.utils.instrumentation import instrument, instrument_iterator, merge_worker_records, span, traced_call
+from src.utils.memory import bounded_map, plan_reading
+from src.utils.result_cache import file_fingerprint, total_dataset_files
+from src.utils.schema import apply_schema, concat_chunks, memory_report, read_csv_schema
 
 
-def processing_partial_dataset(filepath:str, usecols:list, chunksize:int=1) -> pd.DataFrame:
+def read_dataset_chunks(filepath: str, usecols: list | None = None, chunksize: int = CHUNKS_SIZE, use_cache: bool = True):
+    """Reads a dataset by chunks, from the columnar cache when it is valid, or from the CSV otherwise.
+    The columns are parsed to the compact dtypes of the COLUMNS_SCHEMA
+
+    Args:
+        filepath (str): CSV file path
+        usecols (list | None, optional): Columns to read, the ones missing in the file are ignored. Defaults to None (all columns).
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+        use_cache (bool, optional): If False, always reads the CSV. Defaults to True.
+
+    Returns:
+        Iterator[pd.DataFrame]: Chunks iterator
+    """
+    chunks = iter_cached_chunks(filepath, usecols, chunksize) if use_cache else None
+    if chunks is not None:
+        return instrument_iterator(chunks, 'read_cache_chunk')
+
+    # Fallback to the CSV when the cache is missing or stale
+    header = pd.read_csv(filepath, nrows=0).columns
+    columns = [column for column in header if usecols is None or column in usecols]
+    chunks = pd.read_csv(filepath, usecols=columns, low_memory=False, chunksize=chunksize, **read_csv_schema(columns))
+
+    return instrument_iterator((apply_schema(chunk) for chunk in chunks), 'read_csv_chunk')
+
+
+@instrument(count_rows=True)
+def processing_partial_dataset(filepath:str, usecols:list, chunksize:int|None=None, predicate: Predicate | None = None,
+                               memory_budget: int | None = None) -> pd.DataFrame:
         """
         Function that will process the total dataframe costing less memory
 
         Args:
             filepath (str): Add the file path
             usecols (list): Add a list with the columns that you will use
-            chunksize (int, optional): Define the size of the chunks. Defaults to 1.
+            chunksize (int | None, optional): Define the size of the chunks. Defaults to None (sized from the memory budget and the measured bytes per row).
+            predicate (Predicate | None, optional): Filter applied to each chunk while reading. Defaults to None.
+            memory_budget (int | None, optional): Bytes the reading may use. Defaults to None (READING_MEMORY_BUDGET, or a fraction of the physical memory).
+
+        Raises:
+            MemoryBudgetError: Raises, before swapping, if the result does not fit in the memory budget
 
         Returns:
             pd.DataFrame: Output the final processed dataframe
@@ -43,59 +85,303 @@ def processing_partial_dataset(filepath:str, usecols:list, chunksize:int=1) -> p
         19  2021-01-08    2.0      2.0       1.0       2.0     2.0     1.0         2.0
         """
 
-        # Read the dataset with chunks
-        df = pd.read_csv(filepath, usecols=usecols, low_memory=False, chunksize=chunksize)
+        readcols = scan_columns(usecols, predicate)
+
+        # Without a predicate the whole file is kept, so it fails before reading if it does not fit
+        plan = plan_reading(filepath, readcols, memory_budget, workers=1)
+        if predicate is None:
+            plan.check_estimate()
+
+        # Read the dataset with chunks, with the columns of the predicate too
+        df = read_dataset_chunks(filepath, readcols, chunksize or plan.chunk_rows)
 
         # Set a empty list to keep the chunks
         df_list = []
 
-        # Append each chunk in a list
+        # Append each filtered chunk in a list
         for chunk in df:
+            chunk = chunk if predicate is None else prepare_chunk(chunk, predicate, _output_columns(usecols))
+            plan.add_result(chunk)
             df_list.append(chunk)
 
         # Concatenate the list in a dataframe
-        df_total = pd.concat(df_list, ignore_index=True)
+        df_total = concat_chunks(df_list, ignore_index=True)
 
         return df_total
 
 
-def processing_total_dataset() -> pd.DataFrame:
+def split_byte_ranges(filepath: str, range_bytes: int = READING_RANGE_BYTES) -> tuple[bytes, list[tuple[int, int]]]:
+    """Splits a CSV file in byte ranges aligned to the start of the lines, so each range can be parsed on its own.
+    It assumes, like the SINAN files, that no field has a line break inside quotes
+
+    Args:
+        filepath (str): CSV file path
+        range_bytes (int, optional): Approximate size of each range. Defaults to READING_RANGE_BYTES.
+
+    Returns:
+        tuple[bytes, list[tuple[int, int]]]: The header line and the (start, end) offsets of each range
+    """
+    size = os.path.getsize(filepath)
+    ranges = []
+
+    with open(filepath, 'rb') as file:
+        header = file.readline()
+        start = file.tell()
+
+        while start < size:
+            end = min(start + range_bytes, size)
+            if end < size:
+                # Move the end to the beginning of the next line
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+
+    return header, ranges
+
+
+def read_byte_range(filepath: str, header: bytes, start: int, end: int, usecols: list | None = None) -> pd.DataFrame:
+    """Parses one byte range of a CSV file, with the compact dtypes of the COLUMNS_SCHEMA
+
+    Args:
+        filepath (str): CSV file path
+        header (bytes): Header line of the file
+        start (int): First byte of the range
+        end (int): Byte after the end of the range
+        usecols (list | None, optional): Columns to read, the ones missing in the file are ignored. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: The rows of the range
+    """
+    with span('read_byte_range', bytes_read=end - start) as current:
+        with open(filepath, 'rb') as file:
+            file.seek(start)
+            data = file.read(end - start)
+
+        header_columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+        columns = [column for column in header_columns if usecols is None or column in usecols]
+
+        chunk = apply_schema(pd.read_csv(io.BytesIO(header + data), usecols=columns, low_memory=False, **read_csv_schema(columns)))
+        current.add_rows(len(chunk))
+
+    return chunk
+
+
+def _output_columns(usecols: list | None) -> list | None:
+    """Requested columns plus the ones decoded from them, which are the columns a reader returns"""
+    if usecols is None:
+        return None
+    derived = [column for column, sources in DERIVED_COLUMNS.items() if set(sources) <= set(usecols)]
+    return list(dict.fromkeys(list(usecols) + derived))
+
+
+def prepare_chunk(chunk: pd.DataFrame, predicate: Predicate | None = None, columns: list | None = None) -> pd.DataFrame:
+    """Decodes the UF acronyms of a chunk and filters it, the same way for every reader
+
+    Args:
+        chunk (pd.DataFrame): Chunk of the dataset
+        predicate (Predicate | None, optional): Filter of the rows. Defaults to None.
+        columns (list | None, optional): Columns to keep after filtering, the ones read only for the predicate are dropped. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: Processed chunk
+    """
+    # Vectorized take on the UF index, instead of merging the UF table into every chunk
+    with span('decode_uf', rows=len(chunk)):
+        add_uf_acronym(chunk)
+
+    with span('filter_dataset', rows=len(chunk)):
+        return filter_dataset(chunk, predicate, columns)
+
+
+def _process_byte_range(filepath: str, header: bytes, byte_range: tuple[int, int], usecols: list | None,
+                        predicate: Predicate | None = None, columns: list | None = None) -> pd.DataFrame:
+    """Parses and processes one byte range, used by the workers of the process pool"""
+    return prepare_chunk(read_byte_range(filepath, header, *byte_range, usecols), predicate, columns)
+
+
+@instrument(count_rows=True)
+def processing_total_dataset(usecols: list = REQUIRED_COLUMNS, backend: str = READING_BACKEND, workers: int | None = None,
+                             predicate: Predicate | None = None, memory_budget: int | None = None) -> pd.DataFrame:
     """
     Function that will process the total dataset costing less memory, uses the columns specified on the CONFIG file
 
+    Args:
+        usecols (list, optional): Columns to read. Defaults to REQUIRED_COLUMNS.
+        backend (str, optional): 'serial', 'thread' or 'process'. The 'process' backend parses and filters byte ranges
+            of the CSV (or the chunks of the cache) in a process pool. Defaults to READING_BACKEND.
+        workers (int | None, optional): Number of workers of the pool. Defaults to None (one per CPU).
+        predicate (Predicate | None, optional): Filter applied to each chunk right after it is read, so the
+            discarded rows and the columns read only for it never reach the final dataframe. Defaults to None.
+        memory_budget (int | None, optional): Bytes the reading may use. The chunks are sized from it and the bytes per
+            row measured on a sample, and only a few chunks are in flight at a time. Defaults to None (READING_MEMORY_BUDGET,
+            or a fraction of the physical memory).
+
+    Raises:
+        ValueError: Raises if the backend is not 'serial', 'thread' or 'process'
+        MemoryBudgetError: Raises, before swapping, if the result does not fit in the memory budget
+
     Returns:
-        pd.DataFrame: Output the final processed dataframe
+        pd.DataFrame: Output the final processed dataframe, the same for every backend
     """
-    try:
-        # Read the dataset with chunks
-        chunks = pd.read_csv(os.path.join(DATASET_LOCAL(), 'sinan_dengue_sample_total.csv'), low_memory=False, chunksize=CHUNKS_SIZE)
-        
-        # Load the file with the uf codes and acronyms
-        cities = pd.read_csv(os.path.join(FILES_FOLDER(), "ufs.csv"), usecols=["SG_UF_NOT","SIGLA_UF"], low_memory=False)
-
-        dataframes: list[pd.DataFrame] = []
-
-        # Create the multithread structure to process each chunk
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            threads_running: list[concurrent.futures.Future] = []
-
-            for chunk in chunks:
-                # Mergin the data on the acronyms
-                
-                merged_data = pd.merge(chunk, cities, on="SG_UF_NOT", how="left")
-
-                threads_running.append(
-                    executor.submit(
-                        filter_dataset,
-                        merged_data
-                    )
-                )
-
-            concurrent.futures.wait(threads_running)
-
-            for pending_thread in threads_running:
-                dataframes.append(pending_thread.result())
-
-        return pd.concat(dataframes)
-    except Exception as e:
-        print(e)
+    if backend not in ('serial', 'thread', 'process'):
+        raise ValueError("Invalid backend. Use 'serial', 'thread' or 'process'.")
+
+    filepath = os.path.join(DATASET_LOCAL(), TOTAL_DATASET)
+
+    # Only the requested columns and the ones of the predicate are parsed
+    readcols = scan_columns(usecols, predicate)
+    columns = None if predicate is None else _output_columns(usecols)
+    prepare = functools.partial(prepare_chunk, predicate=predicate, columns=columns)
+
+    # Without a predicate the whole dataset is kept, so it fails before reading if it does not fit. With a predicate
+    # the estimate (of the unfiltered dataset) would refuse readings that fit, so the kept chunks are checked instead
+    plan = plan_reading(filepath, readcols, memory_budget, 1 if backend == 'serial' else workers)
+    if predicate is None:
+        plan.check_estimate()
+
+    dataframes = []
+
+    def collect(results) -> None:
+        for dataframe in results:
+            plan.add_result(dataframe)
+            dataframes.append(dataframe)
+
+    if backend == 'serial':
+        collect(prepare(chunk) for chunk in read_dataset_chunks(filepath, readcols, plan.chunk_rows))
+
+    elif backend == 'thread':
+        # Read the dataset with chunks, and process each one of them in a thread. The reading waits while
+        # there are max_in_flight chunks pending, instead of parsing the whole file ahead of the workers
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            chunks = read_dataset_chunks(filepath, readcols, plan.chunk_rows)
+            collect(bounded_map(executor.submit, prepare, chunks, plan.max_in_flight))
+
+    elif is_cache_valid(filepath):
+        # The cache is already parsed, so the workers only process its chunks. The spans of the workers come back with the chunks
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            chunks = read_dataset_chunks(filepath, readcols, plan.chunk_rows)
+            results = bounded_map(executor.submit, traced_call(prepare, 'prepare_chunk'), chunks, plan.max_in_flight)
+            collect(map(merge_worker_records, results))
+
+    else:
+        # Each worker reads, parses and filters its own byte ranges of the CSV, the map keeps them in order
+        header, ranges = split_byte_ranges(filepath, plan.range_bytes)
+        process = functools.partial(_process_byte_range, filepath, header, usecols=readcols, predicate=predicate, columns=columns)
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = bounded_map(executor.submit, traced_call(process, '_process_byte_range'), ranges, plan.max_in_flight)
+            collect(map(merge_worker_records, results))
+
+    return concat_chunks(dataframes, ignore_index=True)
+
+
+def column_store_folder() -> str:
+    """Folder of the column store of the total dataset
+
+    Returns:
+        str: Column store folder's path
+    """
+    return os.path.join(COLUMN_STORE_FOLDER(), os.path.splitext(TOTAL_DATASET)[0])
+
+
+def is_column_store_valid(usecols: list = REQUIRED_COLUMNS) -> bool:
+    """Checks if the column store was built from the current total dataset and has the columns
+
+    Args:
+        usecols (list, optional): Columns that must be in the store. Defaults to REQUIRED_COLUMNS.
+
+    Returns:
+        bool: True if the store can be used
+    """
+    metadata = load_metadata(column_store_folder())
+    if metadata is None or metadata['source']['files'] != [file_fingerprint(filepath) for filepath in total_dataset_files()]:
+        return False
+    # The columns missing in the CSV are also missing in the store, so the requested columns are compared
+    return set(usecols) <= set(metadata['source']['columns'])
+
+
+@instrument()
+def build_total_column_store(usecols: list = REQUIRED_COLUMNS) -> dict:
+    """Processes the total dataset chunk by chunk (like processing_total_dataset) into the memory-mapped column store
+
+    Args:
+        usecols (list, optional): Columns of the store. Defaults to REQUIRED_COLUMNS.
+
+    Returns:
+        dict: Metadata of the store
+    """
+    filepath = os.path.join(DATASET_LOCAL(), TOTAL_DATASET)
+    source = {
+        'files': [file_fingerprint(filepath) for filepath in total_dataset_files()],
+        'columns': list(dict.fromkeys(usecols)),
+    }
+    chunks = (prepare_chunk(chunk) for chunk in read_dataset_chunks(filepath, usecols, CHUNKS_SIZE))
+    return write_column_store(chunks, column_store_folder(), source=source)
+
+
+def _open_column_store(usecols: list, build: bool) -> None:
+    if not is_column_store_valid(usecols):
+        if not build:
+            raise FileNotFoundError("O column store não existe ou está desatualizado, use build_total_column_store()")
+        build_total_column_store(list(dict.fromkeys(REQUIRED_COLUMNS + list(usecols))))
+
+
+def column_store_arrays(usecols: list = REQUIRED_COLUMNS, build: bool = True) -> dict[str, np.ndarray]:
+    """Opens the columns of the processed total dataset as read-only np.memmap arrays. Concurrent analyses share
+    one copy of the data in the page cache, instead of each one parsing its own DataFrame
+
+    Args:
+        usecols (list, optional): Columns to open. Defaults to REQUIRED_COLUMNS.
+        build (bool, optional): Builds the store when it is missing or stale. Defaults to True.
+
+    Returns:
+        dict[str, np.ndarray]: Raw array of each column (uint8 with 255 as null, int64 nanoseconds, int8/int16 codes or float64)
+    """
+    _open_column_store(usecols, build)
+    return open_column_arrays(column_store_folder(), usecols)
+
+
+def _frame_columns(usecols: list, stored: list) -> list:
+    """Columns of the frame that processing_total_dataset returns for usecols, in its order: the columns read (with the
+    sources of the derived ones), in the order of the file, and the derived columns (like SIGLA_UF) at the end"""
+    readcols = set(scan_columns(usecols))
+    derived = {column for column, sources in DERIVED_COLUMNS.items() if set(sources) <= readcols}
+    # The store is written from the processed chunks, so its columns are already in that order
+    return [column for column in stored if column in readcols | derived]
+
+
+def column_store_frame(usecols: list = REQUIRED_COLUMNS, build: bool = True) -> pd.DataFrame:
+    """Opens the processed total dataset as a zero-copy DataFrame over the column store, with the same columns (in
+    the same order) and dtypes that processing_total_dataset returns
+
+    Args:
+        usecols (list, optional): Columns to open. Defaults to REQUIRED_COLUMNS.
+        build (bool, optional): Builds the store when it is missing or stale. Defaults to True.
+
+    Returns:
+        pd.DataFrame: Read-only DataFrame backed by the memory maps
+    """
+    _open_column_store(usecols, build)
+    folder = column_store_folder()
+    return open_column_frame(folder, _frame_columns(usecols, list(load_metadata(folder)['columns'])))
+
+
+def dataset_memory_report(filepath: str, usecols: list = REQUIRED_COLUMNS, nrows: int = CHUNKS_SIZE) -> pd.DataFrame:
+    """Compares, column by column, the memory of a sample read with the COLUMNS_SCHEMA and read with the types inferred by pandas
+
+    Args:
+        filepath (str): CSV file path
+        usecols (list, optional): Columns to compare. Defaults to REQUIRED_COLUMNS.
+        nrows (int, optional): Rows of the sample. Defaults to CHUNKS_SIZE.
+
+    Returns:
+        pd.DataFrame: Memory report of each column, with the reduction ratio
+    """
+    header = pd.read_csv(filepath, nrows=0).columns
+    columns = [column for column in header if column in usecols]
+
+    inferred = pd.read_csv(filepath, usecols=columns, nrows=nrows, low_memory=False)
+    typed = apply_schema(pd.read_csv(filepath, usecols=columns, nrows=nrows, low_memory=False, **read_csv_schema(columns)))
+
+    return memory_report(typed, baseline=inferred)
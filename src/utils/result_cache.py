@@ -0,0 +1,219 @@
+"""Módulo que contém o cache em disco dos resultados das hipóteses, endereçado pelo conteúdo das entradas, com remoção LRU"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import threading
+from typing import Callable
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, FILES_FOLDER, RESULT_CACHE_FOLDER, RESULT_CACHE_MAX_BYTES, TOTAL_DATASET
+
+_counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(counter: str, amount: int = 1) -> None:
+    with _counters_lock:
+        _counters[counter] += amount
+
+
+def cache_stats() -> dict:
+    """Returns the hit, miss and eviction counters of the result cache
+
+    Returns:
+        dict: 'hits', 'misses' and 'evictions'
+    """
+    with _counters_lock:
+        return dict(_counters)
+
+
+def total_dataset_files() -> list[str]:
+    """Input files of the functions that read the total dataset
+
+    Returns:
+        list[str]: Paths of the unified dataset and of the UF file merged into it
+    """
+    return [os.path.join(DATASET_LOCAL(), TOTAL_DATASET), os.path.join(FILES_FOLDER(), 'ufs.csv')]
+
+
+def file_fingerprint(filepath: str, content_hash: bool = False) -> dict:
+    """Identifies the version of an input file by its path, size and mtime (and, optionally, the hash of its content)
+
+    Args:
+        filepath (str): File path
+        content_hash (bool, optional): Also hashes the content, to survive copies that change the mtime. Defaults to False.
+
+    Returns:
+        dict: The fingerprint ('missing' if the file does not exist)
+    """
+    if not os.path.exists(filepath):
+        return {'path': os.path.abspath(filepath), 'missing': True}
+
+    stat = os.stat(filepath)
+    fingerprint = {'path': os.path.abspath(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if content_hash:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for block in iter(lambda: file.read(2**20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+
+    return fingerprint
+
+
+def value_fingerprint(value) -> str:
+    """Hash of an argument. DataFrames, Series and arrays are hashed by their content"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update(repr(value.dtypes if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+        return digest.hexdigest()
+    if isinstance(value, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(value).tobytes() + repr((value.dtype, value.shape)).encode()).hexdigest()
+    if isinstance(value, (list, tuple)):
+        return repr([value_fingerprint(item) for item in value])
+    if isinstance(value, dict):
+        return repr(sorted((repr(key), value_fingerprint(item)) for key, item in value.items()))
+    return repr(value)
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    """Hash of the source of every module of the src package, computed once per process. The results depend on the
+    functions called by the memoized one, on the config and on the schema, so editing any of them invalidates the cache
+
+    Returns:
+        str: Hexadecimal SHA-256
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for folder, folders, filenames in os.walk(root):
+        folders[:] = sorted(name for name in folders if name != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                filepath = os.path.join(folder, filename)
+                digest.update(os.path.relpath(filepath, root).encode())
+                with open(filepath, 'rb') as file:
+                    digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def _function_fingerprint(func: Callable) -> str:
+    """Identity of the function: its qualified name and the hash of its source, so editing it invalidates the cache"""
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = ''
+    return f'{func.__module__}.{func.__qualname__}:{hashlib.sha256(source.encode()).hexdigest()}'
+
+
+def _result_path(key: str) -> str:
+    return os.path.join(RESULT_CACHE_FOLDER(), f'{key}.pkl')
+
+
+def evict(max_bytes: int = RESULT_CACHE_MAX_BYTES) -> int:
+    """Removes the least recently used results until the cache fits in max_bytes
+
+    Args:
+        max_bytes (int, optional): Size cap. Defaults to RESULT_CACHE_MAX_BYTES.
+
+    Returns:
+        int: Number of removed results
+    """
+    if not os.path.isdir(RESULT_CACHE_FOLDER()):
+        return 0
+
+    entries = []
+    for filename in os.listdir(RESULT_CACHE_FOLDER()):
+        if filename.endswith('.pkl'):
+            stat = os.stat(os.path.join(RESULT_CACHE_FOLDER(), filename))
+            entries.append((stat.st_mtime_ns, stat.st_size, filename))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    # The mtime is refreshed on every hit, so the oldest one is the least recently used
+    for _, size, filename in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(RESULT_CACHE_FOLDER(), filename))
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    _count('evictions', removed)
+    return removed
+
+
+def clear() -> None:
+    """Removes every cached result"""
+    evict(0)
+
+
+def memoize(files: list[str] | Callable[[], list[str]] | None = None, content_hash: bool = False, ignore: tuple = (),
+            max_bytes: int = RESULT_CACHE_MAX_BYTES, version: str | None = None) -> Callable:
+    """Decorator that stores the results of a function on disk. The key combines the fingerprint of the input files,
+    the identity of the function, the code_fingerprint of the src package and the arguments, so a repeated call
+    with the same data, code and parameters just loads the result
+
+    Args:
+        files (list[str] | Callable[[], list[str]] | None, optional): Input files read by the function, or a function that returns them. Defaults to None.
+        content_hash (bool, optional): Also hashes the content of the files. Defaults to False.
+        ignore (tuple, optional): Names of the arguments that do not change the result. Defaults to ().
+        max_bytes (int, optional): Size cap of the cache. Defaults to RESULT_CACHE_MAX_BYTES.
+        version (str | None, optional): Explicit version of the results, changing it invalidates them (for changes outside the src package). Defaults to None.
+
+    Returns:
+        Callable: The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        function_id = _function_fingerprint(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            input_files = files() if callable(files) else (files or [])
+            key_data = {
+                'function': function_id,
+                'code': code_fingerprint(),
+                'version': version,
+                'files': [file_fingerprint(filepath, content_hash) for filepath in input_files],
+                'arguments': {name: value_fingerprint(value) for name, value in bound.arguments.items() if name not in ignore},
+            }
+            key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+            path = _result_path(key)
+
+            try:
+                with open(path, 'rb') as file:
+                    result = pickle.load(file)
+                os.utime(path)
+                _count('hits')
+                return result
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                _count('misses')
+
+            result = func(*args, **kwargs)
+
+            os.makedirs(RESULT_CACHE_FOLDER(), exist_ok=True)
+            temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary, 'wb') as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+            evict(max_bytes)
+
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,139 @@
+"""Módulo que contém o agendador que roda várias hipóteses com uma única leitura do dataset"""
+import concurrent.futures
+import os
+import sys
+from typing import Callable, Iterable
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, CHUNKS_SIZE, TOTAL_DATASET
+from src.filtering import Predicate, filter_dataset, scan_columns
+from src.utils.instrumentation import instrument, merge_worker_records, span, traced_call
+from src.utils.reading import prepare_chunk, read_dataset_chunks
+from src.utils.streaming import Aggregation, required_columns
+
+
+class Task:
+    """A hypothesis registered in the scheduler: its aggregations over the chunks, an optional filter of the rows
+    it sees, and the finalization that turns the aggregated results into its output (statistics, plots)
+    """
+
+    def __init__(self, name: str, aggregations: dict[str, Aggregation], finalize: Callable[[dict], object] | None = None,
+                 predicate: Predicate | None = None):
+        self.name = name
+        self.aggregations = aggregations
+        self.finalize = finalize
+        self.predicate = predicate
+
+    @property
+    def columns(self) -> list[str]:
+        return scan_columns(required_columns(self.aggregations), self.predicate)
+
+
+class Scheduler:
+    """Runs every registered task over one scan of the dataset. Each chunk is read and decoded once, and is
+    fed to all the tasks (the tasks with the same predicate share the filtered chunk)
+
+    >>> scheduler = Scheduler()
+    >>> scheduler.register('exams', {column: Count(column) for column in EXAM_DATE_COLUMNS}, finalize=top_3)
+    >>> results = scheduler.run()
+    """
+
+    def __init__(self):
+        self.tasks: dict[str, Task] = {}
+
+    def register(self, name: str, aggregations: dict[str, Aggregation], finalize: Callable[[dict], object] | None = None,
+                 predicate: Predicate | None = None) -> Task:
+        """Registers a task
+
+        Args:
+            name (str): Name of the task, unique in the scheduler
+            aggregations (dict[str, Aggregation]): Aggregations of the task, by name
+            finalize (Callable[[dict], object] | None, optional): Receives the results of the aggregations and returns
+                the output of the task. It must be a module-level function for the 'process' backend. Defaults to None.
+            predicate (Predicate | None, optional): Filter of the rows seen by the task. Defaults to None.
+
+        Raises:
+            ValueError: Raises if there is already a task with the name
+
+        Returns:
+            Task: The registered task
+        """
+        if name in self.tasks:
+            raise ValueError(f"There is already a task named {name}.")
+        self.tasks[name] = Task(name, aggregations, finalize, predicate)
+        return self.tasks[name]
+
+    def columns(self) -> list[str]:
+        """Union of the columns read by the tasks, which are the only columns of the scan
+
+        Returns:
+            list[str]: Columns, without duplicates
+        """
+        return list(dict.fromkeys(column for task in self.tasks.values() for column in task.columns))
+
+    def scan(self, chunks: Iterable[pd.DataFrame]) -> dict[str, dict]:
+        """Feeds every chunk to all the tasks, holding only the merged states of the aggregations
+
+        Args:
+            chunks (Iterable[pd.DataFrame]): Decoded chunks of the dataset
+
+        Returns:
+            dict[str, dict]: Results of the aggregations of each task
+        """
+        states = {
+            name: {key: aggregation.initial() for key, aggregation in task.aggregations.items()}
+            for name, task in self.tasks.items()
+        }
+
+        for chunk in chunks:
+            with span('scan_chunk', rows=len(chunk)):
+                filtered = {}
+                for name, task in self.tasks.items():
+                    key = id(task.predicate)
+                    if key not in filtered:
+                        filtered[key] = filter_dataset(chunk, task.predicate)
+                    for aggregation_name, aggregation in task.aggregations.items():
+                        states[name][aggregation_name] = aggregation.merge(
+                            states[name][aggregation_name], aggregation.partial(filtered[key])
+                        )
+
+        return {
+            name: {key: aggregation.finalize(states[name][key]) for key, aggregation in task.aggregations.items()}
+            for name, task in self.tasks.items()
+        }
+
+    @instrument()
+    def run(self, chunksize: int = CHUNKS_SIZE, backend: str = 'thread', workers: int | None = None) -> dict[str, object]:
+        """Scans the total dataset once for all the tasks, and then runs their finalizations in parallel
+
+        Args:
+            chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+            backend (str, optional): 'thread' or 'process', the pool of the finalizations. Defaults to 'thread'.
+            workers (int | None, optional): Number of workers of the pool. Defaults to None (one per CPU).
+
+        Raises:
+            ValueError: Raises if the backend is not 'thread' or 'process'
+
+        Returns:
+            dict[str, object]: Output of each task (the results of its aggregations when it has no finalization)
+        """
+        if backend not in ('thread', 'process'):
+            raise ValueError("Invalid backend. Use 'thread' or 'process'.")
+
+        chunks = read_dataset_chunks(os.path.join(DATASET_LOCAL(), TOTAL_DATASET), self.columns(), chunksize)
+        results = self.scan(prepare_chunk(chunk) for chunk in chunks)
+
+        if backend == 'thread':
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                futures = {name: executor.submit(task.finalize, results[name]) for name, task in self.tasks.items() if task.finalize is not None}
+                outputs = {name: future.result() for name, future in futures.items()}
+        else:
+            # The spans of the finalizations are recorded in the workers, and come back with their outputs
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = {
+                    name: executor.submit(traced_call(task.finalize, f'{name}.finalize'), results[name])
+                    for name, task in self.tasks.items() if task.finalize is not None
+                }
+                outputs = {name: merge_worker_records(future.result()) for name, future in futures.items()}
+
+        return {name: outputs[name] if name in outputs else results[name] for name in self.tasks}
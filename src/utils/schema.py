@@ -0,0 +1,110 @@
+"""Módulo que contém funções para aplicar os tipos compactos do COLUMNS_SCHEMA aos datasets"""
+import os
+import sys
+import pandas as pd
+from pandas.api.types import union_categoricals
+sys.path.append(os.getcwd())
+from src.config import COLUMNS_SCHEMA, DATE_FORMAT
+
+
+def read_csv_schema(columns: list) -> dict:
+    """Returns the keyword arguments that make pd.read_csv parse the columns straight to their compact dtypes
+
+    Args:
+        columns (list): Columns that will be read (pd.read_csv raises if a date column is not read)
+
+    Returns:
+        dict: 'dtype', 'parse_dates' and 'date_format' arguments for pd.read_csv
+    """
+    schema = {column: COLUMNS_SCHEMA[column] for column in columns if column in COLUMNS_SCHEMA}
+
+    return {
+        'dtype': {column: dtype for column, dtype in schema.items() if not str(dtype).startswith('datetime')},
+        'parse_dates': [column for column, dtype in schema.items() if str(dtype).startswith('datetime')],
+        'date_format': DATE_FORMAT,
+    }
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts (in place) every column of the dataframe that is in the COLUMNS_SCHEMA to its compact dtype
+
+    Args:
+        df (pd.DataFrame): Dataframe to convert
+
+    Returns:
+        pd.DataFrame: The same dataframe, with the converted columns
+    """
+    for column in df.columns.intersection(list(COLUMNS_SCHEMA)):
+        dtype = COLUMNS_SCHEMA[column]
+        if df[column].dtype == dtype:
+            continue
+        if str(dtype).startswith('datetime'):
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format=DATE_FORMAT, errors='coerce')
+            df[column] = df[column].astype(dtype)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            # Numeric codes may come as floats (10.0) or strings ('10') from other readers
+            if pd.api.types.is_numeric_dtype(dtype.categories):
+                values = pd.to_numeric(values, errors='coerce')
+            df[column] = values.astype(dtype)
+        elif dtype == 'category':
+            df[column] = df[column].astype(object).astype('category')
+        elif df[column].dtype != dtype:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+    return df
+
+
+def concat_chunks(chunks: list[pd.DataFrame], **kwargs) -> pd.DataFrame:
+    """Concatenates chunks keeping the categorical columns, even when each chunk has different categories
+
+    Args:
+        chunks (list[pd.DataFrame]): Chunks to concatenate
+        **kwargs: Extra arguments for pd.concat
+
+    Returns:
+        pd.DataFrame: Concatenated dataframe
+    """
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+
+    for column in chunks[0].columns:
+        dtypes = [chunk[column].dtype for chunk in chunks if column in chunk.columns]
+        if isinstance(dtypes[0], pd.CategoricalDtype) and any(dtype != dtypes[0] for dtype in dtypes):
+            categories = union_categoricals([chunk[column] for chunk in chunks if column in chunk.columns], ignore_order=True, sort_categories=True).categories
+            for chunk in chunks:
+                if column in chunk.columns:
+                    chunk[column] = chunk[column].cat.set_categories(categories)
+
+    return pd.concat(chunks, **kwargs)
+
+
+def memory_report(df: pd.DataFrame, baseline: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Reports the memory used by each column of the dataframe
+
+    Args:
+        df (pd.DataFrame): Dataframe to measure
+        baseline (pd.DataFrame | None, optional): Same data read without the schema, to compare with. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Dtype and bytes of each column (and the baseline's bytes and the reduction ratio, if given), with a 'TOTAL' row
+    """
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(index=False, deep=True),
+    })
+
+    if baseline is not None:
+        report['baseline_dtype'] = baseline.dtypes.astype(str).reindex(report.index)
+        report['baseline_bytes'] = baseline.memory_usage(index=False, deep=True).reindex(report.index)
+        report['reduction'] = report['baseline_bytes'] / report['bytes']
+
+    total = report.select_dtypes('number').sum()
+    if baseline is not None:
+        total['reduction'] = total['baseline_bytes'] / total['bytes']
+    report.loc['TOTAL'] = total
+
+    return report
@@ -1,10 +1,81 @@
 """Módulo que contém funções úteis de estatística"""
 import pandas as pd
 import numpy as np
+import os
+import sys
+import concurrent.futures
 from math import sqrt
+sys.path.append(os.getcwd())
+from src.config import REQUIRED_COLUMNS, SYMPTOM_COLUMNS, COMORBIDITY_COLUMNS, MONTE_CARLO_RESAMPLES, MONTE_CARLO_BATCH
+from src.utils.instrumentation import instrument, merge_worker_records, traced_call
 
-def chi_square_test(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> float:
-    """Receive two pandas Series, and calculate the Square Chi test between them
+def _check_series(*series: pd.Series) -> None:
+    # Checking the args types
+    for serie in series:
+        if not isinstance(serie, pd.Series):
+            raise TypeError("Os argumentos passados não são Séries Pandas")
+
+
+def _encode(qualitative_variable: pd.Series) -> tuple[np.ndarray, int]:
+    """Codes the categories of a Series as integers from 0 to k-1 (-1 for the null values)"""
+    codes, uniques = pd.factorize(qualitative_variable, sort=True)
+    return codes, len(uniques)
+
+
+def _contingency_from_codes(codes_1: np.ndarray, levels_1: int, codes_2: np.ndarray, levels_2: int) -> np.ndarray:
+    """Counts every pair of codes with a single bincount, dropping the rows and columns without observations (like pd.crosstab)"""
+    valid = (codes_1 >= 0) & (codes_2 >= 0)
+    table = np.bincount(codes_1[valid] * levels_2 + codes_2[valid], minlength=levels_1 * levels_2).reshape(levels_1, levels_2)
+    return table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+
+
+def contingency_table(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> np.ndarray:
+    """Builds the contingency table of two Series, with the same counts of pd.crosstab (without the margins)
+
+    Args:
+        qualitative_variable_1 (pd.Series): First Series (rows)
+        qualitative_variable_2 (pd.Series): Second Series (columns)
+
+    Raises:
+        TypeError: Raises when the arguments are not Pandas Series
+
+    Returns:
+        np.ndarray: Table of counts
+    """
+    _check_series(qualitative_variable_1, qualitative_variable_2)
+
+    return _contingency_from_codes(*_encode(qualitative_variable_1), *_encode(qualitative_variable_2))
+
+
+def table_measures(cross_table: np.ndarray) -> dict:
+    """Calculates the Chi Square, Crammer's V and the Contigency Coefficient of a contingency table
+
+    Args:
+        cross_table (np.ndarray): Table of counts, without the margins
+
+    Returns:
+        dict: 'chi_square', 'crammer_V' and 'contigency_coefficient', besides the size 'n' of the sample
+    """
+    cross_table = np.asarray(cross_table, dtype=float)
+
+    n = cross_table.sum()
+    r, s = cross_table.shape
+
+    # Expected value of each entry, from the margins
+    expected_values = np.outer(cross_table.sum(axis=1), cross_table.sum(axis=0)) / n
+    qui_quadrado = float((((cross_table - expected_values) ** 2) / expected_values).sum())
+
+    return {
+        'chi_square': qui_quadrado,
+        'crammer_V': sqrt(qui_quadrado / (n * min(r - 1, s - 1))) if min(r, s) > 1 else np.nan,
+        'contigency_coefficient': sqrt(qui_quadrado / (qui_quadrado + n)),
+        'n': int(n),
+    }
+
+
+@instrument()
+def contingency_measures(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> dict:
+    """Calculates the Chi Square, Crammer's V and the Contigency Coefficient from a single contingency table
 
     Args:
         qualitative_variable_1 (pd.Series): First Series
@@ -14,42 +85,231 @@ def chi_square_test(qualitative_variable_1: pd.Series, qualitative_variable_2: p
         TypeError: Raises when the arguments are not Pandas Series
 
     Returns:
-        float: Chi Square Result
+        dict: 'chi_square', 'crammer_V', 'contigency_coefficient' and 'n'
     """
-    # Checking the args types
-    if not isinstance(qualitative_variable_1, pd.Series) or not isinstance(qualitative_variable_2, pd.Series):
-        raise TypeError("Os argumentos passados não são Séries Pandas")
+    return table_measures(contingency_table(qualitative_variable_1, qualitative_variable_2))
 
-    cross_table = pd.crosstab(qualitative_variable_1, qualitative_variable_2, margins=True)
 
-    # Creating the frequency table
-    frequency_row = np.ndarray((1,len(cross_table.columns)), dtype=float)
-    
-    for i, element in enumerate(cross_table.loc['All']):
-        frequency_row[0,i] = element/cross_table.loc['All', 'All']
+@instrument()
+def association_matrix(df: pd.DataFrame, columns: list | None = None, measure: str = 'crammer_V') -> pd.DataFrame:
+    """Calculates a measure of association between every pair of columns. Each column is coded only once
 
-    # Creating the Expected Values table
-    expected_values = pd.DataFrame(index=cross_table.index, columns=cross_table.columns, dtype=pd.Float64Dtype())
-    
-    # Putting the expected value in each IJ entry of the expected value's table
-    for row in cross_table.index:
-        for i_column, column in enumerate(cross_table.columns):
-            if column == 'All':
-                expected_values.loc[row, column] = expected_values.loc[row].sum()
-                continue
-            expected_values.loc[row, column] = cross_table.loc[row, 'All']*frequency_row[0, i_column] 
+    Args:
+        df (pd.DataFrame): Dataframe with the columns
+        columns (list | None, optional): Columns to compare. Defaults to None (the symptom and comorbidity columns of the REQUIRED_COLUMNS).
+        measure (str, optional): 'chi_square', 'crammer_V' or 'contigency_coefficient'. Defaults to 'crammer_V'.
+
+    Raises:
+        TypeError: Raises if there is a missing column in the Dataframe
+        ValueError: Raises if the measure is not valid
+
+    Returns:
+        pd.DataFrame: Symmetric matrix of the measure
+    """
+    if columns is None:
+        columns = [column for column in SYMPTOM_COLUMNS + COMORBIDITY_COLUMNS if column in REQUIRED_COLUMNS]
+    if measure not in ('chi_square', 'crammer_V', 'contigency_coefficient'):
+        raise ValueError("Invalid measure. Use 'chi_square', 'crammer_V' or 'contigency_coefficient'.")
+    for column in columns:
+        if column not in df.columns:
+            raise TypeError(f"Missing column in DataFrame: {column}")
+
+    encoded = [_encode(df[column]) for column in columns]
+    matrix = np.full((len(columns), len(columns)), np.nan)
+
+    for i in range(len(columns)):
+        for j in range(i, len(columns)):
+            cross_table = _contingency_from_codes(*encoded[i], *encoded[j])
+            if cross_table.size:
+                matrix[i, j] = matrix[j, i] = table_measures(cross_table)[measure]
+
+    return pd.DataFrame(matrix, index=columns, columns=columns)
+
+
+def random_tables(row_sums: np.ndarray, column_sums: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Draws random contingency tables with the given margins (the distribution of the tables under independence).
+    Each row is a multivariate hypergeometric draw from the column totals that are left, done column by column
+    with vectorized hypergeometric draws for the whole batch
+
+    Args:
+        row_sums (np.ndarray): Totals of the rows
+        column_sums (np.ndarray): Totals of the columns (with the same sum of the rows)
+        size (int): Number of tables
+        rng (np.random.Generator): Random generator
+
+    Returns:
+        np.ndarray: Tables, with shape (size, rows, columns)
+    """
+    r, s = len(row_sums), len(column_sums)
+    tables = np.empty((size, r, s), dtype=np.int64)
+    left = np.tile(np.asarray(column_sums, dtype=np.int64), (size, 1))
+
+    for i in range(r - 1):
+        needed = np.full(size, row_sums[i], dtype=np.int64)
+        others = left.sum(axis=1)
+        for j in range(s - 1):
+            others -= left[:, j]
+            drawn = rng.hypergeometric(left[:, j], others, needed)
+            tables[:, i, j] = drawn
+            left[:, j] -= drawn
+            needed -= drawn
+        tables[:, i, s - 1] = needed
+        left[:, s - 1] -= needed
+
+    tables[:, r - 1, :] = left
+    return tables
+
+
+def _chi_square_of_tables(tables: np.ndarray, expected_values: np.ndarray) -> np.ndarray:
+    """Chi square of each table of a batch, all of them with the same margins (and so the same expected values)"""
+    return (((tables - expected_values) ** 2) / expected_values).sum(axis=(1, 2))
+
+
+def _count_extreme_tables(cross_table: np.ndarray, observed: float, size: int, seed: np.random.SeedSequence) -> int:
+    """Draws a batch of tables with the margins of cross_table and counts the ones with a chi square at least the observed one"""
+    rng = np.random.default_rng(seed)
+    row_sums, column_sums = cross_table.sum(axis=1), cross_table.sum(axis=0)
+    expected_values = np.outer(row_sums, column_sums) / cross_table.sum()
+    statistics = _chi_square_of_tables(random_tables(row_sums, column_sums, size, rng), expected_values)
+    # The tolerance keeps the tables with the same statistic of the observed one, apart from rounding
+    return int(np.count_nonzero(statistics >= observed * (1 - 1e-9)))
+
+
+def _drop_empty_margins(cross_table: np.ndarray) -> np.ndarray:
+    """Drops the rows and columns without observations, whose expected values are zero (and the chi square NaN)"""
+    return cross_table[cross_table.sum(axis=1) > 0][:, cross_table.sum(axis=0) > 0]
 
-    # Creating the table of the values differences
-    difference_table = pd.DataFrame(index=cross_table.index, columns=cross_table.columns, dtype=pd.Float64Dtype())
-    for column in difference_table.columns:
-        difference_table[column] = ((cross_table[column] - expected_values[column])**2)/expected_values[column]
 
-    # Calculating the Chi Square
-    qui_quadrado = 0
-    for row in difference_table.iloc:
-        qui_quadrado += row.sum()
+def _batches(resamples: int, batch_size: int) -> list[int]:
+    return [min(batch_size, resamples - start) for start in range(0, resamples, batch_size)]
 
-    return qui_quadrado
+
+@instrument()
+def monte_carlo_significance(cross_tables: list[np.ndarray], resamples: int = MONTE_CARLO_RESAMPLES, seed: int | None = None,
+                             workers: int | None = None, batch_size: int = MONTE_CARLO_BATCH) -> list[dict]:
+    """Monte Carlo p-values of the chi square of many contingency tables, with the margins fixed. They are exact up to
+    the sampling error, even for sparse tables where the asymptotic chi square distribution does not hold. Crammer's V
+    and the Contigency Coefficient only rescale the chi square for fixed margins, so they share the same p-value.
+    The batches of every table run in one process pool, and each batch has its own seed spawned from the seed, so
+    the results do not depend on the number of workers
+
+    Args:
+        cross_tables (list[np.ndarray]): Tables of counts, without the margins
+        resamples (int, optional): Random tables drawn for each table. Defaults to MONTE_CARLO_RESAMPLES.
+        seed (int | None, optional): Seed of the draws. Defaults to None (a random one).
+        workers (int | None, optional): Processes of the pool, 1 to draw in this process. Defaults to None (one per CPU).
+        batch_size (int, optional): Tables drawn at once by each task. Defaults to MONTE_CARLO_BATCH.
+
+    Returns:
+        list[dict]: table_measures of each table (without its empty rows and columns), with its 'p_value' and the
+        number of 'resamples'. The p-value is NaN when less than two rows or columns have observations
+    """
+    cross_tables = [_drop_empty_margins(np.asarray(cross_table, dtype=np.int64)) for cross_table in cross_tables]
+    measures = [
+        table_measures(cross_table) if cross_table.size else {'chi_square': np.nan, 'crammer_V': np.nan, 'contigency_coefficient': np.nan, 'n': 0}
+        for cross_table in cross_tables
+    ]
+    sizes = _batches(resamples, batch_size)
+    seeds = [table_seed.spawn(len(sizes)) for table_seed in np.random.SeedSequence(seed).spawn(len(cross_tables))]
+
+    jobs = [
+        (position, cross_table, measures[position]['chi_square'], size, batch_seed)
+        for position, cross_table in enumerate(cross_tables) if min(cross_table.shape) > 1
+        for size, batch_seed in zip(sizes, seeds[position])
+    ]
+    extreme = [0] * len(cross_tables)
+
+    if workers == 1:
+        for position, *arguments in jobs:
+            extreme[position] += _count_extreme_tables(*arguments)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            count = traced_call(_count_extreme_tables)
+            futures = [(position, executor.submit(count, *arguments)) for position, *arguments in jobs]
+            for position, future in futures:
+                extreme[position] += merge_worker_records(future.result())
+
+    for position, cross_table in enumerate(cross_tables):
+        # A table with a single row or column (after dropping the empty ones) is always the observed one
+        valid = min(cross_table.shape) > 1
+        measures[position]['p_value'] = (extreme[position] + 1) / (resamples + 1) if valid else np.nan
+        measures[position]['resamples'] = resamples if valid else 0
+
+    return measures
+
+
+def contingency_significance(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series, resamples: int = MONTE_CARLO_RESAMPLES,
+                             seed: int | None = None, workers: int | None = 1) -> dict:
+    """Calculates the Chi Square, Crammer's V and the Contigency Coefficient with their Monte Carlo p-value
+
+    Args:
+        qualitative_variable_1 (pd.Series): First Series
+        qualitative_variable_2 (pd.Series): Second Series
+        resamples (int, optional): Random tables drawn. Defaults to MONTE_CARLO_RESAMPLES.
+        seed (int | None, optional): Seed of the draws. Defaults to None (a random one).
+        workers (int | None, optional): Processes of the pool. Defaults to 1 (no pool).
+
+    Raises:
+        TypeError: Raises when the arguments are not Pandas Series
+
+    Returns:
+        dict: 'chi_square', 'crammer_V', 'contigency_coefficient', 'n', 'p_value' and 'resamples'
+    """
+    return monte_carlo_significance([contingency_table(qualitative_variable_1, qualitative_variable_2)], resamples, seed, workers)[0]
+
+
+@instrument()
+def association_significance(df: pd.DataFrame, columns: list | None = None, resamples: int = MONTE_CARLO_RESAMPLES,
+                             seed: int | None = None, workers: int | None = None) -> pd.DataFrame:
+    """Calculates the measures of association and their Monte Carlo p-values for every pair of columns at once
+
+    Args:
+        df (pd.DataFrame): Dataframe with the columns
+        columns (list | None, optional): Columns to compare. Defaults to None (the symptom and comorbidity columns of the REQUIRED_COLUMNS).
+        resamples (int, optional): Random tables drawn for each pair. Defaults to MONTE_CARLO_RESAMPLES.
+        seed (int | None, optional): Seed of the draws. Defaults to None (a random one).
+        workers (int | None, optional): Processes of the pool. Defaults to None (one per CPU).
+
+    Raises:
+        TypeError: Raises if there is a missing column in the Dataframe
+
+    Returns:
+        pd.DataFrame: One row per pair, with the measures, the 'p_value' and the number of 'resamples'
+    """
+    if columns is None:
+        columns = [column for column in SYMPTOM_COLUMNS + COMORBIDITY_COLUMNS if column in REQUIRED_COLUMNS]
+    for column in columns:
+        if column not in df.columns:
+            raise TypeError(f"Missing column in DataFrame: {column}")
+
+    encoded = [_encode(df[column]) for column in columns]
+    pairs = [(i, j) for i in range(len(columns)) for j in range(i + 1, len(columns))]
+    cross_tables = [_contingency_from_codes(*encoded[i], *encoded[j]) for i, j in pairs]
+
+    # The empty tables (a column without values) have no measures
+    filled = [position for position, cross_table in enumerate(cross_tables) if cross_table.size]
+    measures = monte_carlo_significance([cross_tables[position] for position in filled], resamples, seed, workers)
+
+    result = pd.DataFrame(measures)
+    result.insert(0, 'column_2', [columns[pairs[position][1]] for position in filled])
+    result.insert(0, 'column_1', [columns[pairs[position][0]] for position in filled])
+    return result
+
+
+def chi_square_test(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> float:
+    """Receive two pandas Series, and calculate the Square Chi test between them
+
+    Args:
+        qualitative_variable_1 (pd.Series): First Series
+        qualitative_variable_2 (pd.Series): Second Series
+
+    Raises:
+        TypeError: Raises when the arguments are not Pandas Series
+
+    Returns:
+        float: Chi Square Result
+    """
+    return contingency_measures(qualitative_variable_1, qualitative_variable_2)['chi_square']
 
 
 def crammer_V(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> float:
@@ -65,18 +325,7 @@ def crammer_V(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Seri
     Returns:
         float: Crammer's V
     """
-    if not isinstance(qualitative_variable_1, pd.Series) or not isinstance(qualitative_variable_2, pd.Series):
-        raise TypeError
-    
-    qui_quadrado = chi_square_test(qualitative_variable_1, qualitative_variable_2)
-
-    cross_table = pd.crosstab(qualitative_variable_1, qualitative_variable_2, margins=True)
-
-    n = cross_table.loc['All', 'All']
-    r = len(cross_table.index)-1
-    s = len(cross_table.columns)-1
-
-    return sqrt((qui_quadrado)/(n*min(r-1, s-1)))
+    return contingency_measures(qualitative_variable_1, qualitative_variable_2)['crammer_V']
 
 
 def contigency_coefficient(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> float:
@@ -92,22 +341,11 @@ def contigency_coefficient(qualitative_variable_1: pd.Series, qualitative_variab
     Returns:
         float: Contigency Coefficient
     """
-    # Checando os tipos das variáveis
-    if not isinstance(qualitative_variable_1, pd.Series) or not isinstance(qualitative_variable_2, pd.Series):
-        raise TypeError("Os argumentos passados não são Séries Pandas")
-    
-    qui_quadrado = chi_square_test(qualitative_variable_1, qualitative_variable_2)
-
-    cross_table = pd.crosstab(qualitative_variable_1, qualitative_variable_2, margins=True)
-
-    n = cross_table.loc['All', 'All']
-    r = len(cross_table.index)-1
-    s = len(cross_table.columns)-1
-
-    return sqrt(qui_quadrado/(qui_quadrado+n))
+    return contingency_measures(qualitative_variable_1, qualitative_variable_2)['contigency_coefficient']
 
 
 # Create this function to filter the most taken exam
+@instrument()
 def top_3_counts_numpy(df: pd.DataFrame, columns: list|str) -> list[tuple]:
     """Analyzes the DataFrame to identify the top 3 most taken exams based on non-null values.
     Args:
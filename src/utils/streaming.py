@@ -0,0 +1,297 @@
+"""Módulo que contém o motor de agregação por streaming, que processa o dataset chunk a chunk sem materializá-lo"""
+import os
+import sys
+from math import sqrt
+from typing import Iterable
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import DATASET_LOCAL, CHUNKS_SIZE, TOTAL_DATASET
+from src.utils.instrumentation import span
+from src.filtering import Predicate, scan_columns
+from src.utils.reading import prepare_chunk, read_dataset_chunks
+
+
+class Aggregation:
+    """Base of the partial aggregations. Each one computes a small state from a chunk (partial),
+    combines two states in an associative way (merge) and turns the final state into the result (finalize)
+    """
+    columns: list[str] = []
+
+    def initial(self):
+        """State of an aggregation that did not see any row"""
+        raise NotImplementedError
+
+    def partial(self, chunk: pd.DataFrame):
+        """State of the aggregation over one chunk"""
+        raise NotImplementedError
+
+    def merge(self, left, right):
+        """Combines two states"""
+        raise NotImplementedError
+
+    def finalize(self, state):
+        """Result of the aggregation"""
+        return state
+
+
+class Count(Aggregation):
+    """Counts the rows, or the non-null values of a column"""
+
+    def __init__(self, column: str | None = None):
+        self.column = column
+        self.columns = [] if column is None else [column]
+
+    def initial(self) -> int:
+        return 0
+
+    def partial(self, chunk: pd.DataFrame) -> int:
+        return len(chunk) if self.column is None else int(chunk[self.column].notna().sum())
+
+    def merge(self, left: int, right: int) -> int:
+        return left + right
+
+
+class Sum(Aggregation):
+    """Sums the values of a column, skipping the nulls"""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.columns = [column]
+
+    def initial(self) -> float:
+        return 0
+
+    def partial(self, chunk: pd.DataFrame) -> float:
+        return chunk[self.column].sum()
+
+    def merge(self, left: float, right: float) -> float:
+        return left + right
+
+
+class MinMax(Aggregation):
+    """Minimum and maximum of a column, skipping the nulls. The result is (None, None) for an empty column"""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.columns = [column]
+
+    def initial(self) -> tuple:
+        return (None, None)
+
+    def partial(self, chunk: pd.DataFrame) -> tuple:
+        values = chunk[self.column].dropna()
+        return (values.min(), values.max()) if len(values) else (None, None)
+
+    def merge(self, left: tuple, right: tuple) -> tuple:
+        minimums = [value for value in (left[0], right[0]) if value is not None]
+        maximums = [value for value in (left[1], right[1]) if value is not None]
+        return (min(minimums) if minimums else None, max(maximums) if maximums else None)
+
+
+class ValueCounts(Aggregation):
+    """Frequency of each value of a column"""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.columns = [column]
+
+    def initial(self) -> pd.Series:
+        return pd.Series(dtype='int64')
+
+    def partial(self, chunk: pd.DataFrame) -> pd.Series:
+        # Unobserved categories would only add zeros to the state
+        return chunk[self.column].value_counts(sort=False).loc[lambda counts: counts > 0]
+
+    def merge(self, left: pd.Series, right: pd.Series) -> pd.Series:
+        return left.add(right, fill_value=0).astype('int64')
+
+    def finalize(self, state: pd.Series) -> pd.Series:
+        return state.sort_index()
+
+
+class Crosstab(Aggregation):
+    """Contingency table of two columns, like pd.crosstab"""
+
+    def __init__(self, row: str, column: str):
+        self.row = row
+        self.column = column
+        self.columns = [row, column]
+
+    def initial(self) -> pd.DataFrame:
+        return pd.DataFrame(dtype='int64')
+
+    def partial(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        return pd.crosstab(chunk[self.row], chunk[self.column])
+
+    def merge(self, left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        return left.add(right, fill_value=0).fillna(0).astype('int64')
+
+    def finalize(self, state: pd.DataFrame) -> pd.DataFrame:
+        return state.sort_index().sort_index(axis=1)
+
+
+class DateHistogram(Aggregation):
+    """Number of records of each period ('D', 'W', 'M' or 'Y') of a date column"""
+
+    def __init__(self, column: str, freq: str = 'M'):
+        self.column = column
+        self.freq = freq
+        self.columns = [column]
+
+    def initial(self) -> pd.Series:
+        return pd.Series(dtype='int64')
+
+    def partial(self, chunk: pd.DataFrame) -> pd.Series:
+        dates = pd.to_datetime(chunk[self.column], errors='coerce').dropna()
+        return dates.dt.to_period(self.freq).value_counts(sort=False)
+
+    def merge(self, left: pd.Series, right: pd.Series) -> pd.Series:
+        return left.add(right, fill_value=0).astype('int64')
+
+    def finalize(self, state: pd.Series) -> pd.Series:
+        return state.sort_index()
+
+
+class IntegerHistogram:
+    """Exact histogram of small non-negative integers (like the days a case stayed open). Its memory depends only on
+    the largest value, two histograms can be merged at any moment, and the quantiles and moments come out exact
+    """
+
+    def __init__(self, counts: np.ndarray | None = None):
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def add(self, values: np.ndarray) -> 'IntegerHistogram':
+        """Counts the values (in place)
+
+        Args:
+            values (np.ndarray): Non-negative integers
+
+        Returns:
+            IntegerHistogram: The same histogram
+        """
+        values = np.asarray(values, dtype=np.int64)
+        if len(values):
+            self.counts = self._sum_counts(self.counts, np.bincount(values))
+        return self
+
+    @staticmethod
+    def _sum_counts(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        if len(left) < len(right):
+            left, right = right, left
+        total = left.copy()
+        total[:len(right)] += right
+        return total
+
+    def merge(self, other: 'IntegerHistogram') -> 'IntegerHistogram':
+        """New histogram with the counts of both
+
+        Args:
+            other (IntegerHistogram): Other histogram
+
+        Returns:
+            IntegerHistogram: Merged histogram
+        """
+        return IntegerHistogram(self._sum_counts(self.counts, other.counts))
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def _value_at(self, positions: np.ndarray) -> np.ndarray:
+        """Values at the given positions of the sorted data"""
+        return np.searchsorted(np.cumsum(self.counts), positions, side='right')
+
+    def quantile(self, q: float) -> float:
+        """Quantile with linear interpolation, the default of pandas and numpy
+
+        Args:
+            q (float): Between 0 and 1
+
+        Returns:
+            float: The quantile
+        """
+        position = (self.total - 1) * q
+        lower, upper = self._value_at(np.array([np.floor(position), np.ceil(position)]))
+        return float(lower + (upper - lower) * (position - np.floor(position)))
+
+    def stats(self) -> dict:
+        """Same statistics of analyze_case_days_open
+
+        Returns:
+            dict: std_dev, median, q1, q3, min, max, total_records, sum_of_days and average_days
+        """
+        record_count = self.total
+        if record_count == 0:
+            return {'std_dev': 0, 'median': 0, 'q1': 0, 'q3': 0, 'min': 0, 'max': 0, 'total_records': 0, 'sum_of_days': 0, 'average_days': 0}
+
+        values = np.arange(len(self.counts), dtype=np.int64)
+        # Python integers keep the moments exact
+        sum_of_days = int((values * self.counts).sum())
+        sum_of_squares = int((values ** 2 * self.counts).sum())
+        observed = np.flatnonzero(self.counts)
+
+        variance = (record_count * sum_of_squares - sum_of_days ** 2) / (record_count * (record_count - 1)) if record_count > 1 else np.nan
+
+        return {
+            'std_dev': sqrt(variance) if record_count > 1 else np.nan,
+            'median': self.quantile(0.5),
+            'q1': self.quantile(0.25),
+            'q3': self.quantile(0.75),
+            'min': int(observed[0]),
+            'max': int(observed[-1]),
+            'total_records': record_count,
+            'sum_of_days': sum_of_days,
+            'average_days': sum_of_days / record_count,
+        }
+
+
+def aggregate_chunks(aggregations: dict[str, Aggregation], chunks: Iterable[pd.DataFrame]) -> dict:
+    """Computes the aggregations over an iterable of chunks, holding only the merged states
+
+    Args:
+        aggregations (dict[str, Aggregation]): Aggregations, by name
+        chunks (Iterable[pd.DataFrame]): Chunks of the dataset
+
+    Returns:
+        dict: Result of each aggregation, by name
+    """
+    states = {name: aggregation.initial() for name, aggregation in aggregations.items()}
+
+    for chunk in chunks:
+        with span('aggregate_chunk', rows=len(chunk)):
+            for name, aggregation in aggregations.items():
+                states[name] = aggregation.merge(states[name], aggregation.partial(chunk))
+
+    return {name: aggregation.finalize(states[name]) for name, aggregation in aggregations.items()}
+
+
+def required_columns(aggregations: dict[str, Aggregation]) -> list[str]:
+    """Union of the columns read by the aggregations
+
+    Args:
+        aggregations (dict[str, Aggregation]): Aggregations, by name
+
+    Returns:
+        list[str]: Columns, without duplicates
+    """
+    return list(dict.fromkeys(column for aggregation in aggregations.values() for column in aggregation.columns))
+
+
+def aggregate_total_dataset(aggregations: dict[str, Aggregation], chunksize: int = CHUNKS_SIZE, predicate: Predicate | None = None) -> dict:
+    """Computes the aggregations over the total dataset without materializing it, so the peak memory depends
+    on the chunksize and not on the size of the dataset
+
+    Args:
+        aggregations (dict[str, Aggregation]): Aggregations, by name
+        chunksize (int, optional): Rows per chunk. Defaults to CHUNKS_SIZE.
+        predicate (Predicate | None, optional): Filter applied to each chunk before the aggregations. Defaults to None.
+
+    Returns:
+        dict: Result of each aggregation, by name
+    """
+    # Only the columns referenced by the aggregations and the predicate are read ('SG_UF_NOT' when they use SIGLA_UF)
+    usecols = scan_columns(required_columns(aggregations), predicate)
+
+    chunks = read_dataset_chunks(os.path.join(DATASET_LOCAL(), TOTAL_DATASET), usecols, chunksize)
+    return aggregate_chunks(aggregations, (prepare_chunk(chunk, predicate) for chunk in chunks))
@@ -0,0 +1,334 @@
+"""Módulo que contém o cubo de contagens por dia (semana epidemiológica, mês e ano) × UF × classificação, construído em uma única leitura"""
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.getcwd())
+from src.config import COLUMNS_SCHEMA, TIME_CUBE_DIMENSIONS, TIME_CUBE_RANGE
+from src.utils.result_cache import memoize, total_dataset_files
+from src.utils.streaming import Aggregation, aggregate_total_dataset
+
+
+def epi_weeks(days: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Epidemiological year and week of each day. The weeks start on Sunday, and the week 1 is the first one
+    with 4 days or more in January, so the year of a week is the year of its Wednesday
+
+    Args:
+        days (np.ndarray): Days since 1970-01-01 (int64) or datetime64[D]
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Epidemiological year and week (1 to 53) of each day
+    """
+    days = np.asarray(days).astype('datetime64[D]').astype(np.int64)
+    # 1970-01-01 was a Thursday, so the day of the week starting on Sunday is (days + 4) % 7
+    wednesday = days - (days + 4) % 7 + 3
+    years = wednesday.astype('datetime64[D]').astype('datetime64[Y]')
+    weeks = (wednesday - years.astype('datetime64[D]').astype(np.int64)) // 7 + 1
+    return years.astype(np.int64) + 1970, weeks
+
+
+class TimeCube:
+    """Dense array of counts with one axis of days and one axis per categorical dimension (the last position of
+    each one holds the nulls). Slices, roll-ups by week, month or year and year-over-year tables come from
+    the array, without reading the dataset again
+    """
+
+    def __init__(self, counts: np.ndarray, start: int, dimensions: dict[str, list], date_column: str,
+                 out_of_range: int = 0, missing: int = 0):
+        self.counts = counts
+        self.start = start
+        self.dimensions = dimensions
+        self.date_column = date_column
+        self.out_of_range = out_of_range
+        self.missing = missing
+
+    @property
+    def days(self) -> np.ndarray:
+        """Days of the first axis, since 1970-01-01"""
+        return np.arange(self.start, self.start + len(self.counts), dtype=np.int64)
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.days.astype('datetime64[D]'), name=self.date_column)
+
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def merge(self, other: 'TimeCube') -> 'TimeCube':
+        """Sums two cubes of the same dimensions, aligning their days. Neither cube is changed
+
+        Args:
+            other (TimeCube): The other cube
+
+        Returns:
+            TimeCube: The sum
+        """
+        # The empty cubes (like the ones of the chunks without dates) only add their missing and out of range counts
+        cubes = [cube for cube in (self, other) if len(cube.counts)] or [self]
+        start = min(cube.start for cube in cubes)
+        end = max(cube.start + len(cube.counts) for cube in cubes)
+
+        counts = np.zeros((end - start,) + self.counts.shape[1:], dtype=np.int32)
+        for cube in cubes:
+            counts[cube.start - start:cube.start - start + len(cube.counts)] += cube.counts
+
+        return TimeCube(counts, start, self.dimensions, self.date_column,
+                        self.out_of_range + other.out_of_range, self.missing + other.missing)
+
+    def select(self, start: str | None = None, end: str | None = None, **values) -> 'TimeCube':
+        """Slices the cube by a closed range of dates and by values of the dimensions
+
+        Args:
+            start (str | None, optional): First date. Defaults to None.
+            end (str | None, optional): Last date. Defaults to None.
+            **values: Value or list of values of each dimension (None selects the nulls), like SIGLA_UF=['SP', 'RJ']
+
+        Raises:
+            ValueError: Raises if a dimension is not in the cube
+
+        Returns:
+            TimeCube: The sliced cube
+
+        >>> cube.select('2023-01-01', '2023-12-31', SIGLA_UF='SP', CLASSI_FIN=[10, 11, 12])
+        """
+        first = 0 if start is None else max(int(np.datetime64(start, 'D').astype(np.int64)) - self.start, 0)
+        last = len(self.counts) if end is None else max(int(np.datetime64(end, 'D').astype(np.int64)) - self.start + 1, 0)
+        counts = self.counts[first:last]
+
+        dimensions = dict(self.dimensions)
+        for name, selected in values.items():
+            if name not in self.dimensions:
+                raise ValueError(f"Invalid dimension. Use one of {list(self.dimensions)}.")
+            selected = selected if isinstance(selected, (list, tuple, set)) else [selected]
+            categories = self.dimensions[name]
+            positions = [categories.index(value) for value in selected if value in categories]
+            counts = np.take(counts, positions, axis=list(self.dimensions).index(name) + 1)
+            dimensions[name] = [categories[position] for position in positions]
+
+        return TimeCube(counts, self.start + first, dimensions, self.date_column, self.out_of_range, self.missing)
+
+    def _periods(self, freq: str) -> tuple[np.ndarray, pd.Index]:
+        """First position of each period on the days axis and the labels of the periods"""
+        days = self.days
+        if freq == 'D':
+            keys = days
+        elif freq == 'W':
+            years, weeks = epi_weeks(days)
+            keys = years * 100 + weeks
+        elif freq == 'M':
+            keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        elif freq == 'Y':
+            keys = days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64)
+        else:
+            raise ValueError("Invalid freq. Use 'D', 'W', 'M' or 'Y'.")
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        first_days = pd.DatetimeIndex(days[starts].astype('datetime64[D]'))
+
+        if freq == 'D':
+            labels = first_days.rename(self.date_column)
+        elif freq == 'W':
+            labels = pd.MultiIndex.from_arrays([years[starts], weeks[starts]], names=['epi_year', 'epi_week'])
+        elif freq == 'M':
+            labels = first_days.to_period('M').rename('month')
+        else:
+            labels = pd.Index(first_days.year, name='year')
+        return starts, labels
+
+    def series(self, freq: str = 'W', by: str | None = None) -> pd.Series | pd.DataFrame:
+        """Counts of each period, summing every dimension (except the 'by' one)
+
+        Args:
+            freq (str, optional): 'D' (day), 'W' (epidemiological week), 'M' (month) or 'Y' (year). Defaults to 'W'.
+            by (str | None, optional): Dimension kept in the columns. Defaults to None.
+
+        Returns:
+            pd.Series | pd.DataFrame: Counts by period, or by period and value of the dimension
+        """
+        names = list(self.dimensions)
+        counts = self.counts.sum(axis=tuple(position + 1 for position, name in enumerate(names) if name != by))
+        starts, labels = self._periods(freq)
+        values = np.add.reduceat(counts, starts, axis=0) if len(starts) else counts[:0]
+
+        if by is None:
+            return pd.Series(values, index=labels, name='count')
+        return pd.DataFrame(values, index=labels, columns=pd.Index(self.dimensions[by], name=by))
+
+    def rolling(self, window: int, freq: str = 'W', by: str | None = None) -> pd.Series | pd.DataFrame:
+        """Moving sum of the counts over the last window periods
+
+        Args:
+            window (int): Number of periods
+            freq (str, optional): 'D', 'W', 'M' or 'Y'. Defaults to 'W'.
+            by (str | None, optional): Dimension kept in the columns. Defaults to None.
+
+        Returns:
+            pd.Series | pd.DataFrame: Moving sums (null for the first window - 1 periods)
+        """
+        return self.series(freq, by).rolling(window).sum()
+
+    def year_over_year(self, freq: str = 'W', change: bool = False) -> pd.DataFrame:
+        """Counts of each epidemiological week (or month) side by side for each year
+
+        Args:
+            freq (str, optional): 'W' or 'M'. Defaults to 'W'.
+            change (bool, optional): Returns the relative change to the previous year instead of the counts. Defaults to False.
+
+        Raises:
+            ValueError: Raises if freq is not 'W' or 'M'
+
+        Returns:
+            pd.DataFrame: One row per week (or month) and one column per year
+        """
+        if freq not in ('W', 'M'):
+            raise ValueError("Invalid freq. Use 'W' or 'M'.")
+
+        series = self.series(freq)
+        if freq == 'W':
+            table = series.unstack('epi_year')
+        else:
+            table = series.groupby([series.index.month.rename('month'), series.index.year.rename('year')]).sum().unstack('year')
+        return table.pct_change(axis=1) if change else table
+
+    def save(self, filepath: str) -> str:
+        """Writes the cube to a .npz file
+
+        Args:
+            filepath (str): File path
+
+        Returns:
+            str: The file path
+        """
+        metadata = {
+            'start': self.start, 'dimensions': self.dimensions, 'date_column': self.date_column,
+            'out_of_range': self.out_of_range, 'missing': self.missing,
+        }
+        with open(filepath, 'wb') as file:
+            np.savez(file, counts=self.counts, metadata=np.array(json.dumps(metadata)))
+        return filepath
+
+    @classmethod
+    def load(cls, filepath: str) -> 'TimeCube':
+        """Reads a cube written by save
+
+        Args:
+            filepath (str): File path
+
+        Returns:
+            TimeCube: The cube
+        """
+        with np.load(filepath) as data:
+            metadata = json.loads(str(data['metadata']))
+            return cls(data['counts'], **metadata)
+
+
+class CellCounts:
+    """Sparse counts of a cube: the sorted flat positions of the (day, dimensions) cells with rows and how many
+    rows each one has, besides the rows without a date and the ones out of the date range. Its size depends on
+    the cells observed, not on the date range
+    """
+
+    def __init__(self, positions: np.ndarray | None = None, counts: np.ndarray | None = None, missing: int = 0, out_of_range: int = 0):
+        self.positions = np.zeros(0, dtype=np.int64) if positions is None else np.asarray(positions, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.missing = missing
+        self.out_of_range = out_of_range
+
+    def merge(self, other: 'CellCounts') -> 'CellCounts':
+        """New counts with the cells of both
+
+        Args:
+            other (CellCounts): Other counts
+
+        Returns:
+            CellCounts: Merged counts
+        """
+        positions = np.concatenate([self.positions, other.positions])
+        counts = np.concatenate([self.counts, other.counts])
+        if len(positions):
+            # Both runs are sorted, so the stable sort only merges them, and the counts of the same cell are summed
+            order = np.argsort(positions, kind='stable')
+            positions, counts = positions[order], counts[order]
+            starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+            positions, counts = positions[starts], np.add.reduceat(counts, starts)
+        return CellCounts(positions, counts, self.missing + other.missing, self.out_of_range + other.out_of_range)
+
+
+class TimeCubeCounts(Aggregation):
+    """Streaming construction of a TimeCube: the state is the sparse CellCounts of the (day, dimensions) cells seen
+    so far, and the dense cube is allocated only in finalize, over the days between the first and the last one with counts
+    """
+
+    def __init__(self, date_column: str = 'DT_SIN_PRI', dimensions: list = TIME_CUBE_DIMENSIONS, date_range: tuple = TIME_CUBE_RANGE):
+        for dimension in dimensions:
+            if not isinstance(COLUMNS_SCHEMA.get(dimension), pd.CategoricalDtype):
+                raise ValueError(f"The dimension {dimension} needs fixed categories in the COLUMNS_SCHEMA.")
+        self.date_column = date_column
+        self.dimensions = list(dimensions)
+        self.date_range = tuple(int(np.datetime64(date, 'D').astype(np.int64)) for date in date_range)
+        self.columns = [date_column] + self.dimensions
+
+    def _categories(self) -> dict[str, list]:
+        # The JSON types keep the cube saveable, and the None category holds the nulls
+        return {dimension: [value.item() if isinstance(value, np.generic) else value for value in COLUMNS_SCHEMA[dimension].categories] + [None]
+                for dimension in self.dimensions}
+
+    def _shape(self) -> tuple:
+        return (self.date_range[1] - self.date_range[0] + 1,) + tuple(len(values) for values in self._categories().values())
+
+    def initial(self) -> CellCounts:
+        return CellCounts()
+
+    def partial(self, chunk: pd.DataFrame) -> CellCounts:
+        shape = self._shape()
+
+        dates = chunk[self.date_column].to_numpy(dtype='datetime64[ns]')
+        missing = np.isnat(dates)
+        days = dates.astype('datetime64[D]').astype(np.int64)
+        valid = ~missing & (days >= self.date_range[0]) & (days <= self.date_range[1])
+
+        codes = []
+        for dimension, size in zip(self.dimensions, shape[1:]):
+            values = chunk[dimension]
+            dtype = COLUMNS_SCHEMA[dimension]
+            dimension_codes = (values.cat.codes if values.dtype == dtype else pd.Series(pd.Categorical(values, dtype=dtype).codes)).to_numpy()
+            codes.append(np.where(dimension_codes < 0, size - 1, dimension_codes)[valid])
+
+        # Only the cells of the chunk are kept, so a partial has at most one entry per row
+        flat = np.ravel_multi_index((days[valid] - self.date_range[0], *codes), shape)
+        positions, counts = np.unique(flat, return_counts=True)
+        return CellCounts(positions, counts, int(missing.sum()), int((~missing & ~valid).sum()))
+
+    def merge(self, left: CellCounts, right: CellCounts) -> CellCounts:
+        return left.merge(right)
+
+    def finalize(self, state: CellCounts) -> TimeCube:
+        # The cube keeps only the days between the first and the last one with counts
+        shape = self._shape()
+        cells = int(np.prod(shape[1:]))
+        days = state.positions // cells
+        first = int(days[0]) if len(days) else 0
+        length = int(days[-1]) - first + 1 if len(days) else 0
+
+        counts = np.zeros((length,) + shape[1:], dtype=np.int32)
+        counts.reshape(-1)[state.positions - first * cells] = state.counts
+        return TimeCube(counts, self.date_range[0] + first, self._categories(), self.date_column, state.out_of_range, state.missing)
+
+
+@memoize(files=total_dataset_files)
+def build_time_cubes(date_columns: tuple = ('DT_SIN_PRI', 'DT_NOTIFIC'), dimensions: tuple = tuple(TIME_CUBE_DIMENSIONS)) -> dict[str, TimeCube]:
+    """Builds, in a single pass over the total dataset, one TimeCube per date column. The cubes are cached on disk,
+    so the seasonality questions are answered from them without reading the dataset
+
+    Args:
+        date_columns (tuple, optional): Date columns of the cubes. Defaults to ('DT_SIN_PRI', 'DT_NOTIFIC').
+        dimensions (tuple, optional): Categorical dimensions. Defaults to TIME_CUBE_DIMENSIONS.
+
+    Returns:
+        dict[str, TimeCube]: The cube of each date column
+
+    >>> cube = build_time_cubes()['DT_SIN_PRI']
+    >>> cube.select(SIGLA_UF='SP').year_over_year('W')
+    """
+    return aggregate_total_dataset({column: TimeCubeCounts(column, list(dimensions)) for column in date_columns})
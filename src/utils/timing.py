@@ -1,10 +1,19 @@
 """This module contains functions that can measure function running time"""
+import functools
+import logging
+import os
+import sys
 import time
 from typing import Callable
 import pandas as pd
+sys.path.append(os.getcwd())
+from src.utils.instrumentation import span
+
+logger = logging.getLogger(__name__)
 
 def measure_function_execution(func: Callable):
-    """This function measures the time the function passed takes to finish. This function needs to be used as a DECORATOR
+    """This function measures the time the function passed takes to finish. This function needs to be used as a DECORATOR.
+    The call is recorded as a span of src.utils.instrumentation (when it is enabled), and the time is logged at the INFO level
 
     Args:
         func (function): Function to be executed
@@ -13,32 +22,35 @@ def measure_function_execution(func: Callable):
         TypeError: Raises if you doesn't pass a function
 
     Returns:
-        Float: If used correctly as a decorator, it returns the passed function's execution time. (It's not supposed to return the passed function's return)
+        Callable: The decorated function, which logs its execution time and returns the passed function's return
     """
     if not callable(func):
         raise TypeError('You need to pass a Function to this work')
-    
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        initial_time = time.time()
-        func(*args, **kwargs)
-        final_time = time.time()
+        with span(func.__qualname__):
+            initial_time = time.perf_counter()
+            result = func(*args, **kwargs)
+            final_time = time.perf_counter()
 
-        print(f"O resultado foi {final_time - initial_time}")
+        logger.info("%s levou %.6f segundos", func.__qualname__, final_time - initial_time)
 
-        return final_time - initial_time
+        return result
         
     return wrapper
 
 
-def extract_month(dataframe:pd.DataFrame, column:str) -> pd.DataFrame:
-    """Function that will extract by month to plot a histogram
+def extract_month(dataframe:pd.DataFrame, column:str) -> pd.Series:
+    """Function that will extract by month to plot a histogram. The dataframe is not modified.
+    For counts by month, week or year over the total dataset, prefer the TimeCube of src.utils.time_cube
 
     Args:
         dataframe (pd.DataFrame): Input the dataframe you'll be using
         column (str): Input the column that tou want to extract by month
 
     Returns:
-        pd.DataFrame: Output a dataframe extracted by month to plot a histogram
+        pd.Series: Output the month of each row to plot a histogram
 
     >>> extract_month(df1, "DT_SIN_PRI")
         0           2.0
@@ -53,6 +65,8 @@ def extract_month(dataframe:pd.DataFrame, column:str) -> pd.DataFrame:
         1010357    11.0
         1010358    12.0
     """
-    # Convert the column to datetime (if not already)
-    dataframe[column] = pd.to_datetime(dataframe.loc[:, column], errors='coerce')
-    return dataframe.loc[:, column].dt.month
+    # Convert a copy of the column to datetime (if not already), keeping the caller's column as it is
+    dates = dataframe.loc[:, column]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    return dates.dt.month
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Appends the yearly SINAN files of the data folder (or the given CSV files) to the store partitioned
+# by year and UF in data/partitions. Files already ingested are skipped, so adding a new year only
+# reads the new file. Run it from the root of the project.
+python src/utils/ingestion.py "$@"
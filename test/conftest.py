@@ -0,0 +1,14 @@
+"""Configuração dos testes: a raiz do repositório no sys.path, como nos módulos do src, e uma pasta de trabalho temporária"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test in an empty folder with a 'data' folder, since the paths of the config are relative to the working directory"""
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,72 @@
+"""Testes do column store de src/utils/column_store.py"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.column_store import load_metadata, open_column_arrays, open_column_frame, write_column_store
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+from src.utils.schema import concat_chunks
+
+
+def assert_same_values(stored: pd.DataFrame, expected: pd.DataFrame) -> None:
+    """The categories of a stored column are in the order they were found, so the categorical columns are compared by value"""
+    assert list(stored.columns) == list(expected.columns)
+    for column in expected.columns:
+        if isinstance(expected[column].dtype, pd.CategoricalDtype):
+            assert stored[column].astype(object).equals(expected[column].astype(object)), column
+        else:
+            pd.testing.assert_series_equal(stored[column], expected[column], check_names=False)
+
+
+def test_round_trip(tmp_path):
+    chunks = [prepare_chunk(generate_sinan_dataframe(1000, seed=seed)) for seed in range(3)]
+    metadata = write_column_store(iter(chunks), str(tmp_path / 'store'), source={'test': True})
+    stored = open_column_frame(str(tmp_path / 'store'))
+
+    assert metadata['rows'] == 3000
+    assert load_metadata(str(tmp_path / 'store'))['source'] == {'test': True}
+    assert_same_values(stored, concat_chunks(chunks, ignore_index=True))
+    # The fixed categories of the schema keep their order, so the codes are the ones of pandas
+    assert stored['SIGLA_UF'].dtype == concat_chunks(chunks, ignore_index=True)['SIGLA_UF'].dtype
+
+
+def test_open_some_columns(tmp_path):
+    chunk = prepare_chunk(generate_sinan_dataframe(500, seed=1))
+    write_column_store([chunk], str(tmp_path / 'store'))
+    arrays = open_column_arrays(str(tmp_path / 'store'), ['FEBRE', 'DT_NOTIFIC', 'MISSING'])
+
+    assert list(arrays) == ['FEBRE', 'DT_NOTIFIC']
+    assert isinstance(arrays['FEBRE'], np.memmap)
+    assert arrays['DT_NOTIFIC'].dtype == np.int64
+
+
+def test_categories_can_grow_after_the_first_chunk(tmp_path):
+    # A first chunk with a few occupations must not fix the width of the codes of the column
+    first = pd.DataFrame({'ID_OCUPA_N': pd.Series(['715505', '223505'], dtype='category')})
+    second = pd.DataFrame({'ID_OCUPA_N': pd.Series([str(100000 + i) for i in range(300)], dtype='category')})
+    write_column_store([first, second], str(tmp_path / 'store'))
+    stored = open_column_frame(str(tmp_path / 'store'))
+
+    assert load_metadata(str(tmp_path / 'store'))['columns']['ID_OCUPA_N']['dtype'] == 'int16'
+    assert stored['ID_OCUPA_N'].astype(object).tolist() == ['715505', '223505'] + [str(100000 + i) for i in range(300)]
+
+
+def test_empty_store(tmp_path):
+    chunk = prepare_chunk(generate_sinan_dataframe(10, seed=1)).iloc[:0]
+    write_column_store([chunk], str(tmp_path / 'store'))
+
+    assert len(open_column_frame(str(tmp_path / 'store'))) == 0
+
+
+def test_failed_write_keeps_the_old_store(tmp_path):
+    write_column_store([prepare_chunk(generate_sinan_dataframe(100, seed=1))], str(tmp_path / 'store'))
+
+    def chunks():
+        yield prepare_chunk(generate_sinan_dataframe(50, seed=2))
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        write_column_store(chunks(), str(tmp_path / 'store'))
+
+    assert load_metadata(str(tmp_path / 'store'))['rows'] == 100
+    assert not (tmp_path / 'store.tmp').exists()
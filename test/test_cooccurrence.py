@@ -0,0 +1,52 @@
+"""Testes da coocorrência de sintomas de src/utils/cooccurrence.py"""
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.cooccurrence import SymptomSets, count_symptom_sets, count_symptom_sets_counter, pack_bits, popcount
+from src.utils.random import generate_sinan_dataframe
+from src.utils.streaming import aggregate_chunks
+
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return generate_sinan_dataframe(1500, seed=6)
+
+
+def test_popcount_of_packed_bits():
+    mask = np.random.default_rng(1).random(1001) < 0.3
+
+    assert popcount(pack_bits(mask)) == mask.sum()
+    assert len(pack_bits(mask)) == 16
+
+
+def test_pairs_match_crosstab(df):
+    counts = count_symptom_sets_counter(df, SYMPTOMS, max_size=2)
+
+    for first, second in itertools.combinations(SYMPTOMS, 2):
+        table = pd.crosstab(df[first] == 1, df[second] == 1)
+        assert counts[(None, (first, second))] == table.loc[True, True], (first, second)
+    for symptom in SYMPTOMS:
+        assert counts[(None, (symptom,))] == (df[symptom] == 1).sum()
+
+
+def test_triples_by_group_match_pandas(df):
+    counts = count_symptom_sets_counter(df, SYMPTOMS, max_size=3, group_by='CLASSI_FIN')
+    flags = pd.DataFrame({symptom: (df[symptom] == 1).fillna(False) for symptom in SYMPTOMS})
+
+    for symptom_set in itertools.combinations(SYMPTOMS, 3):
+        expected = flags[list(symptom_set)].all(axis=1).groupby(df['CLASSI_FIN'], observed=True).sum()
+        for group, support in expected.items():
+            assert counts[(group, symptom_set)] == support
+
+
+def test_min_support_and_streaming(df):
+    batch = count_symptom_sets(df, SYMPTOMS, max_size=3, min_support=50)
+    chunks = [df.iloc[start:start + 400] for start in range(0, len(df), 400)]
+    streaming = aggregate_chunks({'sets': SymptomSets(SYMPTOMS, max_size=3, min_support=50)}, chunks)['sets']
+
+    assert (batch['support'] >= 50).all()
+    pd.testing.assert_frame_equal(streaming.sort_values(['size', 'support', 'symptoms'], ignore_index=True),
+                                  batch.sort_values(['size', 'support', 'symptoms'], ignore_index=True))
@@ -0,0 +1,48 @@
+"""Testes das figuras por agregados de src/hypothesis/figures.py e src/utils/plotting.py"""
+import json
+import os
+import numpy as np
+import pytest
+from src.config import UF_ACRONYMS
+from src.hypothesis.figures import FIGURES
+from src.utils.plotting import aggregate_figures, plot_figures
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+
+
+@pytest.fixture(scope='module')
+def df():
+    return prepare_chunk(generate_sinan_dataframe(2000, seed=12))
+
+
+def test_aggregates_match_pandas(df):
+    data = aggregate_figures(FIGURES, df)
+    confirmed = df['CLASSI_FIN'].isin([10, 11, 12])
+
+    assert data['ocupacao_confirmados.png']['table'].sum() == len(df)
+    assert data['ocupacao_confirmados.png']['table'][:, 1].sum() == confirmed.sum()
+    expected = (confirmed.groupby(df['SIGLA_UF'], observed=True).mean() * 100).reindex(data['proporcoes_uf.png'].index)
+    assert np.allclose(data['proporcoes_uf.png'].to_numpy(), expected.to_numpy())
+    assert set(data['proporcoes_uf.png'].index) <= set(UF_ACRONYMS)
+
+
+def test_unchanged_figures_are_skipped(df, tmp_path):
+    pytest.importorskip('matplotlib')
+    folder = str(tmp_path)
+    filenames = [figure.filename for figure in FIGURES]
+
+    assert plot_figures(FIGURES, df, folder, workers=1) == {filename: 'rendered' for filename in filenames}
+    with open(os.path.join(folder, 'figures.json')) as file:
+        assert sorted(json.load(file)) == sorted(filenames)
+    modified = {filename: os.stat(os.path.join(folder, filename)).st_mtime_ns for filename in filenames}
+
+    # Same aggregates: nothing is drawn again
+    assert plot_figures(FIGURES, df, folder, workers=1) == {filename: 'skipped' for filename in filenames}
+    assert modified == {filename: os.stat(os.path.join(folder, filename)).st_mtime_ns for filename in filenames}
+
+    # A missing file, or other aggregates, are drawn again
+    os.remove(os.path.join(folder, 'proporcoes_uf.png'))
+    assert plot_figures(FIGURES, df, folder, workers=1)['proporcoes_uf.png'] == 'rendered'
+    status = plot_figures(FIGURES, df.iloc[:1000], folder, workers=1)
+    assert status['dias_caso_aberto.png'] == 'rendered'
+    assert set(plot_figures(FIGURES, df.iloc[:1000], folder, workers=1, force=True).values()) == {'rendered'}
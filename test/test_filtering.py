@@ -0,0 +1,54 @@
+"""Testes dos predicados de src/filtering"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.filtering import Between, IsIn, NotNull, filter_dataset, scan_columns
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+
+
+@pytest.fixture(scope='module')
+def df():
+    return prepare_chunk(generate_sinan_dataframe(2000, seed=2))
+
+
+def test_is_in_matches_pandas(df):
+    assert (IsIn('CLASSI_FIN', [10, 11, 12]).mask(df) == df['CLASSI_FIN'].isin([10, 11, 12]).to_numpy()).all()
+    assert (IsIn('SIGLA_UF', ['SP', 'RJ']).mask(df) == df['SIGLA_UF'].isin(['SP', 'RJ']).to_numpy()).all()
+    # The nulls never pass, even through the categories
+    assert not IsIn('SOROTIPO', [1, 2, 3, 4]).mask(df)[df['SOROTIPO'].isna().to_numpy()].any()
+
+
+def test_between_matches_pandas(df):
+    dates = df['DT_NOTIFIC']
+    assert (Between('DT_NOTIFIC', '2023-01-01', '2023-12-31').mask(df) == dates.between('2023-01-01', '2023-12-31').to_numpy()).all()
+    assert (Between('DT_NOTIFIC', start='2023-01-01').mask(df) == (dates >= '2023-01-01').to_numpy()).all()
+    assert (Between('FEBRE', 1, 1).mask(df) == (df['FEBRE'] == 1).fillna(False).to_numpy()).all()
+
+
+def test_combined_predicates(df):
+    confirmed = IsIn('CLASSI_FIN', [10, 11, 12])
+    in_sp = IsIn('SIGLA_UF', ['SP'])
+
+    assert ((confirmed & in_sp).mask(df) == (confirmed.mask(df) & in_sp.mask(df))).all()
+    assert ((confirmed | in_sp).mask(df) == (confirmed.mask(df) | in_sp.mask(df))).all()
+    # Not negates the mask, so the rows without a value pass ~IsIn
+    assert ((~confirmed).mask(df) == ~confirmed.mask(df)).all()
+    assert (~confirmed).mask(df)[df['CLASSI_FIN'].isna().to_numpy()].all()
+    assert (NotNull('DT_ENCERRA').mask(df) == df['DT_ENCERRA'].notna().to_numpy()).all()
+
+
+def test_scan_columns():
+    predicate = IsIn('SIGLA_UF', ['SP']) & ~Between('DT_NOTIFIC', '2023-01-01')
+
+    assert scan_columns(['FEBRE', 'DT_NOTIFIC'], predicate) == ['FEBRE', 'DT_NOTIFIC', 'SIGLA_UF', 'SG_UF_NOT']
+    assert scan_columns(['FEBRE']) == ['FEBRE']
+
+
+def test_filter_dataset_projects_the_columns(df):
+    filtered = filter_dataset(df, IsIn('CLASSI_FIN', [10]), ['DT_NOTIFIC', 'FEBRE'])
+
+    assert list(filtered.columns) == [column for column in df.columns if column in ('DT_NOTIFIC', 'FEBRE')]
+    assert len(filtered) == (df['CLASSI_FIN'] == 10).sum()
+    assert filter_dataset(df) is df
+    assert np.array_equal(filter_dataset(df, NotNull('DT_NOTIFIC')).index, df.index[df['DT_NOTIFIC'].notna()])
@@ -0,0 +1,63 @@
+"""Testes dos índices e agregações da hipótese 5 de src/hypothesis/hypothesis_5.py"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.hypothesis.hypothesis_5 import (CaseDaysOpen, CaseDurationIndex, analyze_case_days_open, case_days_open_from_histograms,
+                                         merge_case_days_histograms)
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+
+DATE_LIMITS = ['2020-06-01', '2021-03-15', '2022-11-30', '2024-02-29', '2026-01-01']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return generate_sinan_dataframe(3000, seed=9)
+
+
+@pytest.mark.parametrize('period', ['before', 'after'])
+def test_cutoff_stats_match_analyze_case_days_open(df, period):
+    table = CaseDurationIndex.from_frame(df).cutoff_stats(DATE_LIMITS, period)
+
+    for date_limit in DATE_LIMITS:
+        expected = analyze_case_days_open(df, date_limit, period)
+        row = table.loc[date_limit]
+        assert set(row.index) == set(expected)
+        for key, value in expected.items():
+            assert row[key] == pytest.approx(value, nan_ok=True), (date_limit, key)
+
+
+def test_cutoff_stats_with_a_single_case():
+    df = pd.DataFrame({'DT_NOTIFIC': pd.to_datetime(['2022-01-10']), 'DT_ENCERRA': pd.to_datetime(['2022-01-17'])})
+    table = CaseDurationIndex.from_frame(df).cutoff_stats(['2022-01-09', '2022-01-10'], 'before')
+
+    assert table['total_records'].tolist() == [0, 1]
+    assert table['median'].tolist() == [0, 7]
+    assert np.isnan(table.loc['2022-01-10', 'std_dev'])
+
+
+@pytest.mark.parametrize('period', ['before', 'after'])
+def test_streaming_case_days_open_matches_the_frame(df, period):
+    df = prepare_chunk(df.copy())
+    aggregation = CaseDaysOpen('2022-11-30', period)
+    chunks = [df.iloc[start:start + 700] for start in range(0, len(df), 700)]
+
+    state = aggregation.initial()
+    for chunk in chunks:
+        state = aggregation.merge(state, aggregation.partial(chunk))
+    stats = merge_case_days_histograms(aggregation.finalize(state))[None].stats()
+
+    expected = analyze_case_days_open(df, '2022-11-30', period)
+    assert stats.keys() == expected.keys()
+    for key, value in expected.items():
+        assert stats[key] == pytest.approx(value), key
+    by_uf = merge_case_days_histograms(state, 'uf')
+    assert sum(histogram.total for histogram in by_uf.values()) == expected['total_records']
+
+
+def test_streaming_case_days_open_without_records(df):
+    aggregation = CaseDaysOpen('2000-01-01', 'before')
+    state = aggregation.merge(aggregation.initial(), aggregation.partial(prepare_chunk(df.copy())))
+
+    assert state == {}
+    assert case_days_open_from_histograms({'before': state})['before'] == analyze_case_days_open(df, '2000-01-01', 'before')
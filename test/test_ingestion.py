@@ -0,0 +1,86 @@
+"""Testes da ingestão incremental de src/utils/ingestion.py"""
+import os
+import pandas as pd
+import pytest
+from src.config import PARTITIONS_FOLDER
+from src.utils.ingestion import ingest_datasets, ingest_file, load_manifest, load_row_hashes, read_partitions, update_aggregates
+from src.utils.random import write_sinan_csv
+from src.utils.streaming import Count, ValueCounts
+
+
+@pytest.fixture
+def first_year(workdir):
+    return write_sinan_csv(os.path.join('data', 'DENGBR21.csv'), 1000, chunksize=400, seed=1)
+
+
+def ingested_rows() -> int:
+    return sum(len(part) for part in read_partitions(['DT_NOTIFIC']))
+
+
+def test_equal_rows_inside_a_file_are_kept(first_year):
+    rows = pd.read_csv(first_year, dtype=str)
+    pd.concat([rows, rows.iloc[:10]]).to_csv(first_year, index=False)
+
+    entry = ingest_file(first_year, chunksize=400)
+
+    assert entry['rows'] == 1010
+    assert entry['duplicates'] == 0
+    assert ingested_rows() == 1010
+
+
+def test_rows_of_the_previous_files_are_dropped(first_year):
+    ingest_file(first_year, chunksize=400)
+
+    # The next year has its own rows and 100 rows of the first file, with the occupation written as a float
+    repeated = pd.read_csv(first_year, dtype=str).iloc[200:300]
+    repeated['ID_OCUPA_N'] = repeated['ID_OCUPA_N'].where(repeated['ID_OCUPA_N'].isna(), repeated['ID_OCUPA_N'] + '.0')
+    second_year = write_sinan_csv(os.path.join('data', 'DENGBR22.csv'), 500, chunksize=400, seed=2)
+    pd.concat([pd.read_csv(second_year, dtype=str), repeated]).to_csv(second_year, index=False)
+
+    entry = ingest_file(second_year, chunksize=400)
+
+    assert entry['rows'] == 500
+    assert entry['duplicates'] == 100
+    assert ingested_rows() == 1500
+    assert len(load_row_hashes()) == 1500
+
+
+def test_ingested_files_are_skipped(first_year):
+    first = ingest_datasets()
+    write_sinan_csv(os.path.join('data', 'DENGBR22.csv'), 300, chunksize=400, seed=2)
+    second = ingest_datasets()
+
+    first_year = os.path.join(os.getcwd(), first_year)
+    assert second[first_year] == first[first_year]
+    assert ingested_rows() == 1300
+
+
+def test_changed_file_is_rebuilt(first_year):
+    second_year = write_sinan_csv(os.path.join('data', 'DENGBR22.csv'), 500, chunksize=400, seed=2)
+    pd.concat([pd.read_csv(second_year, dtype=str), pd.read_csv(first_year, dtype=str).iloc[200:300]]).to_csv(second_year, index=False)
+    ingest_datasets([first_year, second_year], chunksize=400)
+    aggregations = {'rows': Count(), 'uf': ValueCounts('SIGLA_UF')}
+    before = update_aggregates('test', aggregations)
+    old_parts = [part for entry in load_manifest()['sources'].values() for part in entry['parts']]
+
+    # One row of the first file moves to Tocantins and ten of the rows repeated by the second file are deleted
+    rows = pd.read_csv(first_year, dtype=str)
+    rows.loc[0, 'SG_UF_NOT'] = '17'
+    rows.drop(index=range(200, 210)).to_csv(first_year, index=False)
+    stat = os.stat(first_year)
+    os.utime(first_year, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    ingest_file(first_year, chunksize=400)
+    after = update_aggregates('test', aggregations)
+
+    sources = load_manifest()['sources']
+    assert [entry['rows'] for entry in sources.values()] == [990, 510]
+    assert ingested_rows() == 1500
+    assert len(load_row_hashes()) == 1500
+    assert not any(os.path.exists(os.path.join(PARTITIONS_FOLDER(), part)) for part in old_parts)
+    assert not set(old_parts) & {part for entry in sources.values() for part in entry['parts']}
+
+    expected = pd.concat(read_partitions(['SIGLA_UF']))['SIGLA_UF'].value_counts()
+    assert after['rows'] == 1500
+    assert after['uf'].to_dict() == expected[expected > 0].sort_index().to_dict()
+    assert after['uf'].get('TO', 0) == before['uf'].get('TO', 0) + 1
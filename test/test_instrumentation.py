@@ -0,0 +1,72 @@
+"""Testes da instrumentação de src/utils/instrumentation.py, incluindo os spans dos workers dos pools de processos"""
+import logging
+import os
+import numpy as np
+import pytest
+from src.config import TOTAL_DATASET
+from src.utils import instrumentation
+from src.utils.random import write_sinan_csv
+from src.utils.reading import processing_total_dataset
+from src.utils.statistic import monte_carlo_significance
+from src.utils.timing import measure_function_execution
+
+
+@pytest.fixture
+def enabled():
+    instrumentation.enable()
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_nested_spans(enabled):
+    with instrumentation.span('outer') as outer:
+        outer.add_rows(3)
+        with instrumentation.span('inner', bytes_read=10):
+            pass
+
+    records = {record['path']: record for record in instrumentation.report()}
+    assert set(records) == {'outer', 'outer;inner'}
+    assert records['outer']['rows'] == 3 and records['outer;inner']['bytes_read'] == 10
+    assert instrumentation.summary()['outer']['calls'] == 1
+
+
+def test_spans_of_the_process_workers_are_reported(enabled, workdir):
+    write_sinan_csv(os.path.join('data', TOTAL_DATASET), 3000, chunksize=1000, seed=1)
+    processing_total_dataset(backend='process', workers=2, memory_budget=4 * 2**20)
+
+    records = instrumentation.report()
+    workers = [record for record in records if record['process'] != os.getpid()]
+    paths = {record['path'] for record in workers}
+    assert 'processing_total_dataset;_process_byte_range;read_byte_range' in paths
+    assert 'processing_total_dataset;_process_byte_range;decode_uf' in paths
+    assert sum(record['rows'] for record in workers if record['name'] == 'read_byte_range') == 3000
+
+
+def test_spans_of_the_monte_carlo_workers_are_reported(enabled):
+    monte_carlo_significance([np.array([[10, 4], [3, 9]])], resamples=400, seed=0, workers=2, batch_size=100)
+
+    calls = [record for record in instrumentation.report() if record['name'] == '_count_extreme_tables']
+    assert len(calls) == 4
+    assert all(record['path'] == 'monte_carlo_significance;_count_extreme_tables' for record in calls)
+
+
+def test_nothing_is_recorded_when_disabled():
+    instrumentation.reset()
+    monte_carlo_significance([np.array([[10, 4], [3, 9]])], resamples=200, seed=0, workers=2, batch_size=100)
+
+    assert instrumentation.report() == []
+
+
+def test_measure_function_execution_logs_instead_of_printing(enabled, caplog, capsys):
+    @measure_function_execution
+    def add(a, b):
+        return a + b
+
+    with caplog.at_level(logging.INFO, logger='src.utils.timing'):
+        assert add(1, 2) == 3
+
+    assert capsys.readouterr().out == ''
+    assert 'add' in caplog.text
+    assert [record['name'] for record in instrumentation.report()] == ['test_measure_function_execution_logs_instead_of_printing.<locals>.add']
@@ -0,0 +1,57 @@
+"""Testes do orçamento de memória dos leitores de src/utils/memory.py"""
+import concurrent.futures
+import os
+import pytest
+from src.config import TOTAL_DATASET
+from src.filtering import IsIn, NotNull
+from src.utils.memory import MIN_CHUNK_ROWS, MemoryBudgetError, bounded_map, plan_reading
+from src.utils.random import write_sinan_csv
+from src.utils.reading import processing_total_dataset
+
+BUDGET = 2**20  # The 6000 parsed rows need about twice the part of this budget left for the result
+
+
+@pytest.fixture
+def total_dataset(workdir):
+    return write_sinan_csv(os.path.join('data', TOTAL_DATASET), 6000, chunksize=1000, seed=4)
+
+
+def test_plan_sizes_the_chunks_from_the_budget(total_dataset):
+    small, large = plan_reading(total_dataset, budget=BUDGET, workers=2), plan_reading(total_dataset, budget=2**30, workers=2)
+
+    assert small.chunk_rows == MIN_CHUNK_ROWS
+    assert large.chunk_rows > small.chunk_rows
+    assert small.max_in_flight >= 1
+    with pytest.raises(MemoryBudgetError):
+        small.check_estimate()
+
+
+@pytest.mark.parametrize('backend', ['serial', 'thread', 'process'])
+def test_tiny_budget_fails_before_reading(total_dataset, backend):
+    with pytest.raises(MemoryBudgetError, match='orçamento'):
+        processing_total_dataset(backend=backend, workers=2, memory_budget=BUDGET)
+
+
+def test_kept_chunks_are_checked_with_a_predicate(total_dataset):
+    # A selective predicate fits even though the whole dataset does not, and one that keeps every row fails while reading
+    df = processing_total_dataset(backend='serial', predicate=IsIn('SIGLA_UF', ['AC', 'AP', 'RR']), memory_budget=BUDGET)
+    assert 0 < len(df) < 600
+
+    with pytest.raises(MemoryBudgetError):
+        processing_total_dataset(backend='thread', workers=2, predicate=NotNull('DT_NOTIFIC'), memory_budget=BUDGET)
+
+
+def test_bounded_map_limits_the_items_in_flight():
+    read = []
+
+    def items():
+        for item in range(20):
+            read.append(item)
+            yield item
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        results = bounded_map(executor.submit, lambda item: item * 2, items(), max_in_flight=3)
+        assert next(results) == 0
+        # Only the items in flight and the one that made the first result come out were read
+        assert len(read) == 4
+        assert list(results) == [item * 2 for item in range(1, 20)]
@@ -0,0 +1,61 @@
+"""Testes do servidor de consultas de src/hypothesis/query_server.py, em uma porta livre da máquina local"""
+import pytest
+from src.hypothesis.hypothesis_5 import EXAM_DATE_COLUMNS, analyze_case_days_open
+from src.hypothesis.query_server import QueryClient, QueryService, UnknownQueryError, start_server, to_json
+from src.utils import statistic
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+
+
+@pytest.fixture(scope='module')
+def df():
+    return prepare_chunk(generate_sinan_dataframe(2000, seed=5))
+
+
+@pytest.fixture(scope='module')
+def client(df):
+    server = start_server(QueryService(df), port=0)
+    yield QueryClient(server.url, timeout=30)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('date_limit,period', [('2022-11-30', 'before'), ('2022-11-30', 'after'), ('2021-06-15', 'before')])
+def test_service_runs_the_queries(df, date_limit, period):
+    service = QueryService(df)
+
+    assert service.run('analyze_case_days_open', {'date_limit': date_limit, 'period': period}) == analyze_case_days_open(df, date_limit, period)
+    assert service.run('crammer_V', {'column_1': 'SIGLA_UF', 'column_2': 'EVOLUCAO'}) == statistic.crammer_V(df['SIGLA_UF'], df['EVOLUCAO'])
+    assert service.metrics.snapshot()['analyze_case_days_open']['calls'] == 1
+
+
+def test_service_errors(df):
+    service = QueryService(df)
+
+    with pytest.raises(UnknownQueryError):
+        service.run('missing_query')
+    with pytest.raises(TypeError):
+        service.run('chi_square_test', {'column_1': 'SIGLA_UF', 'column_2': 'MISSING'})
+    assert service.metrics.snapshot()['chi_square_test']['errors'] == 1
+
+
+def test_round_trip(client, df):
+    result = client.query('analyze_case_days_open', date_limit='2022-11-30', period='after')
+    expected = to_json(analyze_case_days_open(df, '2022-11-30', 'after'))
+
+    assert result == pytest.approx(expected)
+    assert client.query('contingency_measures', column_1='SIGLA_UF', column_2='CLASSI_FIN') == pytest.approx(
+        to_json(statistic.contingency_measures(df['SIGLA_UF'], df['CLASSI_FIN'])))
+    assert client.query('top_3_counts_numpy') == [list(pair) for pair in statistic.top_3_counts_numpy(df, EXAM_DATE_COLUMNS)]
+    assert 'cutoff_stats' in client.queries()
+
+
+def test_round_trip_errors(client):
+    with pytest.raises(RuntimeError, match='^404'):
+        client.query('missing_query')
+    with pytest.raises(RuntimeError, match='^400'):
+        client.query('crammer_V', column_1='SIGLA_UF', column_2='MISSING')
+
+    metrics = client.metrics()
+    assert metrics['crammer_V']['errors'] >= 1
+    assert metrics['crammer_V']['p95'] >= metrics['crammer_V']['p50'] > 0
@@ -0,0 +1,49 @@
+"""Testes dos leitores do dataset total de src/utils/reading.py"""
+import os
+import pandas as pd
+import pytest
+from src.config import REQUIRED_COLUMNS, TOTAL_DATASET
+from src.filtering import IsIn
+from src.utils.random import write_sinan_csv
+from src.utils.reading import column_store_frame, processing_total_dataset, read_byte_range, split_byte_ranges
+from src.utils.schema import concat_chunks
+
+ROWS = 6000
+
+MEMORY_BUDGET = 4 * 2**20  # Small enough to split the sample dataset in several chunks
+
+
+@pytest.fixture
+def total_dataset(workdir):
+    return write_sinan_csv(os.path.join('data', TOTAL_DATASET), ROWS, chunksize=1000, seed=3)
+
+
+def test_byte_ranges_cover_every_row_once(total_dataset):
+    header, ranges = split_byte_ranges(total_dataset, range_bytes=50_000)
+    parts = [read_byte_range(total_dataset, header, start, end) for start, end in ranges]
+
+    assert len(ranges) > 1
+    assert sum(len(part) for part in parts) == ROWS
+    whole = read_byte_range(total_dataset, header, ranges[0][0], ranges[-1][1])
+    pd.testing.assert_frame_equal(concat_chunks(parts, ignore_index=True), whole)
+
+
+@pytest.mark.parametrize('predicate', [None, IsIn('CLASSI_FIN', [10, 11, 12])])
+def test_backends_give_the_same_frame(total_dataset, predicate):
+    frames = {
+        backend: processing_total_dataset(backend=backend, workers=2, predicate=predicate, memory_budget=MEMORY_BUDGET)
+        for backend in ('serial', 'thread', 'process')
+    }
+
+    assert len(frames['serial']) == (ROWS if predicate is None else frames['serial']['CLASSI_FIN'].isin([10, 11, 12]).sum())
+    pd.testing.assert_frame_equal(frames['thread'], frames['serial'])
+    pd.testing.assert_frame_equal(frames['process'], frames['serial'])
+
+
+@pytest.mark.parametrize('usecols', [REQUIRED_COLUMNS, ['FEBRE', 'DT_NOTIFIC', 'SIGLA_UF'], ['CLASSI_FIN', 'ID_OCUPA_N']])
+def test_column_store_frame_equals_the_read_frame(total_dataset, usecols):
+    expected = processing_total_dataset(usecols, backend='serial')
+    frame = column_store_frame(usecols)
+
+    assert list(frame.columns) == list(expected.columns)
+    assert frame.equals(expected)
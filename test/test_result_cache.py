@@ -0,0 +1,72 @@
+"""Testes do cache de resultados de src/utils/result_cache.py"""
+import os
+import pandas as pd
+from src.config import RESULT_CACHE_FOLDER
+from src.utils.result_cache import cache_stats, clear, evict, memoize
+
+
+def test_hit_miss_and_invalidation(workdir):
+    source = workdir / 'data' / 'input.csv'
+    source.write_text('a\n1\n')
+    calls = []
+
+    @memoize(files=[str(source)])
+    def read_lines(column: str, frame: pd.DataFrame | None = None) -> int:
+        calls.append(column)
+        return len(source.read_text().splitlines())
+
+    before = cache_stats()
+    assert read_lines('a') == 2
+    assert read_lines('a') == 2
+    assert read_lines(column='a') == 2
+    assert calls == ['a']
+    assert cache_stats()['hits'] - before['hits'] == 2
+
+    # Another argument is another result, and DataFrames are compared by content
+    read_lines('b')
+    read_lines('a', pd.DataFrame({'x': [1, 2]}))
+    read_lines('a', pd.DataFrame({'x': [1, 2]}))
+    assert calls == ['a', 'b', 'a']
+
+    # A new version of the input file is a miss
+    source.write_text('a\n1\n2\n')
+    assert read_lines('a') == 3
+    assert calls == ['a', 'b', 'a', 'a']
+
+
+def test_eviction_removes_the_least_recently_used(workdir):
+    @memoize(max_bytes=10**9)
+    def payload(name: str) -> bytes:
+        return name.encode() * 1000
+
+    paths = {}
+    for position, name in enumerate(['old', 'used', 'new']):
+        existing = set(os.listdir(RESULT_CACHE_FOLDER())) if os.path.isdir(RESULT_CACHE_FOLDER()) else set()
+        payload(name)
+        (filename,) = set(os.listdir(RESULT_CACHE_FOLDER())) - existing
+        paths[name] = os.path.join(RESULT_CACHE_FOLDER(), filename)
+        # Distinct access times, from the oldest to the newest
+        os.utime(paths[name], ns=((position + 1) * 10**9, (position + 1) * 10**9))
+
+    # A hit refreshes the access time of 'used', so 'old' is the least recently used
+    payload('used')
+    total = sum(os.path.getsize(path) for path in paths.values())
+
+    assert evict(total - 1) == 1
+    assert not os.path.exists(paths['old'])
+    assert os.path.exists(paths['used']) and os.path.exists(paths['new'])
+
+    clear()
+    assert os.listdir(RESULT_CACHE_FOLDER()) == []
+
+
+def test_results_above_the_cap_are_not_kept(workdir):
+    calls = []
+
+    @memoize(max_bytes=0)
+    def value(name: str) -> str:
+        calls.append(name)
+        return name
+
+    assert value('a') == value('a') == 'a'
+    assert calls == ['a', 'a']
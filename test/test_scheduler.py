@@ -0,0 +1,51 @@
+"""Testes do agendador de src/utils/scheduler.py, sobre um dataset total sintético"""
+import os
+import pandas as pd
+import pytest
+from src.config import TOTAL_DATASET
+from src.filtering import IsIn
+from src.hypothesis.hypothesis_5 import EXAM_DATE_COLUMNS, analyze_case_days_open, register_hypothesis5, top_3_counts_numpy
+from src.utils.random import write_sinan_csv
+from src.utils.reading import processing_total_dataset
+from src.utils.scheduler import Scheduler
+from src.utils.streaming import Crosstab, ValueCounts, aggregate_total_dataset
+
+CONFIRMED = IsIn('CLASSI_FIN', [10, 11, 12])
+
+
+@pytest.fixture
+def total_dataset(workdir):
+    return write_sinan_csv(os.path.join('data', TOTAL_DATASET), 4000, chunksize=1000, seed=8)
+
+
+def register_tasks(scheduler: Scheduler) -> None:
+    register_hypothesis5(scheduler)
+    scheduler.register('uf_by_evolution', {'table': Crosstab('SIGLA_UF', 'EVOLUCAO')})
+    scheduler.register('confirmed_ufs', {'ufs': ValueCounts('SIGLA_UF')}, predicate=CONFIRMED)
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_single_scan_equals_separate_runs(total_dataset, backend):
+    scheduler = Scheduler()
+    register_tasks(scheduler)
+    results = scheduler.run(chunksize=700, backend=backend, workers=2)
+
+    df = processing_total_dataset(backend='serial')
+    assert results['hypothesis5.top_3_exams'] == top_3_counts_numpy(df, EXAM_DATE_COLUMNS)
+    for period in ('before', 'after'):
+        expected = analyze_case_days_open(df, '2022-11-30', period)
+        assert results['hypothesis5.case_days_open'][period] == pytest.approx(expected)
+
+    separate = aggregate_total_dataset({'table': Crosstab('SIGLA_UF', 'EVOLUCAO')}, chunksize=1000)
+    pd.testing.assert_frame_equal(results['uf_by_evolution']['table'], separate['table'])
+    separate = aggregate_total_dataset({'ufs': ValueCounts('SIGLA_UF')}, chunksize=1000, predicate=CONFIRMED)
+    pd.testing.assert_series_equal(results['confirmed_ufs']['ufs'], separate['ufs'])
+
+
+def test_the_scan_reads_only_the_columns_of_the_tasks():
+    scheduler = Scheduler()
+    scheduler.register('ufs', {'ufs': ValueCounts('SIGLA_UF')}, predicate=CONFIRMED)
+
+    assert scheduler.columns() == ['SIGLA_UF', 'CLASSI_FIN', 'SG_UF_NOT']
+    with pytest.raises(ValueError):
+        scheduler.register('ufs', {})
@@ -0,0 +1,97 @@
+"""Testes das medidas de associação de src/utils/statistic.py"""
+from math import sqrt
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.random import generate_sinan_dataframe
+from src.utils.statistic import (association_matrix, chi_square_test, contigency_coefficient, contingency_table, crammer_V,
+                                 monte_carlo_significance, random_tables)
+
+PAIRS = [('SIGLA_UF', 'CLASSI_FIN'), ('FEBRE', 'EVOLUCAO'), ('ID_OCUPA_N', 'SOROTIPO'), ('HOSPITALIZ', 'HOSPITALIZ')]
+
+
+@pytest.fixture(scope='module')
+def sample():
+    df = generate_sinan_dataframe(3000, seed=11)
+    df['SIGLA_UF'] = df['SG_UF_NOT'].astype(str)
+    return df
+
+
+def crosstab_measures(qualitative_variable_1: pd.Series, qualitative_variable_2: pd.Series) -> tuple[float, float, float]:
+    """The measures computed from pd.crosstab with the margins, like the functions of statistic.py did before the bincount"""
+    cross_table = pd.crosstab(qualitative_variable_1, qualitative_variable_2, margins=True)
+    n = cross_table.loc['All', 'All']
+    expected_values = np.outer(cross_table['All'], cross_table.loc['All']) / n
+    qui_quadrado = (((cross_table - expected_values) ** 2) / expected_values).iloc[:-1, :-1].to_numpy().sum()
+    r, s = len(cross_table.index) - 1, len(cross_table.columns) - 1
+    return qui_quadrado, sqrt(qui_quadrado / (n * min(r - 1, s - 1))), sqrt(qui_quadrado / (qui_quadrado + n))
+
+
+@pytest.mark.parametrize('columns', PAIRS)
+def test_contingency_table_matches_crosstab(sample, columns):
+    expected = pd.crosstab(sample[columns[0]], sample[columns[1]]).to_numpy()
+
+    assert (contingency_table(sample[columns[0]], sample[columns[1]]) == expected).all()
+
+
+@pytest.mark.parametrize('columns', PAIRS)
+def test_measures_match_crosstab(sample, columns):
+    chi_square, V, coefficient = crosstab_measures(sample[columns[0]], sample[columns[1]])
+
+    assert chi_square_test(sample[columns[0]], sample[columns[1]]) == pytest.approx(chi_square)
+    assert crammer_V(sample[columns[0]], sample[columns[1]]) == pytest.approx(V)
+    assert contigency_coefficient(sample[columns[0]], sample[columns[1]]) == pytest.approx(coefficient)
+
+
+def test_association_matrix_matches_the_pairs(sample):
+    columns = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'DIABETES']
+    matrix = association_matrix(sample, columns)
+
+    assert (matrix.to_numpy() == matrix.to_numpy().T).all()
+    for i, column_1 in enumerate(columns):
+        for column_2 in columns[i + 1:]:
+            assert matrix.loc[column_1, column_2] == pytest.approx(crammer_V(sample[column_1], sample[column_2]))
+
+
+def test_measures_reject_other_types():
+    with pytest.raises(TypeError):
+        chi_square_test([1, 2], pd.Series([1, 2]))
+
+
+def test_random_tables_keep_the_margins():
+    rng = np.random.default_rng(0)
+    tables = random_tables(np.array([5, 3, 2]), np.array([4, 4, 2]), 500, rng)
+
+    assert (tables.sum(axis=2) == [5, 3, 2]).all()
+    assert (tables.sum(axis=1) == [4, 4, 2]).all()
+
+
+def test_monte_carlo_ignores_empty_rows_and_columns():
+    table = np.array([[3, 1, 0], [1, 3, 0], [0, 0, 0]])
+    result = monte_carlo_significance([table], resamples=2000, seed=0, workers=1)[0]
+    trimmed = monte_carlo_significance([table[:2, :2]], resamples=2000, seed=0, workers=1)[0]
+
+    assert np.isfinite(result['chi_square'])
+    assert result == trimmed
+    # Fisher's two-sided p-value of the lady tasting tea is 0.486
+    assert result['p_value'] == pytest.approx(0.486, abs=0.05)
+
+
+@pytest.mark.parametrize('table', [
+    np.zeros((3, 3), dtype=np.int64),
+    np.array([[5, 0], [7, 0]]),
+    np.array([[5, 2], [0, 0]]),
+])
+def test_monte_carlo_degenerate_tables_have_no_p_value(table):
+    result = monte_carlo_significance([table], resamples=100, seed=0, workers=1)[0]
+
+    assert np.isnan(result['p_value'])
+    assert result['resamples'] == 0
+
+
+def test_monte_carlo_does_not_depend_on_the_workers():
+    table = np.array([[10, 4, 6], [3, 9, 2], [5, 5, 12]])
+    serial = monte_carlo_significance([table], resamples=3000, seed=7, workers=1, batch_size=500)
+    parallel = monte_carlo_significance([table], resamples=3000, seed=7, workers=2, batch_size=500)
+
+    assert serial == parallel
@@ -0,0 +1,31 @@
+"""Testes das agregações por streaming de src/utils/streaming.py"""
+import numpy as np
+import pytest
+from src.utils.streaming import IntegerHistogram
+
+
+def test_histogram_quantiles_match_numpy():
+    values = np.random.default_rng(4).geometric(0.05, size=1001)
+    histogram = IntegerHistogram().add(values[:400]).merge(IntegerHistogram().add(values[400:]))
+
+    for q in (0, 0.1, 0.25, 0.5, 0.75, 0.99, 1):
+        assert histogram.quantile(q) == pytest.approx(np.quantile(values, q))
+    assert histogram.stats()['std_dev'] == pytest.approx(values.std(ddof=1))
+
+
+def test_merge_keeps_the_histograms():
+    left, right = IntegerHistogram().add([1, 2]), IntegerHistogram().add([5])
+    merged = left.merge(right)
+
+    assert merged.total == 3
+    assert left.counts.tolist() == [0, 1, 1]
+    assert right.total == 1
+
+
+def test_empty_histogram():
+    histogram = IntegerHistogram().merge(IntegerHistogram())
+
+    assert histogram.total == 0
+    assert histogram.stats() == {'std_dev': 0, 'median': 0, 'q1': 0, 'q3': 0, 'min': 0, 'max': 0, 'total_records': 0, 'sum_of_days': 0, 'average_days': 0}
+    assert IntegerHistogram().add([3]).stats()['min'] == 3
+    assert np.isnan(IntegerHistogram().add([3]).stats()['std_dev'])
@@ -0,0 +1,55 @@
+"""Testes do cubo de séries temporais de src/utils/time_cube.py"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.random import generate_sinan_dataframe
+from src.utils.reading import prepare_chunk
+from src.utils.streaming import aggregate_chunks
+from src.utils.time_cube import TimeCubeCounts
+
+
+@pytest.fixture(scope='module')
+def chunks():
+    chunks = [prepare_chunk(generate_sinan_dataframe(800, seed=seed)) for seed in range(4)]
+    # Dates out of the range and without a value are only counted
+    chunks[0].loc[:9, 'DT_SIN_PRI'] = pd.Timestamp('1999-01-01')
+    chunks[1].loc[:4, 'DT_SIN_PRI'] = pd.NaT
+    return chunks
+
+
+def test_cube_matches_pandas(chunks):
+    cube = aggregate_chunks({'cube': TimeCubeCounts('DT_SIN_PRI')}, chunks)['cube']
+    df = pd.concat(chunks, ignore_index=True)
+    in_range = df['DT_SIN_PRI'].between('2020-01-01', '2025-12-31')
+
+    assert cube.total() == in_range.sum()
+    assert cube.out_of_range == 10
+    assert cube.missing == 5
+    expected = df[in_range].groupby(df['DT_SIN_PRI'].dt.to_period('M')).size()
+    assert (cube.series('M').to_numpy() == expected.reindex(cube.series('M').index, fill_value=0).to_numpy()).all()
+    expected = df[in_range & (df['SIGLA_UF'] == 'SP') & df['CLASSI_FIN'].isin([10, 11])]
+    assert cube.select(SIGLA_UF='SP', CLASSI_FIN=[10, 11]).total() == len(expected)
+
+
+def test_merge_is_associative(chunks):
+    aggregation = TimeCubeCounts('DT_NOTIFIC')
+    partials = [aggregation.partial(chunk) for chunk in chunks]
+
+    left = aggregation.merge(aggregation.merge(aggregation.merge(partials[0], partials[1]), partials[2]), partials[3])
+    right = aggregation.merge(aggregation.merge(partials[0], partials[1]), aggregation.merge(partials[2], partials[3]))
+
+    assert (left.positions == right.positions).all() and (left.counts == right.counts).all()
+    assert (aggregation.finalize(left).counts == aggregation.finalize(right).counts).all()
+    assert aggregation.finalize(aggregation.initial()).total() == 0
+
+
+def test_merge_does_not_change_the_cubes(chunks):
+    cube = aggregate_chunks({'cube': TimeCubeCounts('DT_SIN_PRI')}, chunks)['cube']
+    before = cube.counts.copy()
+    selected = cube.select('2022-01-01', '2022-12-31')
+
+    merged = selected.merge(cube.select('2022-03-01', '2022-03-31'))
+
+    assert (cube.counts == before).all()
+    assert merged.total() == selected.total() + cube.select('2022-03-01', '2022-03-31').total()
+    assert np.shares_memory(selected.counts, cube.counts) and not np.shares_memory(merged.counts, cube.counts)